@@ -1,7 +1,16 @@
-from typing import Any, Dict, List, Optional, Tuple 
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple 
+import hashlib
+import hmac
+import json
+import os
 import re
-from fastapi import FastAPI
-from pydantic import BaseModel, Field
+import threading
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 
 app = FastAPI(title= "SIEM Log Normalizer and Data Masker")
 
@@ -23,6 +32,10 @@ class BatchRequest(BaseModel):
 class BatchResponse(BaseModel):
     results: List[NormalizedLog]
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Records parsed but not yet written back on the NDJSON stream endpoint
+STREAM_MAX_IN_FLIGHT = int(os.getenv("NORMALIZER_STREAM_MAX_IN_FLIGHT", "256"))
+
 FIELD_MAP = {
     "time": "timestamp",
     "@timestamp": "timestamp",
@@ -84,26 +97,139 @@ IDENTIFIER_FIELDS = {
     "account",
 }
 
+# Token prefix per identifier field; fields sharing a prefix share tokens,
+# so the same IP gets the same pseudonym as src_ip and dst_ip.
+PSEUDONYM_PREFIXES = {
+    "username": "user",
+    "user": "user",
+    "account": "user",
+    "user_id": "uid",
+    "email": "email",
+    "src_ip": "ip",
+    "dst_ip": "ip",
+    "ip": "ip",
+    "host": "host",
+    "hostname": "host",
+    "computer_name": "host",
+    "device_id": "device",
+}
+
+# Identifiers are replaced with [FIELD] placeholders unless a key is set,
+# in which case they get stable keyed pseudonyms such as user_3f9a61c2.
+PSEUDONYM_KEY = os.getenv("NORMALIZER_PSEUDONYM_KEY", "")
+# 16 hex chars = 64 bits; 8 would collide (merging entities) past ~65k values per prefix
+PSEUDONYM_HEX_LEN = int(os.getenv("NORMALIZER_PSEUDONYM_HEX_LEN", "16"))
+PSEUDONYM_CACHE_SIZE = int(os.getenv("NORMALIZER_PSEUDONYM_CACHE_SIZE", "65536"))
+PSEUDONYM_VAULT = os.getenv("NORMALIZER_PSEUDONYM_VAULT", "").lower() in ("1", "true", "yes")
+PSEUDONYM_VAULT_SIZE = int(os.getenv("NORMALIZER_PSEUDONYM_VAULT_SIZE", "1000000"))
+
 IPV4_RE = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
 EMAIL_RE = re.compile(r"\b[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[A-Za-z]{2,}\b")
 URL_RE = re.compile(r"\bhttps?://[^\s]+")
 TOKEN_RE = re.compile(r"\b[a-zA-Z0-9_\-]{20,}\b")
 
+# Single-pass masker: one alternation scanned once per value. At a given
+# position URL wins over EMAIL over IP over TOKEN. Where entities overlap
+# (e.g. an IP inside a URL) the outer entity is masked once instead of
+# being rewritten by each pattern in turn.
+MASK_PATTERNS = {
+    "URL": URL_RE,
+    "EMAIL": EMAIL_RE,
+    "IP": IPV4_RE,
+    "TOKEN": TOKEN_RE,
+}
+# every pattern starts with \b; hoisting it lets mid-word positions fail
+# on one check instead of four
+WORD_BOUNDARY = r"\b"
+# The four-pass order masked IPs before tokens, so a token never ran into
+# an adjacent IP ("abc...-10.1.2.3") or started on the "-" right after a
+# masked entity; the single-pass token stops short of both.
+_IPV4_BODY = IPV4_RE.pattern.removeprefix(WORD_BOUNDARY)
+_SINGLE_PASS_PATTERNS = {
+    kind: pattern.pattern.removeprefix(WORD_BOUNDARY) for kind, pattern in MASK_PATTERNS.items()
+}
+_SINGLE_PASS_PATTERNS["TOKEN"] = rf"(?!-)(?:[a-zA-Z0-9_]|-(?!{_IPV4_BODY})){{20,}}\b"
+_MASK_ALTERNATIVES = "|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _SINGLE_PASS_PATTERNS.items())
+MASK_RE = re.compile(f"{WORD_BOUNDARY}(?:{_MASK_ALTERNATIVES})")
+
 def normalize_key(key: str) -> str:
     base = key.strip().lower()
     base = base.replace(" ", "_").replace(".", "_")
     return FIELD_MAP.get(base, base)
 
+def mask_string_entities(value: str) -> Tuple[str, Set[str]]:
+    kinds: Set[str] = set()
+
+    def _replace(match: re.Match) -> str:
+        kinds.add(match.lastgroup)
+        return f"[{match.lastgroup}]"
+
+    masked = MASK_RE.sub(_replace, value)
+    return masked, kinds
+
 def mask_string_value(value: str) -> Tuple[str, bool]:
-    original = value
-    masked = value 
+    masked, kinds = mask_string_entities(value)
+    return masked, bool(kinds)
+
+class Pseudonymizer:
+    """
+    HMAC-SHA256 pseudonyms for identifier values. Recent mappings are kept
+    in a bounded LRU cache so repeated entities are not rehashed. With
+    vault=True the token -> original mapping is retained for reveal(), for
+    the `vault_size` most recently seen tokens.
+    """
+
+    def __init__(self, key: bytes, hex_len: int = 16, cache_size: int = 65536, vault: bool = False,
+                 vault_size: int = 1_000_000):
+        self.key = key
+        self.hex_len = hex_len
+        self.cache_size = cache_size
+        self.vault_size = vault_size
+        self.vault: "Optional[OrderedDict[str, str]]" = OrderedDict() if vault else None
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pseudonymize(self, field_name: str, value: Any) -> str:
+        prefix = PSEUDONYM_PREFIXES.get(field_name, field_name)
+        text = str(value)
+        cache_key = (prefix, text)
+
+        with self._lock:
+            token = self._cache.get(cache_key)
+            if token is not None:
+                self._cache.move_to_end(cache_key)
+                self._remember(token, text)
+                return token
+
+        digest = hmac.new(self.key, f"{prefix}:{text}".encode("utf-8"), hashlib.sha256).hexdigest()
+        token = f"{prefix}_{digest[:self.hex_len]}"
 
-    masked = IPV4_RE.sub("[IP]", masked)
-    masked = EMAIL_RE.sub("[EMAIL]", masked)
-    masked = URL_RE.sub("[URL]", masked)
-    masked = TOKEN_RE.sub("[TOKEN]", masked)
+        with self._lock:
+            self._cache[cache_key] = token
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self._remember(token, text)
+        return token
 
-    return masked, masked != original
+    def _remember(self, token: str, text: str) -> None:
+        # caller holds _lock
+        if self.vault is None:
+            return
+        self.vault[token] = text
+        self.vault.move_to_end(token)
+        if len(self.vault) > self.vault_size:
+            self.vault.popitem(last=False)
+
+    def reveal(self, token: str) -> Optional[str]:
+        if self.vault is None:
+            return None
+        return self.vault.get(token)
+
+PSEUDONYMIZER: Optional[Pseudonymizer] = (
+    Pseudonymizer(PSEUDONYM_KEY.encode("utf-8"), PSEUDONYM_HEX_LEN, PSEUDONYM_CACHE_SIZE, PSEUDONYM_VAULT,
+                  PSEUDONYM_VAULT_SIZE)
+    if PSEUDONYM_KEY else None
+)
 
 def mask_field(field_name: str, value: Any) -> Tuple[Any, bool, bool]:
     name = field_name.lower()
@@ -111,6 +237,8 @@ def mask_field(field_name: str, value: Any) -> Tuple[Any, bool, bool]:
         return "[SENSITIVE]", True, True 
     
     if name in IDENTIFIER_FIELDS:
+        if PSEUDONYMIZER is not None and value is not None:
+            return PSEUDONYMIZER.pseudonymize(name, value), True, False
         placeholder = f"[{name.upper()}]"
         return placeholder, True, False
     
@@ -121,7 +249,7 @@ def mask_field(field_name: str, value: Any) -> Tuple[Any, bool, bool]:
     return masked_text, was_masked, False
 
 def normalize_and_mask_single(raw_log: RawLog) -> NormalizedLog:
-    normalized: Dict[str, Any] = []
+    normalized: Dict[str, Any] = {}
     llm_payload: Dict[str, Any] = {}
     masked_fields: List[str] = []
     redaction_notes: List[str] = []
@@ -163,4 +291,78 @@ def normalize_and_mask_batch(request: BatchRequest):
     Batch endpoint for multiple records.
     """
     results = [normalize_and_mask_single(rec) for rec in request.records]
-    return BatchResponse(results=results)
\ No newline at end of file
+    return BatchResponse(results=results)
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that reads the request body while it streams.
+    Starlette's default disconnect listener would consume request body
+    messages, so it is skipped here; a client disconnect still surfaces
+    through request.stream() and ends the generator, and a failed send is
+    reported as ClientDisconnect as in Starlette.
+    """
+    media_type = NDJSON_MEDIA_TYPE
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+async def iter_ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    """Yield request body lines as they arrive, without buffering the whole body."""
+    remainder = b""
+    async for chunk in request.stream():
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line
+    if remainder:
+        yield remainder
+
+def normalize_ndjson_lines(lines: List[Tuple[int, bytes]]) -> str:
+    out = []
+    for line_no, line in lines:
+        try:
+            record = RawLog.model_validate_json(line)
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False, include_input=False)
+            out.append(json.dumps({"line": line_no, "errors": errors}))
+            continue
+        out.append(normalize_and_mask_single(record).model_dump_json())
+    return "".join(f"{item}\n" for item in out)
+
+async def stream_normalized(request: Request, max_in_flight: int) -> AsyncIterator[str]:
+    """
+    Read, normalize and emit at most max_in_flight records at a time. The
+    next slice of the body is only read once the previous results have
+    been handed to the client, so a slow reader throttles the upload.
+    """
+    pending: List[Tuple[int, bytes]] = []
+    line_no = 0
+    async for line in iter_ndjson_lines(request):
+        line_no += 1
+        if not line.strip():
+            continue
+        pending.append((line_no, line))
+        if len(pending) >= max_in_flight:
+            yield await run_in_threadpool(normalize_ndjson_lines, pending)
+            pending = []
+    if pending:
+        yield await run_in_threadpool(normalize_ndjson_lines, pending)
+
+
+@app.post("/normalize-mask/batch/stream")
+async def normalize_and_mask_stream(
+    request: Request,
+    max_in_flight: int = Query(STREAM_MAX_IN_FLIGHT, ge=1, le=10000),
+):
+    """
+    Streaming batch endpoint. Body is NDJSON, one RawLog per line; the
+    response is NDJSON with one NormalizedLog per line, or an
+    {"line", "errors"} object for lines that fail validation.
+    """
+    return NDJSONStreamingResponse(stream_normalized(request, max_in_flight))
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.requests import ClientDisconnect
+from app.services.data_normalizer import data_normalizer
+from app.services.data_normalizer.data_normalizer import (
+    EMAIL_RE,
+    IPV4_RE,
+    NDJSON_MEDIA_TYPE,
+    NDJSONStreamingResponse,
+    Pseudonymizer,
+    TOKEN_RE,
+    URL_RE,
+    app as normalizer_app,
+    mask_field,
+    mask_string_entities,
+    mask_string_value,
+)
+
+
+def four_pass_mask(value: str) -> str:
+    masked = IPV4_RE.sub("[IP]", value)
+    masked = EMAIL_RE.sub("[EMAIL]", masked)
+    masked = URL_RE.sub("[URL]", masked)
+    return TOKEN_RE.sub("[TOKEN]", masked)
+
+
+@pytest.mark.parametrize("message", [
+    "Failed password for root from 10.1.2.3 port 52144 ssh2",
+    "User alice@corp.example.com signed in from 192.168.0.7",
+    "GET https://portal.example.com/login?next=/home&ip=10.0.0.1 200",
+    "Authorization header Bearer abcdefABCDEF0123456789_-xyz rejected",
+    "Scheduled task completed successfully",
+    "session=abcdefghijklmnopqrstuvwx-10.1.2.3 ok",
+    "peer 10.1.2.3-abcdefghijklmnopqrstuvwx closed",
+    "bob@corp.example.com-10.1.2.3 ok",
+    "bob@corp.example.com-abcdefghijklmnopqrstuvwx ok",
+    "see https://x.example/a abcdefghijklmnopqrstuvwx",
+    "key=abcdefghijklmnopqrstuvwx-10.1.2",
+])
+def test_single_pass_matches_four_pass(message):
+    assert mask_string_value(message) == (four_pass_mask(message), four_pass_mask(message) != message)
+
+
+def test_mask_string_entities_reports_kinds():
+    masked, kinds = mask_string_entities("bob@example.org logged in from 8.8.8.8 via https://x.example/a")
+    assert masked == "[EMAIL] logged in from [IP] via [URL]"
+    assert kinds == {"EMAIL", "IP", "URL"}
+
+    assert mask_string_entities("nothing to see") == ("nothing to see", set())
+
+    masked, kinds = mask_string_entities("session=abcdefghijklmnopqrstuvwx-10.1.2.3 ok")
+    assert masked == "session=[TOKEN]-[IP] ok"
+    assert kinds == {"TOKEN", "IP"}
+
+
+async def test_batch_stream_endpoint_returns_ndjson():
+    records = [{"log": {"src_ip": f"10.0.0.{i}", "msg": f"login from 10.0.0.{i}"}} for i in range(5)]
+    body = "\n".join(json.dumps(r) for r in records) + "\n\nnot-json\n"
+
+    transport = ASGITransport(app=normalizer_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        r = await ac.post(
+            "/normalize-mask/batch/stream",
+            params={"max_in_flight": 2},
+            content=body,
+            headers={"Content-Type": NDJSON_MEDIA_TYPE},
+        )
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert len(lines) == 6
+    assert lines[0]["normalized_log"] == {"src_ip": "[SRC_IP]", "message": "login from [IP]"}
+    assert lines[-1]["line"] == 7
+
+
+def test_pseudonymizer_is_stable_and_keyed():
+    p = Pseudonymizer(b"k1", cache_size=2)
+    token = p.pseudonymize("src_ip", "10.0.0.1")
+
+    assert token.startswith("ip_") and len(token) == len("ip_") + 16
+    assert len(Pseudonymizer(b"k1", hex_len=8).pseudonymize("src_ip", "10.0.0.1")) == len("ip_") + 8
+    assert p.pseudonymize("dst_ip", "10.0.0.1") == token
+    assert p.pseudonymize("username", "10.0.0.1") != token
+    assert Pseudonymizer(b"k2").pseudonymize("src_ip", "10.0.0.1") != token
+
+    p.pseudonymize("host", "a")
+    p.pseudonymize("host", "b")
+    assert len(p._cache) == 2
+    assert p.pseudonymize("src_ip", "10.0.0.1") == token
+    assert p.reveal(token) is None
+
+
+def test_mask_field_uses_pseudonymizer_and_vault(monkeypatch):
+    p = Pseudonymizer(b"secret", vault=True)
+    monkeypatch.setattr(data_normalizer, "PSEUDONYMIZER", p)
+
+    value, was_masked, dropped = mask_field("username", "alice")
+    assert value.startswith("user_") and was_masked and not dropped
+    assert p.reveal(value) == "alice"
+    assert mask_field("password", "hunter2") == ("[SENSITIVE]", True, True)
+
+
+def test_pseudonymizer_vault_is_bounded():
+    p = Pseudonymizer(b"secret", cache_size=8, vault=True, vault_size=2)
+    a = p.pseudonymize("host", "a")
+    b = p.pseudonymize("host", "b")
+    assert p.pseudonymize("host", "a") == a  # cache hit refreshes the vault entry
+    c = p.pseudonymize("host", "c")
+
+    assert len(p.vault) == 2
+    assert p.reveal(b) is None
+    assert (p.reveal(a), p.reveal(c)) == ("a", "c")
+
+
+async def test_ndjson_response_reports_broken_send_as_client_disconnect():
+    async def body():
+        yield "{}\n"
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        raise BrokenPipeError()
+
+    with pytest.raises(ClientDisconnect):
+        await NDJSONStreamingResponse(body())({"type": "http"}, receive, send)
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import ipaddress
 import json
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
 
 import nmap
 
@@ -33,6 +38,15 @@ DEFAULT_PORTS = [
     27017 # MongoDB
 ]
 
+DEFAULT_SHARD_PREFIX = 24  # IPv4 CIDRs wider than this are split into /24 jobs
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 1
+RETRY_BACKOFF_S = 2.0
+DEFAULT_PRESCAN_CONCURRENCY = 500
+DEFAULT_CONNECT_TIMEOUT = 1.0
+MAX_IPV6_HOSTS = 65536  # a /112; wider IPv6 networks cannot be swept host by host
+_OCTET_CHARS = set("0123456789,-")
+
 
 @dataclass(frozen=True)
 class Finding:
@@ -67,6 +81,218 @@ def scan_targets(targets: str, ports: List[int], timeout: int) -> Dict[str, Any]
     return nm._scan_result  # noqa: SLF001 (acceptable for PoC export)
 
 
+def shard_targets(targets: str, prefix: int = DEFAULT_SHARD_PREFIX) -> List[str]:
+    """
+    Split a target expression into independent nmap jobs.
+
+    Whitespace separated parts are kept apart; IPv4 CIDRs wider than
+    `prefix` are broken into /prefix subnets. Anything else (single IPs,
+    nmap octet ranges like 10.0.0.1-20, hostnames, IPv6) stays one shard.
+    prefix <= 0 disables splitting.
+    """
+    shards: List[str] = []
+    for part in targets.split():
+        try:
+            net = ipaddress.ip_network(part, strict=False)
+        except ValueError:
+            shards.append(part)
+            continue
+        if prefix <= 0 or net.version != 4 or net.prefixlen >= prefix:
+            shards.append(part)
+        else:
+            shards.extend(str(sub) for sub in net.subnets(new_prefix=prefix))
+    return shards
+
+
+@dataclass(frozen=True)
+class ShardFailure:
+    shard: str
+    attempts: int
+    error: str
+
+
+def _scan_shard(shard: str, ports: List[int], timeout: int, retries: int) -> Tuple[Dict[str, Any] | None, int, str]:
+    error = ""
+    for attempt in range(1, retries + 2):
+        try:
+            return scan_targets(shard, ports, timeout), attempt, ""
+        except RuntimeError as e:
+            error = str(e)
+            if attempt <= retries:
+                time.sleep(RETRY_BACKOFF_S * attempt)
+    return None, retries + 1, error
+
+
+def merge_scan_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-shard nmap results into one structure shaped like a single scan."""
+    merged: Dict[str, Any] = {"nmap": {}, "scan": {}}
+    totals = {"uphosts": 0, "downhosts": 0, "totalhosts": 0}
+    elapsed = 0.0
+    for raw in results:
+        merged["scan"].update(raw.get("scan", {}))
+        meta = raw.get("nmap", {}) or {}
+        merged["nmap"].setdefault("command_line", meta.get("command_line"))
+        stats = meta.get("scanstats") or {}
+        for key in totals:
+            totals[key] += int(stats.get(key) or 0)
+        elapsed = max(elapsed, float(stats.get("elapsed") or 0))
+    merged["nmap"]["scanstats"] = {**{k: str(v) for k, v in totals.items()}, "elapsed": f"{elapsed:.2f}"}
+    return merged
+
+
+def run_scan_jobs(
+    jobs: List[Tuple[str, List[int]]],
+    timeout: int,
+    workers: int = DEFAULT_WORKERS,
+    retries: int = DEFAULT_RETRIES,
+) -> Tuple[Dict[str, Any], List[ShardFailure]]:
+    """
+    Run scan_targets for each (targets, ports) job in a bounded thread pool
+    (each job is its own nmap process with its own `timeout`). Failed or
+    timed-out jobs are retried; jobs that still fail are returned alongside
+    the merged results of the ones that succeeded.
+    """
+    results: List[Dict[str, Any]] = []
+    failures: List[ShardFailure] = []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        futures = {
+            pool.submit(_scan_shard, targets, ports, timeout, retries): targets for targets, ports in jobs
+        }
+        for fut in as_completed(futures):
+            raw, attempts, error = fut.result()
+            if raw is None:
+                failures.append(ShardFailure(futures[fut], attempts, error))
+            else:
+                results.append(raw)
+
+    failures.sort(key=lambda f: f.shard)
+    return merge_scan_results(results), failures
+
+
+def scan_sharded(
+    targets: str,
+    ports: List[int],
+    timeout: int,
+    shard_prefix: int = DEFAULT_SHARD_PREFIX,
+    workers: int = DEFAULT_WORKERS,
+    retries: int = DEFAULT_RETRIES,
+) -> Tuple[Dict[str, Any], List[ShardFailure]]:
+    """Split `targets` with shard_targets and scan every shard for all `ports`."""
+    jobs = [(shard, ports) for shard in shard_targets(targets, shard_prefix)]
+    return run_scan_jobs(jobs, timeout, workers, retries)
+
+
+def _expand_octets(spec: str) -> List[int]:
+    """nmap octet spec: 5, 1-20, 1,3,7-9; an open end means 0 or 255 (-, 5-, -20)."""
+    values: List[int] = []
+    for part in spec.split(","):
+        lo, dash, hi = part.partition("-")
+        start = int(lo) if lo else 0
+        end = (int(hi) if hi else 255) if dash else start
+        if not 0 <= start <= end <= 255:
+            raise ValueError(f"Invalid octet range: {spec}")
+        values.extend(range(start, end + 1))
+    return values
+
+
+def _is_octet_spec(part: str) -> bool:
+    octets = part.split(".")
+    return len(octets) == 4 and all(o and set(o) <= _OCTET_CHARS for o in octets)
+
+
+def expand_hosts(targets: str) -> Iterator[str]:
+    """
+    Concrete hosts for a target expression: CIDRs, single IPs, nmap
+    per-octet ranges (10.0.0.1-20, 10.0.1,3.5, 10.0.0.-) and hostnames.
+    Hosts are yielded one at a time, so a /8 never sits in memory. IPv6
+    networks with more than MAX_IPV6_HOSTS addresses raise ValueError
+    instead of enumerating forever.
+    """
+    for part in targets.split():
+        try:
+            net = ipaddress.ip_network(part, strict=False)
+        except ValueError:
+            if _is_octet_spec(part):
+                a, b, c, d = (_expand_octets(o) for o in part.split("."))
+                yield from (f"{w}.{x}.{y}.{z}" for w in a for x in b for y in c for z in d)
+            else:
+                yield part
+            continue
+        if net.version == 6 and net.num_addresses > MAX_IPV6_HOSTS:
+            raise ValueError(f"{part} is too large to enumerate (over {MAX_IPV6_HOSTS} addresses)")
+        yield from (str(h) for h in (net.hosts() if net.num_addresses > 2 else net))
+
+
+async def _probe(host: str, port: int, connect_timeout: float) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), connect_timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def tcp_prescan(
+    hosts: Iterable[str],
+    ports: List[int],
+    concurrency: int = DEFAULT_PRESCAN_CONCURRENCY,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+) -> Dict[str, List[int]]:
+    """
+    Plain TCP connect() to every (host, port) pair, `concurrency` at a time.
+    Returns host -> sorted open ports, for hosts with at least one open port.
+    Pairs are drawn lazily from one iterator, so memory does not grow with
+    the size of the sweep.
+    """
+    port_list = sorted(set(ports))
+    pairs = ((h, p) for h in hosts for p in port_list)
+    open_ports: Dict[str, List[int]] = {}
+
+    async def worker() -> None:
+        for host, port in pairs:
+            if await _probe(host, port, connect_timeout):
+                open_ports.setdefault(host, []).append(port)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return {h: sorted(p) for h, p in sorted(open_ports.items())}
+
+
+def prescan_jobs(open_ports: Dict[str, List[int]], hosts_per_job: int = 64) -> List[Tuple[str, List[int]]]:
+    """Group hosts that share the same open-port set into nmap jobs of up to `hosts_per_job` hosts."""
+    by_ports: Dict[Tuple[int, ...], List[str]] = {}
+    for host, ports in open_ports.items():
+        by_ports.setdefault(tuple(ports), []).append(host)
+    jobs: List[Tuple[str, List[int]]] = []
+    for ports, hosts in sorted(by_ports.items()):
+        for i in range(0, len(hosts), hosts_per_job):
+            jobs.append((" ".join(hosts[i:i + hosts_per_job]), list(ports)))
+    return jobs
+
+
+def scan_prescanned(
+    targets: str,
+    ports: List[int],
+    timeout: int,
+    concurrency: int = DEFAULT_PRESCAN_CONCURRENCY,
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+    workers: int = DEFAULT_WORKERS,
+    retries: int = DEFAULT_RETRIES,
+) -> Tuple[Dict[str, Any], List[ShardFailure], int]:
+    """
+    asyncio connect prescan, then nmap -sV only on the (host, port) pairs
+    found open. Returns merged nmap results, failed jobs and the number of
+    open pairs the prescan found.
+    """
+    open_ports = asyncio.run(tcp_prescan(expand_hosts(targets), ports, concurrency, connect_timeout))
+    raw, failures = run_scan_jobs(prescan_jobs(open_ports), timeout, workers, retries)
+    return raw, failures, sum(len(p) for p in open_ports.values())
+
+
 def extract_findings(scan_result: Dict[str, Any]) -> List[Finding]:
     findings: List[Finding] = []
 
@@ -105,30 +331,220 @@ def to_keyset(findings: List[Finding]) -> set[Tuple[str, str, int]]:
     return {(f.host, f.proto, f.port) for f in findings if f.state == "open"}
 
 
-def load_findings(path: Path) -> List[Finding]:
-    data = json.loads(path.read_text(encoding="utf-8"))
-    items = data.get("findings", [])
-    out: List[Finding] = []
-    for it in items:
-        out.append(
-            Finding(
-                host=it["host"],
-                port=int(it["port"]),
-                proto=it["proto"],
-                service=it.get("service", ""),
-                state=it.get("state", ""),
-                product=it.get("product"),
-                version=it.get("version"),
-            )
+FindingKey = Tuple[str, str, int]  # (host, proto, port)
+COMPARED_FIELDS = ("service", "product", "version")
+BASELINE_HEADER = "#drift-baseline-v1\thost\tproto\tport\tservice\tstate\tproduct\tversion\n"
+
+
+def _finding_from_dict(it: Dict[str, Any]) -> Finding:
+    return Finding(
+        host=it["host"],
+        port=int(it["port"]),
+        proto=it["proto"],
+        service=it.get("service", ""),
+        state=it.get("state", ""),
+        product=it.get("product"),
+        version=it.get("version"),
+    )
+
+
+def _tsv_field(value: str | None) -> str:
+    return (value or "").replace("\t", " ").replace("\n", " ")
+
+
+def save_baseline(path: Path, findings: List[Finding]) -> None:
+    """
+    Compact baseline: one tab-separated line per finding, sorted by
+    (host, proto, port). Several times smaller and faster to load than the
+    JSON report for large sweeps.
+    """
+    rows = sorted(findings, key=lambda f: (f.host, f.proto, f.port))
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        fh.write(BASELINE_HEADER)
+        fh.writelines(
+            f"{f.host}\t{f.proto}\t{f.port}\t{_tsv_field(f.service)}\t{_tsv_field(f.state)}"
+            f"\t{_tsv_field(f.product)}\t{_tsv_field(f.version)}\n"
+            for f in rows
         )
+    tmp.replace(path)
+
+
+def load_findings(path: Path) -> List[Finding]:
+    """Findings from a JSON report or a compact baseline written by save_baseline."""
+    with path.open("r", encoding="utf-8") as fh:
+        if fh.readline().startswith("#drift-baseline-v1"):
+            out: List[Finding] = []
+            for line in fh:  # already sorted
+                host, proto, port, service, state, product, version = line.rstrip("\n").split("\t")
+                out.append(Finding(host, int(port), proto, service, state, product or None, version or None))
+            return out
+        fh.seek(0)
+        data = json.load(fh)
+    out = [_finding_from_dict(it) for it in data.get("findings", [])]
     out.sort(key=lambda f: (f.host, f.proto, f.port))
     return out
 
 
-def save_report(path: Path, targets: str, ports: List[int], raw_scan: Dict[str, Any], findings: List[Finding]) -> None:
+# (host, proto, port) -> (service, product, version), open ports only
+FindingIndex = Dict[FindingKey, Tuple[str, str | None, str | None]]
+
+
+def index_findings(findings: List[Finding]) -> FindingIndex:
+    return {(f.host, f.proto, f.port): (f.service, f.product, f.version) for f in findings if f.state == "open"}
+
+
+def load_index(path: Path) -> FindingIndex:
+    """
+    FindingIndex straight from disk. Compact baselines are parsed into
+    plain tuples without building a Finding per line, which dominates the
+    cost for baselines with millions of rows.
+    """
+    with path.open("r", encoding="utf-8") as fh:
+        if not fh.readline().startswith("#drift-baseline-v1"):
+            return index_findings(load_findings(path))
+        index: FindingIndex = {}
+        for line in fh:
+            host, proto, port, service, state, product, version = line.rstrip("\n").split("\t")
+            if state == "open":
+                index[(host, proto, int(port))] = (service, product or None, version or None)
+        return index
+
+
+@dataclass(frozen=True)
+class DriftChange:
+    kind: str  # "opened" | "closed" | "changed"
+    host: str
+    proto: str
+    port: int
+    before: Finding | None
+    after: Finding | None
+    changed_fields: Tuple[str, ...] = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        def side(f: Finding | None) -> Dict[str, Any] | None:
+            if f is None:
+                return None
+            return {"service": f.service, "product": f.product, "version": f.version}
+
+        return {
+            "kind": self.kind,
+            "host": self.host,
+            "proto": self.proto,
+            "port": self.port,
+            "changed_fields": list(self.changed_fields),
+            "before": side(self.before),
+            "after": side(self.after),
+        }
+
+
+def target_matcher(targets: str) -> Callable[[str], bool]:
+    """Predicate telling whether a host is covered by a target expression."""
+    networks = []
+    hosts: set[str] = set()
+    for part in targets.split():
+        try:
+            networks.append(ipaddress.ip_network(part, strict=False))
+        except ValueError:
+            hosts.update(expand_hosts(part))
+
+    def check(host: str) -> bool:
+        if host in hosts:
+            return True
+        try:
+            addr = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(addr in net for net in networks)
+
+    return check
+
+
+def unscanned_matcher(failed_shards: List[ShardFailure], targets: str | None = None) -> Callable[[str], bool]:
+    """
+    Predicate telling whether this run said nothing about a host: it fell
+    inside a shard that never completed, or (when `targets` is given) lies
+    outside the run's target expression.
+    """
+    failed = target_matcher(" ".join(f.shard for f in failed_shards)) if failed_shards else None
+    covered = target_matcher(targets) if targets is not None else None
+
+    def check(host: str) -> bool:
+        if covered is not None and not covered(host):
+            return True
+        return failed is not None and failed(host)
+
+    return check
+
+
+def _finding(key: FindingKey, attrs: Tuple[str, str | None, str | None]) -> Finding:
+    host, proto, port = key
+    service, product, version = attrs
+    return Finding(host, port, proto, service, "open", product, version)
+
+
+def diff_indexes(
+    baseline: FindingIndex,
+    current: FindingIndex,
+    unscanned: Callable[[str], bool] | None = None,
+) -> List[DriftChange]:
+    """
+    Classify every (host, proto, port) as opened, closed or changed
+    (service/product/version) in one pass over the two indexes.
+    Hosts for which `unscanned` is true are never reported as closed, since
+    a failed shard or a narrower target range says nothing about whether
+    their ports went away.
+    """
+    changes: List[DriftChange] = []
+    for key, after in current.items():
+        before = baseline.get(key)
+        if before is None:
+            changes.append(DriftChange("opened", *key, None, _finding(key, after)))
+        elif before != after:
+            fields = tuple(name for name, b, a in zip(COMPARED_FIELDS, before, after) if b != a)
+            changes.append(DriftChange("changed", *key, _finding(key, before), _finding(key, after), fields))
+
+    for key in baseline.keys() - current.keys():
+        if unscanned is not None and unscanned(key[0]):
+            continue
+        changes.append(DriftChange("closed", *key, _finding(key, baseline[key]), None))
+
+    changes.sort(key=lambda c: (c.host, c.proto, c.port))
+    return changes
+
+
+def diff_findings(
+    baseline: List[Finding],
+    current: List[Finding],
+    unscanned: Callable[[str], bool] | None = None,
+) -> List[DriftChange]:
+    return diff_indexes(index_findings(baseline), index_findings(current), unscanned)
+
+
+def diff_to_dict(changes: List[DriftChange]) -> Dict[str, Any]:
+    summary = {"opened": 0, "closed": 0, "changed": 0}
+    for c in changes:
+        summary[c.kind] += 1
+    return {"summary": summary, "changes": [c.to_dict() for c in changes]}
+
+
+def save_report(
+    path: Path,
+    targets: str,
+    ports: List[int],
+    raw_scan: Dict[str, Any],
+    findings: List[Finding],
+    failed_shards: List[ShardFailure] | None = None,
+) -> None:
+    failed_shards = failed_shards or []
     payload = {
+        "scanned_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
         "targets": targets,
         "ports": sorted(set(ports)),
+        "partial": bool(failed_shards),
+        "failed_shards": [
+            {"shard": f.shard, "attempts": f.attempts, "error": f.error} for f in failed_shards
+        ],
         "nmap_command_line": (raw_scan.get("nmap", {}) or {}).get("command_line"),
         "scanstats": (raw_scan.get("nmap", {}) or {}).get("scanstats"),
         "findings": [
@@ -151,19 +567,54 @@ def main() -> int:
     ap = argparse.ArgumentParser(description="Exposure Drift Detector (python-nmap PoC)")
     ap.add_argument("--targets", required=True, help="CIDR or target expression (e.g. 192.168.1.0/24 or 10.0.0.1-20)")
     ap.add_argument("--ports", default=",".join(map(str, DEFAULT_PORTS)), help="Comma-separated ports to check")
-    ap.add_argument("--timeout", type=int, default=120, help="Overall nmap timeout seconds")
+    ap.add_argument("--timeout", type=int, default=120, help="nmap timeout seconds per shard")
+    ap.add_argument("--shard-prefix", type=int, default=DEFAULT_SHARD_PREFIX,
+                    help="Split IPv4 CIDRs into shards of this prefix length (0 = one job)")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent nmap shard jobs")
+    ap.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries per failed or timed-out shard")
+    ap.add_argument("--prescan", action="store_true",
+                    help="TCP connect prescan first; run nmap -sV only on ports found open")
+    ap.add_argument("--prescan-concurrency", type=int, default=DEFAULT_PRESCAN_CONCURRENCY,
+                    help="Concurrent connect attempts during the prescan")
+    ap.add_argument("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT,
+                    help="Per-connect timeout seconds during the prescan")
     ap.add_argument("--out", default="scan_current.json", help="Output JSON filename for this run")
-    ap.add_argument("--baseline", default=None, help="Baseline JSON filename to diff against")
+    ap.add_argument("--baseline", default=None, help="Baseline (JSON report or compact baseline) to diff against")
+    ap.add_argument("--baseline-out", default=None, help="Also write this run as a compact sorted baseline")
+    ap.add_argument("--diff-out", default=None, help="Write the machine-readable diff (JSON) here")
+    ap.add_argument("--history", default=None, help="Append this run to a SQLite history database")
     args = ap.parse_args()
 
     ports = [int(p.strip()) for p in args.ports.split(",") if p.strip()]
     out_path = Path(args.out)
 
-    raw = scan_targets(args.targets, ports, args.timeout)
+    if args.prescan:
+        raw, failed, open_pairs = scan_prescanned(
+            args.targets, ports, args.timeout, args.prescan_concurrency, args.connect_timeout,
+            args.workers, args.retries,
+        )
+        print(f"Prescan: {open_pairs} open host/port pairs sent to service detection")
+    else:
+        raw, failed = scan_sharded(args.targets, ports, args.timeout, args.shard_prefix, args.workers, args.retries)
     findings = extract_findings(raw)
-    save_report(out_path, args.targets, ports, raw, findings)
+    save_report(out_path, args.targets, ports, raw, findings, failed)
 
     print(f"Wrote: {out_path} ({len(findings)} open-port findings)")
+    if failed:
+        print(f"PARTIAL: {len(failed)} shard(s) failed after retries:", file=sys.stderr)
+        for f in failed:
+            print(f"  {f.shard} ({f.attempts} attempts): {f.error}", file=sys.stderr)
+
+    if args.history:
+        from drift_history import HistoryStore
+
+        with HistoryStore(args.history) as store:
+            run_id = store.ingest(findings, args.targets, failed_shards=[f.shard for f in failed])
+        print(f"Recorded run {run_id} in {args.history}")
+
+    if args.baseline_out:
+        save_baseline(Path(args.baseline_out), findings)
+        print(f"Wrote baseline: {args.baseline_out}")
 
     if args.baseline:
         base_path = Path(args.baseline)
@@ -171,19 +622,26 @@ def main() -> int:
             print(f"Baseline not found: {base_path}", file=sys.stderr)
             return 2
 
-        old = load_findings(base_path)
-        old_keys = to_keyset(old)
-        new_keys = to_keyset(findings)
+        # Only hosts this run actually covered can have closed ports
+        changes = diff_indexes(load_index(base_path), index_findings(findings), unscanned_matcher(failed, args.targets))
+        diff = diff_to_dict(changes)
+        if args.diff_out:
+            Path(args.diff_out).write_text(json.dumps(diff, indent=2), encoding="utf-8")
 
-        newly_exposed = sorted(new_keys - old_keys)
-        if not newly_exposed:
-            print("Diff: no newly-open ports vs baseline")
+        if not changes:
+            print("Diff: no drift vs baseline")
             return 0
 
-        print("Diff: NEWLY-OPEN exposures (host proto port):")
-        for host, proto, port in newly_exposed:
-            print(f"  {host} {proto} {port}")
-        return 1
+        s = diff["summary"]
+        print(f"Diff: {s['opened']} opened, {s['closed']} closed, {s['changed']} changed (kind host proto port):")
+        for c in changes:
+            detail = ""
+            if c.kind == "changed":
+                detail = "  " + ", ".join(
+                    f"{f}: {getattr(c.before, f) or '-'} -> {getattr(c.after, f) or '-'}" for f in c.changed_fields
+                )
+            print(f"  {c.kind.upper():7} {c.host} {c.proto} {c.port}{detail}")
+        return 1 if s["opened"] or s["changed"] else 0
 
     return 0
 
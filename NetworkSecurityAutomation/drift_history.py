@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from drift_detector import Finding, load_findings, target_matcher
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id     INTEGER PRIMARY KEY,
+    scanned_at TEXT    NOT NULL,  -- ISO-8601 UTC, sorts chronologically
+    targets    TEXT    NOT NULL,
+    partial    INTEGER NOT NULL DEFAULT 0,
+    findings   INTEGER NOT NULL DEFAULT 0,
+    failed_shards TEXT  NOT NULL DEFAULT ''  -- space-separated, same syntax as targets
+);
+CREATE TABLE IF NOT EXISTS observations (
+    run_id  INTEGER NOT NULL REFERENCES runs(run_id),
+    host    TEXT    NOT NULL,
+    proto   TEXT    NOT NULL,
+    port    INTEGER NOT NULL,
+    service TEXT,
+    product TEXT,
+    version TEXT
+);
+CREATE INDEX IF NOT EXISTS obs_host_port ON observations(host, port, proto, run_id);
+CREATE INDEX IF NOT EXISTS obs_port_run ON observations(port, run_id);
+CREATE INDEX IF NOT EXISTS runs_scanned_at ON runs(scanned_at);
+"""
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def run_coverage(targets: str, failed_shards: str) -> Callable[[str], bool]:
+    """Predicate telling whether a run actually scanned a host: in its targets and not in a failed shard."""
+    in_targets = target_matcher(targets)
+    in_failed = target_matcher(failed_shards) if failed_shards else None
+
+    def check(host: str) -> bool:
+        return in_targets(host) and not (in_failed is not None and in_failed(host))
+
+    return check
+
+
+class HistoryStore:
+    """
+    Append-only SQLite history of drift_detector runs.
+
+    Each run is one row in `runs` plus one `observations` row per open
+    port, written in a single transaction. The (host, port) and
+    (port, run) indexes answer first-open and exposure-over-time queries
+    without touching the JSON reports again.
+
+    Runs record the shards that failed after retries, so history queries
+    can tell "closed" from "not scanned this time". Partial runs from
+    before that column existed only vouch for the hosts they returned.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(runs)")}
+        if "failed_shards" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE runs ADD COLUMN failed_shards TEXT NOT NULL DEFAULT ''")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> HistoryStore:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def ingest(
+        self,
+        findings: Iterable[Finding],
+        targets: str,
+        scanned_at: str | None = None,
+        partial: bool = False,
+        failed_shards: Iterable[str] = (),
+    ) -> int:
+        """
+        Record one run (open findings only) with a bulk insert; returns its
+        run_id. A run with failed shards is always partial.
+        """
+        failed = " ".join(failed_shards)
+        rows = [
+            (f.host, f.proto, f.port, f.service or None, f.product, f.version)
+            for f in findings
+            if f.state == "open"
+        ]
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO runs (scanned_at, targets, partial, findings, failed_shards) VALUES (?, ?, ?, ?, ?)",
+                (scanned_at or utc_now(), targets, int(partial or bool(failed)), len(rows), failed),
+            )
+            run_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT INTO observations (run_id, host, proto, port, service, product, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, *row) for row in rows),
+            )
+        return run_id
+
+    def ingest_report(self, path: Path) -> int:
+        """Backfill from a JSON report written by save_report."""
+        data = json.loads(path.read_text(encoding="utf-8"))
+        scanned_at = data.get("scanned_at") or datetime.fromtimestamp(
+            path.stat().st_mtime, timezone.utc
+        ).isoformat(timespec="seconds")
+        failed = [f["shard"] for f in data.get("failed_shards") or []]
+        return self.ingest(load_findings(path), data.get("targets", ""), scanned_at, bool(data.get("partial")), failed)
+
+    def first_open(self, host: str, port: int, proto: str = "tcp") -> str | None:
+        """When `port` was first seen open on `host`, or None if never."""
+        row = self.conn.execute(
+            "SELECT MIN(r.scanned_at) FROM observations o JOIN runs r ON r.run_id = o.run_id "
+            "WHERE o.host = ? AND o.port = ? AND o.proto = ?",
+            (host, port, proto),
+        ).fetchone()
+        return row[0]
+
+    def port_history(self, host: str, port: int, proto: str = "tcp") -> List[Tuple[str, bool]]:
+        """
+        (scanned_at, open?) for every run that scanned `host`, oldest first.
+        Runs whose targets missed the host, or whose shard holding it failed,
+        are skipped rather than reported as closed.
+        """
+        rows = self.conn.execute(
+            "SELECT r.scanned_at, r.targets, r.partial, r.failed_shards, EXISTS ("
+            "  SELECT 1 FROM observations o"
+            "  WHERE o.run_id = r.run_id AND o.host = ? AND o.port = ? AND o.proto = ?"
+            "), EXISTS (SELECT 1 FROM observations o WHERE o.run_id = r.run_id AND o.host = ?) "
+            "FROM runs r ORDER BY r.scanned_at, r.run_id",
+            (host, port, proto, host),
+        ).fetchall()
+        covers: Dict[Tuple[str, str], bool] = {}
+        history: List[Tuple[str, bool]] = []
+        for ts, targets, partial, failed, is_open, host_seen in rows:
+            if partial and not failed:
+                covered = bool(host_seen)  # failed shards unknown
+            else:
+                if (targets, failed) not in covers:
+                    covers[targets, failed] = run_coverage(targets, failed)(host)
+                covered = covers[targets, failed]
+            if is_open or covered:
+                history.append((ts, bool(is_open)))
+        return history
+
+    def exposure_over_time(
+        self,
+        port: int | None = None,
+        since: str | None = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Open (host, port) count per run, optionally for one port and/or from
+        `since` on. Hosts in a run's failed shards keep the open ports from
+        the last run that scanned them (counted in `carried_hosts`) instead
+        of dropping out of the series.
+        """
+        runs = self.conn.execute(
+            "SELECT run_id, scanned_at, targets, partial, failed_shards FROM runs ORDER BY scanned_at, run_id"
+        ).fetchall()
+        where, params = ("WHERE port = ?", (port,)) if port is not None else ("", ())
+        per_run: Dict[int, Dict[str, int]] = {}
+        for run_id, host, n in self.conn.execute(
+            f"SELECT run_id, host, COUNT(*) FROM observations {where} GROUP BY run_id, host", params
+        ):
+            per_run.setdefault(run_id, {})[host] = n
+
+        coverage: Dict[Tuple[str, str], Callable[[str], bool]] = {}
+        in_failed: Dict[str, Callable[[str], bool]] = {}
+        last: Dict[str, int] = {}  # host -> open ports when a run last scanned it
+        result: List[Dict[str, Any]] = []
+        for run_id, ts, targets, partial, failed in runs:
+            seen = per_run.get(run_id, {})
+            counts = dict(seen)
+            if failed:
+                if failed not in in_failed:
+                    in_failed[failed] = target_matcher(failed)
+                missed = in_failed[failed]
+                counts.update((h, n) for h, n in last.items() if n and h not in seen and missed(h))
+            if not (partial and not failed):
+                if (targets, failed) not in coverage:
+                    coverage[targets, failed] = run_coverage(targets, failed)
+                covered = coverage[targets, failed]
+                for h in last:
+                    if h not in seen and covered(h):
+                        last[h] = 0
+            last.update(seen)
+            if since is None or ts >= since:
+                result.append({
+                    "run_id": run_id,
+                    "scanned_at": ts,
+                    "partial": bool(partial),
+                    "open_ports": sum(counts.values()),
+                    "hosts": len(counts),
+                    "carried_hosts": len(counts) - len(seen),
+                })
+        return result
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Exposure drift history (SQLite)")
+    ap.add_argument("--db", default="drift_history.db", help="History database path")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    imp = sub.add_parser("import", help="Backfill from JSON reports")
+    imp.add_argument("reports", nargs="+")
+
+    first = sub.add_parser("first-open", help="When did a port first open on a host")
+    first.add_argument("--host", required=True)
+    first.add_argument("--port", type=int, required=True)
+    first.add_argument("--proto", default="tcp")
+
+    exp = sub.add_parser("exposure", help="Open-port count per run")
+    exp.add_argument("--port", type=int, default=None)
+    exp.add_argument("--since", default=None, help="ISO timestamp lower bound")
+
+    args = ap.parse_args()
+    with HistoryStore(args.db) as store:
+        if args.cmd == "import":
+            for report in args.reports:
+                run_id = store.ingest_report(Path(report))
+                print(f"Imported {report} as run {run_id}")
+        elif args.cmd == "first-open":
+            ts = store.first_open(args.host, args.port, args.proto)
+            print(ts or f"{args.host} {args.proto} {args.port} never seen open")
+            return 0 if ts else 1
+        else:
+            for row in store.exposure_over_time(args.port, args.since):
+                flag = " (partial)" if row["partial"] else ""
+                if row["carried_hosts"]:
+                    flag = f" (partial, {row['carried_hosts']} hosts carried over)"
+                print(f"{row['scanned_at']}  run {row['run_id']}: {row['open_ports']} open on {row['hosts']} hosts{flag}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import argparse
+import heapq
+import ipaddress
+import json
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from drift_detector import DEFAULT_PORTS, expand_hosts
+from drift_history import HistoryStore
+
+MIN_INTERVAL_S = 3600  # most volatile hosts: hourly
+MAX_INTERVAL_S = 7 * 86400  # stable hosts: weekly
+HOSTS_PER_PLAN = 256
+GROUP_PREFIX = 24  # hosts in the same /24 share a plan
+
+
+@dataclass(frozen=True)
+class HostStats:
+    host: str
+    runs: int  # runs that covered the host since it was first seen
+    changes: int  # runs whose open-port set differed from the previous run
+    last_seen: float | None  # epoch seconds of the newest run that covered the host
+
+    @property
+    def volatility(self) -> float:
+        # Laplace-smoothed change rate: unseen or barely seen hosts sit at 0.5
+        return (self.changes + 1) / (self.runs + 2)
+
+
+@dataclass(frozen=True)
+class ShardPlan:
+    targets: str  # space-separated hosts, ready for scan_targets / run_scan_jobs
+    hosts: Tuple[str, ...]
+    due: float
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def _epoch(ts: str) -> float:
+    return datetime.fromisoformat(ts).timestamp()
+
+
+def _covered_hosts(targets: str) -> Iterator[str]:
+    try:
+        yield from expand_hosts(targets)
+    except ValueError:  # e.g. a wide IPv6 network; only observed hosts count
+        return
+
+
+def _run_ports(store: HistoryStore) -> Dict[int, Dict[str, str]]:
+    """run_id -> host -> sorted open ports ("tcp/22,tcp/443") for that run."""
+    rows = store.conn.execute(
+        "SELECT run_id, host, group_concat(proto || '/' || port) FROM ("
+        "  SELECT run_id, host, proto, port FROM observations ORDER BY run_id, host, proto, port"
+        ") GROUP BY run_id, host"
+    ).fetchall()
+    per_run: Dict[int, Dict[str, str]] = {}
+    for run_id, host, ports in rows:
+        per_run.setdefault(run_id, {})[host] = ports
+    return per_run
+
+
+def host_stats(store: HistoryStore) -> Dict[str, HostStats]:
+    """
+    Per-host change counts from the history store, for every host a run
+    covered: a covered host without rows is an observation of "no open
+    ports", not a gap. last_seen is the newest run that covered the host.
+    Partial runs only count the hosts they returned, since a failed shard
+    would otherwise look like every port closing.
+    """
+    runs = store.conn.execute(
+        "SELECT run_id, scanned_at, targets, partial FROM runs ORDER BY scanned_at, run_id"
+    ).fetchall()
+    per_run = _run_ports(store)
+
+    # recurring runs repeat the same targets; expand each distinct string once
+    expanded: Dict[str, frozenset[str]] = {}
+    # host -> [runs, changes, previous port set, last covering run]
+    state: Dict[str, List] = {}
+    for run_id, scanned_at, targets, partial in runs:
+        seen = per_run.get(run_id, {})
+        ts = _epoch(scanned_at)
+        if partial:
+            covered = seen.keys()
+        else:
+            if targets not in expanded:
+                expanded[targets] = frozenset(_covered_hosts(targets))
+            covered = expanded[targets] | seen.keys()
+        for host in covered:
+            current = seen.get(host, "")
+            entry = state.get(host)
+            if entry is None:
+                state[host] = [1, 0, current, ts]
+                continue
+            entry[0] += 1
+            entry[1] += current != entry[2]
+            entry[2] = current
+            entry[3] = ts
+    return {host: HostStats(host, runs_, changes, ts) for host, (runs_, changes, _, ts) in state.items()}
+
+
+def hosts_scanned_since(store: HistoryStore, since: float) -> int:
+    """Hosts covered by runs recorded at or after `since` (epoch seconds)."""
+    cutoff = datetime.fromtimestamp(since, timezone.utc).isoformat(timespec="seconds")
+    runs = store.conn.execute(
+        "SELECT r.targets, r.partial, COUNT(DISTINCT o.host) FROM runs r "
+        "LEFT JOIN observations o ON o.run_id = r.run_id WHERE r.scanned_at >= ? GROUP BY r.run_id",
+        (cutoff,),
+    ).fetchall()
+    sizes: Dict[str, int] = {}
+    total = 0
+    for targets, partial, observed in runs:
+        if partial:
+            total += observed
+            continue
+        if targets not in sizes:
+            sizes[targets] = sum(1 for _ in _covered_hosts(targets))
+        total += max(observed, sizes[targets])
+    return total
+
+
+def rescan_interval(stats: HostStats | None, min_s: float = MIN_INTERVAL_S, max_s: float = MAX_INTERVAL_S) -> float:
+    """Interpolate between max_s (never changes) and min_s (changes every run)."""
+    v = stats.volatility if stats is not None else 0.5
+    return min_s + (max_s - min_s) * (1.0 - v) ** 2
+
+
+class AdaptiveScheduler:
+    """
+    Priority queue of (next_due, host); ties break on the host string so
+    the plan order is deterministic.
+
+    plan() pops due hosts, bounded by `budget` and by a token bucket that
+    refills at `max_hosts_per_hour`. It groups them by /24 into ShardPlans
+    and re-queues each host at now + its rescan interval. Hosts with no
+    history are due immediately.
+
+    The bucket starts with `used_last_hour` tokens already spent, so the
+    limit holds across separate invocations when that count comes from the
+    history (see hosts_scanned_since).
+    """
+
+    def __init__(
+        self,
+        stats: Dict[str, HostStats],
+        hosts: Iterable[str] = (),
+        max_hosts_per_hour: float = 10_000,
+        min_interval_s: float = MIN_INTERVAL_S,
+        max_interval_s: float = MAX_INTERVAL_S,
+        now: float | None = None,
+        used_last_hour: int = 0,
+    ) -> None:
+        now = time.time() if now is None else now
+        self.stats = stats
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.rate = max_hosts_per_hour / 3600.0
+        self.capacity = max_hosts_per_hour
+        self.tokens = max(0.0, max_hosts_per_hour - used_last_hour)
+        self.refilled_at = now
+
+        self._heap: List[Tuple[float, str]] = []
+        for host in sorted(set(hosts) | set(stats)):
+            s = stats.get(host)
+            due = now if s is None or s.last_seen is None else s.last_seen + self.interval(host)
+            self._heap.append((due, host))
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def interval(self, host: str) -> float:
+        return rescan_interval(self.stats.get(host), self.min_interval_s, self.max_interval_s)
+
+    def next_due(self) -> float | None:
+        return self._heap[0][0] if self._heap else None
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def plan(self, now: float | None = None, budget: int = HOSTS_PER_PLAN) -> List[ShardPlan]:
+        now = time.time() if now is None else now
+        self._refill(now)
+        limit = min(budget, int(self.tokens))
+
+        due: List[Tuple[float, str]] = []
+        while self._heap and self._heap[0][0] <= now and len(due) < limit:
+            due.append(heapq.heappop(self._heap))
+        for _, host in due:
+            heapq.heappush(self._heap, (now + self.interval(host), host))
+        self.tokens -= len(due)
+
+        groups: Dict[str, List[Tuple[float, str]]] = {}
+        for item in due:
+            groups.setdefault(_group_key(item[1]), []).append(item)
+        plans = [
+            ShardPlan(" ".join(h for _, h in items), tuple(h for _, h in items), min(d for d, _ in items))
+            for items in groups.values()
+        ]
+        plans.sort(key=lambda p: (p.due, p.targets))
+        return plans
+
+
+def _group_key(host: str) -> str:
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return host
+    if addr.version != 4:
+        return host
+    return str(ipaddress.ip_network(f"{host}/{GROUP_PREFIX}", strict=False))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Adaptive rescan planner for drift_detector")
+    ap.add_argument("--db", default="drift_history.db", help="History database (see drift_history.py)")
+    ap.add_argument("--targets", default="", help="Target expression; hosts without history are due now")
+    ap.add_argument("--budget", type=int, default=HOSTS_PER_PLAN, help="Max hosts in this plan")
+    ap.add_argument("--max-hosts-per-hour", type=float, default=10_000, help="Global rate limit")
+    ap.add_argument("--min-interval", type=float, default=MIN_INTERVAL_S, help="Rescan interval for volatile hosts (s)")
+    ap.add_argument("--max-interval", type=float, default=MAX_INTERVAL_S, help="Rescan interval for stable hosts (s)")
+    ap.add_argument("--run", action="store_true", help="Scan the planned shards and record them in the history")
+    ap.add_argument("--ports", default=",".join(map(str, DEFAULT_PORTS)), help="Comma-separated ports (with --run)")
+    ap.add_argument("--timeout", type=int, default=120, help="nmap timeout seconds per shard (with --run)")
+    args = ap.parse_args()
+
+    with HistoryStore(args.db) as store:
+        now = time.time()
+        scheduler = AdaptiveScheduler(
+            host_stats(store),
+            expand_hosts(args.targets) if args.targets else (),
+            args.max_hosts_per_hour,
+            args.min_interval,
+            args.max_interval,
+            now,
+            used_last_hour=hosts_scanned_since(store, now - 3600),
+        )
+        plans = scheduler.plan(now, budget=args.budget)
+        for plan in plans:
+            print(json.dumps(plan.to_dict()))
+
+        if args.run and plans:
+            from drift_detector import extract_findings, run_scan_jobs
+
+            ports = [int(p.strip()) for p in args.ports.split(",") if p.strip()]
+            raw, failed = run_scan_jobs([(p.targets, ports) for p in plans], args.timeout)
+            findings = extract_findings(raw)
+            run_id = store.ingest(
+                findings, " ".join(p.targets for p in plans), failed_shards=[f.shard for f in failed]
+            )
+            print(f"Recorded run {run_id}: {len(findings)} findings, {len(failed)} failed shard(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
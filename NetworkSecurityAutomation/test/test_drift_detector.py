@@ -0,0 +1,200 @@
+# test_drift_detector.py
+import asyncio
+import itertools
+import socket
+
+import pytest
+
+pytest.importorskip("nmap")
+
+import drift_detector
+from drift_detector import (
+    BASELINE_HEADER,
+    Finding,
+    ShardFailure,
+    diff_indexes,
+    expand_hosts,
+    load_findings,
+    load_index,
+    merge_scan_results,
+    prescan_jobs,
+    run_scan_jobs,
+    save_baseline,
+    scan_sharded,
+    shard_targets,
+    tcp_prescan,
+    unscanned_matcher,
+)
+
+
+def _raw(host, port, uphosts=1, elapsed="1.00"):
+    return {
+        "nmap": {
+            "command_line": "nmap -n -sT -sV --open",
+            "scanstats": {"uphosts": str(uphosts), "downhosts": "0", "totalhosts": str(uphosts), "elapsed": elapsed},
+        },
+        "scan": {host: {"status": {"state": "up"}, "tcp": {port: {"state": "open", "name": "ssh"}}}},
+    }
+
+
+def test_shard_targets_splits_wide_ipv4_cidrs():
+    assert shard_targets("10.0.0.0/22") == ["10.0.0.0/24", "10.0.1.0/24", "10.0.2.0/24", "10.0.3.0/24"]
+    assert shard_targets("10.0.0.0/23", prefix=25) == [
+        "10.0.0.0/25", "10.0.0.128/25", "10.0.1.0/25", "10.0.1.128/25",
+    ]
+
+
+def test_shard_targets_keeps_other_parts_whole():
+    targets = "10.0.0.0/24 10.0.5.7 10.0.1,3.5 10.0.0.1-20 scanme.example 2001:db8::/64"
+    assert shard_targets(targets) == targets.split()
+    assert shard_targets("10.0.0.0/16", prefix=0) == ["10.0.0.0/16"]
+
+
+def test_merge_scan_results_sums_stats_and_unions_hosts():
+    merged = merge_scan_results([_raw("10.0.0.1", 22, elapsed="3.50"), _raw("10.0.1.1", 22, uphosts=2)])
+    assert set(merged["scan"]) == {"10.0.0.1", "10.0.1.1"}
+    assert merged["nmap"]["scanstats"] == {"uphosts": "3", "downhosts": "0", "totalhosts": "3", "elapsed": "3.50"}
+    assert merged["nmap"]["command_line"] == "nmap -n -sT -sV --open"
+    assert merge_scan_results([])["scan"] == {}
+
+
+@pytest.fixture
+def flaky_nmap(monkeypatch):
+    """scan_targets stand-in: 10.0.1.0/24 always fails, 10.0.2.0/24 fails once."""
+    calls = {}
+    monkeypatch.setattr(drift_detector, "RETRY_BACKOFF_S", 0)
+
+    def fake_scan(targets, ports, timeout):
+        calls[targets] = calls.get(targets, 0) + 1
+        if targets == "10.0.1.0/24" or (targets == "10.0.2.0/24" and calls[targets] == 1):
+            raise RuntimeError("Nmap timed out: boom")
+        return _raw(targets.replace("0/24", "1"), ports[0])
+
+    monkeypatch.setattr(drift_detector, "scan_targets", fake_scan)
+    return calls
+
+
+def test_run_scan_jobs_retries_then_reports_partial(flaky_nmap):
+    raw, failed = run_scan_jobs([(f"10.0.{i}.0/24", [22]) for i in range(3)], timeout=5, workers=3, retries=2)
+    assert set(raw["scan"]) == {"10.0.0.1", "10.0.2.1"}
+    assert failed == [ShardFailure("10.0.1.0/24", 3, "Nmap timed out: boom")]
+    assert flaky_nmap == {"10.0.0.0/24": 1, "10.0.1.0/24": 3, "10.0.2.0/24": 2}
+
+
+def test_scan_sharded_without_retries(flaky_nmap):
+    raw, failed = scan_sharded("10.0.0.0/22", [22], timeout=5, retries=0)
+    assert [f.shard for f in failed] == ["10.0.1.0/24", "10.0.2.0/24"]
+    assert all(f.attempts == 1 for f in failed)
+    assert set(raw["scan"]) == {"10.0.0.1", "10.0.3.1"}
+
+
+def _closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_tcp_prescan_finds_local_listeners():
+    async def scenario():
+        servers = [await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0) for _ in range(2)]
+        open_ports = sorted(srv.sockets[0].getsockname()[1] for srv in servers)
+        try:
+            found = await tcp_prescan(["127.0.0.1"], open_ports + [_closed_port()], concurrency=2, connect_timeout=1.0)
+        finally:
+            for srv in servers:
+                srv.close()
+                await srv.wait_closed()
+        return open_ports, found
+
+    open_ports, found = asyncio.run(scenario())
+    assert found == {"127.0.0.1": open_ports}
+
+
+def test_tcp_prescan_reports_nothing_for_closed_ports():
+    assert asyncio.run(tcp_prescan(iter(["127.0.0.1"]), [_closed_port()], connect_timeout=0.5)) == {}
+
+
+def test_prescan_jobs_groups_hosts_by_port_set():
+    open_ports = {
+        "10.0.0.1": [22, 443],
+        "10.0.0.2": [22, 443],
+        "10.0.0.3": [22, 443],
+        "10.0.0.4": [80],
+    }
+    assert prescan_jobs(open_ports, hosts_per_job=2) == [
+        ("10.0.0.1 10.0.0.2", [22, 443]),
+        ("10.0.0.3", [22, 443]),
+        ("10.0.0.4", [80]),
+    ]
+    assert prescan_jobs({}) == []
+
+
+def test_expand_hosts_cidrs_ranges_and_names():
+    assert list(expand_hosts("10.0.0.0/30 10.0.0.9/32")) == ["10.0.0.1", "10.0.0.2", "10.0.0.9"]
+    assert list(expand_hosts("10.0.1,3.5-6")) == ["10.0.1.5", "10.0.1.6", "10.0.3.5", "10.0.3.6"]
+    assert list(expand_hosts("scanme.example 2001:db8::/127")) == ["scanme.example", "2001:db8::", "2001:db8::1"]
+
+
+def test_expand_hosts_open_ended_octets():
+    assert len(list(expand_hosts("10.0.0.-"))) == 256
+    assert list(expand_hosts("10.0.0.253-")) == ["10.0.0.253", "10.0.0.254", "10.0.0.255"]
+    assert list(expand_hosts("10.0.0.-1")) == ["10.0.0.0", "10.0.0.1"]
+    with pytest.raises(ValueError):
+        list(expand_hosts("10.0.0.9-3"))
+
+
+def test_expand_hosts_is_lazy_and_bounded_for_ipv6():
+    assert list(itertools.islice(expand_hosts("10.0.0.0/8"), 2)) == ["10.0.0.1", "10.0.0.2"]
+    with pytest.raises(ValueError, match="too large"):
+        next(expand_hosts("2001:db8::/64"))
+
+
+def test_diff_indexes_classifies_changes():
+    baseline = {("10.0.0.1", "tcp", 22): ("ssh", "OpenSSH", "8.9"), ("10.0.0.1", "tcp", 80): ("http", None, None)}
+    current = {("10.0.0.1", "tcp", 22): ("ssh", "OpenSSH", "9.6"), ("10.0.0.2", "tcp", 443): ("https", None, None)}
+    changes = diff_indexes(baseline, current)
+    assert [(c.kind, c.host, c.port) for c in changes] == [
+        ("changed", "10.0.0.1", 22), ("closed", "10.0.0.1", 80), ("opened", "10.0.0.2", 443),
+    ]
+    assert changes[0].changed_fields == ("version",)
+
+
+def test_diff_only_closes_ports_on_scanned_hosts():
+    baseline = {
+        ("10.0.0.5", "tcp", 22): ("ssh", None, None),  # in targets, gone -> closed
+        ("10.0.1.5", "tcp", 22): ("ssh", None, None),  # in the failed shard
+        ("10.9.0.5", "tcp", 22): ("ssh", None, None),  # outside this run's targets
+    }
+    failed = [ShardFailure("10.0.1.0/24", 2, "timeout")]
+    unscanned = unscanned_matcher(failed, "10.0.0.0/24 10.0.1.0/24")
+    assert [(c.kind, c.host) for c in diff_indexes(baseline, {}, unscanned)] == [("closed", "10.0.0.5")]
+    assert not unscanned_matcher([], "10.0.0.0/16")("10.0.3.1")
+    assert len(diff_indexes(baseline, {}, unscanned_matcher([]))) == 3
+
+
+def test_baseline_round_trip(tmp_path):
+    findings = [
+        Finding("10.0.0.2", 443, "tcp", "https", "open", "nginx", "1.25"),
+        Finding("10.0.0.1", 80, "tcp", "http", "open", "Apache\thttpd", "2.4\n(Ubuntu)"),
+        Finding("10.0.0.1", 22, "tcp", "ssh", "open", None, None),
+        Finding("10.0.0.1", 53, "udp", "domain", "filtered"),
+    ]
+    path = tmp_path / "baseline.tsv"
+    save_baseline(path, findings)
+
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    assert lines[0] == BASELINE_HEADER
+    assert len(lines) == 5  # tab/newline in fields cannot split a row
+    assert not (tmp_path / "baseline.tsv.tmp").exists()
+
+    assert load_findings(path) == [
+        Finding("10.0.0.1", 22, "tcp", "ssh", "open", None, None),
+        Finding("10.0.0.1", 80, "tcp", "http", "open", "Apache httpd", "2.4 (Ubuntu)"),
+        Finding("10.0.0.1", 53, "udp", "domain", "filtered", None, None),
+        Finding("10.0.0.2", 443, "tcp", "https", "open", "nginx", "1.25"),
+    ]
+    assert load_index(path) == {
+        ("10.0.0.1", "tcp", 22): ("ssh", None, None),
+        ("10.0.0.1", "tcp", 80): ("http", "Apache httpd", "2.4 (Ubuntu)"),
+        ("10.0.0.2", "tcp", 443): ("https", "nginx", "1.25"),
+    }
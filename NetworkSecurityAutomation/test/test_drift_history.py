@@ -0,0 +1,108 @@
+# test_drift_history.py
+import json
+
+import pytest
+
+pytest.importorskip("nmap")
+
+from drift_detector import Finding
+from drift_history import HistoryStore
+
+
+def _open(host, port, service="ssh"):
+    return Finding(host, port, "tcp", service, "open")
+
+
+@pytest.fixture
+def store(tmp_path):
+    with HistoryStore(tmp_path / "history.db") as s:
+        yield s
+
+
+def test_ingest_records_open_findings_only(store):
+    run_id = store.ingest(
+        [_open("10.0.0.1", 22), Finding("10.0.0.1", 23, "tcp", "telnet", "filtered")],
+        "10.0.0.0/24",
+        scanned_at="2026-01-01T00:00:00+00:00",
+        partial=True,
+    )
+    assert store.conn.execute("SELECT targets, partial, findings FROM runs WHERE run_id = ?", (run_id,)).fetchone() == (
+        "10.0.0.0/24", 1, 1,
+    )
+    assert store.conn.execute("SELECT host, port FROM observations").fetchall() == [("10.0.0.1", 22)]
+
+
+def test_first_open_and_port_history(store):
+    store.ingest([_open("10.0.0.1", 22)], "10.0.0.0/24", "2026-01-01T00:00:00+00:00")
+    store.ingest([_open("10.0.0.1", 22), _open("10.0.0.1", 443, "https")], "10.0.0.0/24", "2026-01-02T00:00:00+00:00")
+    store.ingest([], "10.0.5.0/24", "2026-01-03T00:00:00+00:00")  # did not cover 10.0.0.1
+    store.ingest([_open("10.0.0.1", 22)], "10.0.0.1", "2026-01-04T00:00:00+00:00")
+
+    assert store.first_open("10.0.0.1", 443) == "2026-01-02T00:00:00+00:00"
+    assert store.first_open("10.0.0.1", 3389) is None
+    assert store.port_history("10.0.0.1", 443) == [
+        ("2026-01-01T00:00:00+00:00", False),
+        ("2026-01-02T00:00:00+00:00", True),
+        ("2026-01-04T00:00:00+00:00", False),
+    ]
+
+
+def test_exposure_over_time(store):
+    store.ingest([_open("10.0.0.1", 22), _open("10.0.0.2", 22)], "10.0.0.0/24", "2026-01-01T00:00:00+00:00")
+    store.ingest([_open("10.0.0.1", 22), _open("10.0.0.1", 80, "http")], "10.0.0.0/24", "2026-01-02T00:00:00+00:00")
+    store.ingest([], "10.0.0.0/24", "2026-01-03T00:00:00+00:00", partial=True)
+
+    rows = store.exposure_over_time()
+    assert [(r["open_ports"], r["hosts"], r["partial"]) for r in rows] == [(2, 2, False), (2, 1, False), (0, 0, True)]
+    assert [r["open_ports"] for r in store.exposure_over_time(port=80)] == [0, 1, 0]
+    assert [r["scanned_at"] for r in store.exposure_over_time(since="2026-01-02")] == [
+        "2026-01-02T00:00:00+00:00", "2026-01-03T00:00:00+00:00",
+    ]
+
+
+def test_ingest_report_backfills_json(store, tmp_path):
+    report = tmp_path / "scan.json"
+    report.write_text(json.dumps({
+        "scanned_at": "2026-01-05T00:00:00+00:00",
+        "targets": "10.0.0.0/24",
+        "partial": True,
+        "failed_shards": [{"shard": "10.0.1.0/24", "attempts": 3, "error": "Nmap timed out"}],
+        "findings": [{"host": "10.0.0.3", "port": 22, "proto": "tcp", "service": "ssh", "state": "open"}],
+    }), encoding="utf-8")
+    run_id = store.ingest_report(report)
+    assert store.first_open("10.0.0.3", 22) == "2026-01-05T00:00:00+00:00"
+    assert store.conn.execute("SELECT failed_shards FROM runs WHERE run_id = ?", (run_id,)).fetchone() == (
+        "10.0.1.0/24",
+    )
+
+
+def test_partial_runs_skip_hosts_in_failed_shards(store):
+    store.ingest([_open("10.0.0.1", 22), _open("10.0.1.5", 22)], "10.0.0.0/23", "2026-01-01T00:00:00+00:00")
+    store.ingest([], "10.0.0.0/23", "2026-01-02T00:00:00+00:00", failed_shards=["10.0.1.0/24"])
+    store.ingest([_open("10.0.1.5", 22)], "10.0.0.0/23", "2026-01-03T00:00:00+00:00")
+
+    assert store.conn.execute("SELECT partial, failed_shards FROM runs WHERE run_id = 2").fetchone() == (
+        1, "10.0.1.0/24",
+    )
+    # 10.0.0.1 was scanned and found closed; 10.0.1.5 sat in the failed shard
+    assert store.port_history("10.0.0.1", 22) == [
+        ("2026-01-01T00:00:00+00:00", True),
+        ("2026-01-02T00:00:00+00:00", False),
+        ("2026-01-03T00:00:00+00:00", False),
+    ]
+    assert store.port_history("10.0.1.5", 22) == [
+        ("2026-01-01T00:00:00+00:00", True),
+        ("2026-01-03T00:00:00+00:00", True),
+    ]
+    rows = store.exposure_over_time(port=22)
+    assert [(r["open_ports"], r["hosts"], r["carried_hosts"]) for r in rows] == [(2, 2, 0), (1, 1, 1), (1, 1, 0)]
+
+
+def test_partial_run_without_failed_shards_only_vouches_for_returned_hosts(store):
+    store.ingest([_open("10.0.0.1", 22)], "10.0.0.0/24", "2026-01-01T00:00:00+00:00")
+    store.ingest([_open("10.0.0.2", 80, "http")], "10.0.0.0/24", "2026-01-02T00:00:00+00:00", partial=True)
+    assert store.port_history("10.0.0.1", 22) == [("2026-01-01T00:00:00+00:00", True)]
+    assert store.port_history("10.0.0.2", 22) == [
+        ("2026-01-01T00:00:00+00:00", False),
+        ("2026-01-02T00:00:00+00:00", False),
+    ]
@@ -0,0 +1,81 @@
+# test_drift_scheduler.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("nmap")
+
+from drift_detector import Finding
+from drift_history import HistoryStore
+from drift_scheduler import AdaptiveScheduler, host_stats, hosts_scanned_since, rescan_interval
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _ts(hours):
+    return (T0 + timedelta(hours=hours)).isoformat(timespec="seconds")
+
+
+def _open(host, port):
+    return Finding(host, port, "tcp", "ssh", "open")
+
+
+@pytest.fixture
+def store(tmp_path):
+    with HistoryStore(tmp_path / "history.db") as s:
+        yield s
+
+
+def test_hosts_without_open_ports_are_stable(store):
+    for day in range(10):
+        store.ingest([_open("10.0.0.1", 22)], "10.0.0.0/29", _ts(24 * day))
+    stats = host_stats(store)
+
+    assert set(stats) == {f"10.0.0.{i}" for i in range(1, 7)}
+    assert all(s.runs == 10 and s.changes == 0 for s in stats.values())
+    assert stats["10.0.0.2"].last_seen == (T0 + timedelta(days=9)).timestamp()
+
+    now = (T0 + timedelta(days=9, hours=1)).timestamp()
+    assert AdaptiveScheduler(stats, now=now).plan(now) == []
+
+
+def test_closing_all_ports_counts_as_a_change(store):
+    store.ingest([_open("10.0.0.1", 22)], "10.0.0.0/30", _ts(0))
+    store.ingest([], "10.0.0.0/30", _ts(1))
+    store.ingest([], "10.0.5.0/30", _ts(2))  # did not cover 10.0.0.1
+    store.ingest([_open("10.0.0.9", 22)], "10.0.0.9", _ts(3), partial=True)
+
+    s = host_stats(store)["10.0.0.1"]
+    assert (s.runs, s.changes, s.last_seen) == (2, 1, (T0 + timedelta(hours=1)).timestamp())
+    assert host_stats(store)["10.0.0.9"].runs == 1
+
+
+def test_volatile_hosts_are_rescanned_sooner(store):
+    for day in range(8):
+        flapping = [_open("10.0.0.2", 22)] if day % 2 else []
+        store.ingest([_open("10.0.0.1", 22), *flapping], "10.0.0.1 10.0.0.2", _ts(24 * day))
+    stats = host_stats(store)
+    stable, volatile = stats["10.0.0.1"], stats["10.0.0.2"]
+    assert (stable.changes, volatile.changes) == (0, 7)
+    assert rescan_interval(volatile) < rescan_interval(stable)
+
+    # both last seen at day 7; only the volatile host is due a day later
+    now = (T0 + timedelta(days=8)).timestamp()
+    scheduler = AdaptiveScheduler(stats, now=now)
+    assert [p.hosts for p in scheduler.plan(now)] == [("10.0.0.2",)]
+    # once both are due, the volatile host (due earlier) is planned first
+    later = stable.last_seen + rescan_interval(stable)
+    assert [p.hosts for p in scheduler.plan(later)] == [("10.0.0.2", "10.0.0.1")]
+
+
+def test_rate_limit_carries_over_between_invocations(store):
+    store.ingest([], "10.0.0.0/29", _ts(0))  # 6 hosts
+    now = (T0 + timedelta(minutes=30)).timestamp()
+    used = hosts_scanned_since(store, now - 3600)
+    assert used == 6
+    assert hosts_scanned_since(store, now + 1) == 0
+
+    scheduler = AdaptiveScheduler({}, [f"10.1.0.{i}" for i in range(1, 21)], 10, now=now, used_last_hour=used)
+    plans = scheduler.plan(now)
+    assert sum(len(p.hosts) for p in plans) == 4
+    assert scheduler.plan(now) == []
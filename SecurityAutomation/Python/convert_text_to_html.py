@@ -7,17 +7,58 @@ Features:
  Groups normal lines into paragraphs (<p>)
  Detects code/log lines (Indented or Windows paths with backslashes) and wraps them in <pre>
  Escapes HTML characters
+ Streams fragments (iter_html_fragments) or URL-encoded size-bounded chunks (iter_html_chunks)
 """
 
+from functools import partial
 from html import escape
+from multiprocessing import Pool
+import argparse
+import json
+import os
 import re 
+import sys
+import threading
+import time
 import urllib.parse
+from typing import Any, Iterable, Iterator, TextIO
 # Import some test text
 
+SECTION_SPLIT_RE = re.compile(r'(?m)^[ \t]*-{3,}[ \t]*$')
+LEADING_SPACE_RE = re.compile(r"^\s")
+WINDOWS_DRIVE_RE = re.compile(r"[A-Za-z]:\\")
+KEY_VALUE_RE = re.compile(r"^([^:]+):\s*(.)$")
+# Units an oversized element may be split into: whole entities or short text runs
+ESCAPED_UNIT_RE = re.compile(r"&#?\w+;|[^&]{1,32}|&")
+DEFINITION_RE = re.compile(r"<dt>.*?</dd>", re.DOTALL)
+DEFINITION_PART_RE = re.compile(r"<(dt|dd)>(.*?)</\1>", re.DOTALL)
+RULEBLOCK_RE = re.compile(r'Rule Block 1 Raw Logs.*', re.DOTALL)
+
+HTML_HEAD = (
+    "<!doctype html><html><head>"
+    "<meta charset='utf-8'><meta name='viewport' content='width=device-width,initial-scale=1'>"
+    "</head><body>"
+)
+HTML_TAIL = "</body></html>"
+
+# Default limit for the URL-encoded html body of a single chunk
+DEFAULT_ENCODED_BUDGET = 8000
+
+# Bytes quote_plus leaves as one character (space becomes "+"); every other byte becomes %XX
+_QUOTE_SAFE_BYTES = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~ "
+
 
 def split_sections(text: str) -> list[str]:
     """Split into sections on lines that contain only --- (with optional surrounding spaces)"""
-    return re.split(r'(?m)^[ \t]*-{3,}[ \t]*$', text)
+    return SECTION_SPLIT_RE.split(text)
+
+def iter_sections(text: str) -> Iterator[str]:
+    """Lazy version of split_sections."""
+    start = 0
+    for match in SECTION_SPLIT_RE.finditer(text):
+        yield text[start:match.start()]
+        start = match.end()
+    yield text[start:]
 
 def extract_title_and_body(lines: list[str]) -> tuple[str | None, list[str]]:
     """Extract the first non-empty line as the title and the rest as body lines"""
@@ -26,121 +67,302 @@ def extract_title_and_body(lines: list[str]) -> tuple[str | None, list[str]]:
             return line.strip(), lines[i + 1: ]
     return None, []
 
+def render_block(tag: str, inner: str) -> str:
+    """Wrap already-escaped inner HTML in its element."""
+    if tag == "hr":
+        return "<hr />"
+    return f"<{tag}>{inner}</{tag}>"
+
 def flush_paragraph(buffer: list[str], html_parts: list[str]) -> None:
     """Flush paragragh buffer into HTML and clear it."""
     if buffer:
         para_text = " ".join(line.strip() for line in buffer)
-        html_parts.append(f"<p>{escape(para_text)}</p>")
+        html_parts.append(render_block("p", escape(para_text)))
         buffer.clear()
 
 def flush_pre(pre_lines: list[str], html_parts: list[str]) -> None:
     """Flush preformatted block into HTML and clear it."""
     if pre_lines:
-        html_parts.append(f"<pre>{escape('\n'.join(pre_lines))}</pre>")
+        html_parts.append(render_block("pre", escape("\n".join(pre_lines))))
         pre_lines.clear()
 
 
 def is_code_like(line: str) -> bool:
     """Check if a line looks like code/log output or a Windows path."""
-    return (
-        re.match(r"^\s",line)
-        or re.search(r"[A-Za-z]:\\", line)
+    return bool(
+        LEADING_SPACE_RE.match(line)
+        or WINDOWS_DRIVE_RE.search(line)
         or "\\\\" in line 
         or line.strip().startswith("C:")
     )
 
-def process_body_lines(body_lines: list[str]) -> list[str]:
-    """Convert body lines into simplified HTML."""
-    sec_html = []
+def iter_body_blocks(body_lines: list[str]) -> Iterator[tuple[str, str]]:
+    """
+    Yield (tag, escaped inner HTML) for each element of a section body.
+    Definition lists are yielded whole so a block never spans a chunk.
+    """
     buffer_para = []
     pre_lines = []
-    in_pre = False
-    dl_open = False
+    definitions = []
 
     for line in body_lines:
         if is_code_like(line):
-            flush_paragraph(buffer_para, sec_html)
-            if dl_open:
-                sec_html.append("</dl>")
-                dl_open = False
+            if buffer_para:
+                yield "p", escape(" ".join(l.strip() for l in buffer_para))
+                buffer_para.clear()
+            if definitions:
+                yield "dl", "".join(definitions)
+                definitions.clear()
             pre_lines.append(line)
-            in_pre = True
             continue 
-        match = re.match(r"^([^:]+):\s*(.)$", line)
+        match = KEY_VALUE_RE.match(line)
         if match: 
-            flush_paragraph(buffer_para, sec_html)
-            if in_pre:
-                flush_pre(pre_lines, sec_html)
-                in_pre = False
-            if not dl_open:
-                sec_html.append("<dl>")
-                dl_open = True
+            if buffer_para:
+                yield "p", escape(" ".join(l.strip() for l in buffer_para))
+                buffer_para.clear()
+            if pre_lines:
+                yield "pre", escape("\n".join(pre_lines))
+                pre_lines.clear()
             key, val = match.group(1).strip(), match.group(2).strip()
-            sec_html.append(f"<dt>{escape(key)}</dt><dd>{escape(val)}</dd>")
+            definitions.append(f"<dt>{escape(key)}</dt><dd>{escape(val)}</dd>")
         else:
-            if dl_open:
-                sec_html.append("</dl>")
-                dl_open = False
+            if definitions:
+                yield "dl", "".join(definitions)
+                definitions.clear()
             buffer_para.append(line)
 
-    flush_paragraph(buffer_para, sec_html)
-    if in_pre:
-        flush_pre(pre_lines, sec_html)
-    if dl_open:
-        sec_html.append("</dl>")
-
-    return sec_html
+    if buffer_para:
+        yield "p", escape(" ".join(l.strip() for l in buffer_para))
+    if pre_lines:
+        yield "pre", escape("\n".join(pre_lines))
+    if definitions:
+        yield "dl", "".join(definitions)
 
-def convert_text_to_html(text: str) -> str:
-    """Main converter"""
-    sections = split_sections(text)
-    html_parts = []
+def process_body_lines(body_lines: list[str]) -> list[str]:
+    """Convert body lines into simplified HTML."""
+    return [render_block(tag, inner) for tag, inner in iter_body_blocks(body_lines)]
 
-    for sec in sections:
+def iter_html_blocks(text: str) -> Iterator[tuple[str, str]]:
+    """Yield (tag, escaped inner HTML) for every element of the document body."""
+    first = True
+    for sec in iter_sections(text):
         sec = sec.strip()
         if not sec: 
             continue
 
-        lines = sec.splitlines()
-        title, body_lines = extract_title_and_body(lines)
+        if not first:
+            yield "hr", ""
+        first = False
 
-        sec_html = []
+        title, body_lines = extract_title_and_body(sec.splitlines())
         if title:
-            sec_html.append(f"<h2>{escape(title)}</h2>")
-        sec_html.extend(process_body_lines(body_lines))
-        html_parts.append("".join(sec_html))
-
-    return (
-        "<!doctype html><html><head>" \
-        "<meta charset='utf-8'><meta name='viewport' content='width=device-width,initial-scale=1'>"
-        "</head><body>"
-        + "<hr />".join(html_parts) + 
-        "</body></html>"
-    )
+            yield "h2", escape(title)
+        yield from iter_body_blocks(body_lines)
+
+def iter_html_fragments(text: str) -> Iterator[str]:
+    """Generator form of convert_text_to_html: yields the document piece by piece."""
+    yield HTML_HEAD
+    for tag, inner in iter_html_blocks(text):
+        yield render_block(tag, inner)
+    yield HTML_TAIL
+
+def convert_text_to_html(text: str) -> str:
+    """Main converter"""
+    return "".join(iter_html_fragments(text))
+
+def encoded_length(html_body: str) -> int:
+    """Length of the html body once URL-encoded as a form field."""
+    return len(urllib.parse.urlencode({"html": html_body}))
 
 def check_html_body_length(html_body: str):
     """Checks the length of html body"""
-    query = urllib.parse.urlencode({"html": html_body})
-    print(f"Converted HTML: {len(query)}")
+    print(f"Converted HTML: {encoded_length(html_body)}")
+
+def _quoted_length(fragment: str) -> int:
+    """len(urllib.parse.quote_plus(fragment)) without building the quoted string."""
+    raw = fragment.encode("utf-8")
+    return len(raw) + 2 * len(raw.translate(None, _QUOTE_SAFE_BYTES))
+
+def _pack(units: list[str], room: int) -> Iterator[str]:
+    """Concatenate consecutive units into runs whose quoted length stays within room."""
+    piece, size = [], 0
+    for unit in units:
+        n = _quoted_length(unit)
+        if piece and size + n > room:
+            yield "".join(piece)
+            piece, size = [], 0
+        piece.append(unit)
+        size += n
+    if piece:
+        yield "".join(piece)
+
+def _definition_units(inner: str, room: int) -> list[str]:
+    """<dt>…</dd> pairs of a definition list; a pair larger than room is split into several <dt>/<dd> elements."""
+    units = []
+    for unit in DEFINITION_RE.findall(inner):
+        if _quoted_length(unit) <= room:
+            units.append(unit)
+            continue
+        for part_tag, text in DEFINITION_PART_RE.findall(unit):
+            part_room = room - _quoted_length(render_block(part_tag, ""))
+            units.extend(render_block(part_tag, p) for p in _pack(ESCAPED_UNIT_RE.findall(text), part_room))
+    return units
+
+def _fit_block(tag: str, inner: str, budget: int) -> Iterator[str]:
+    """Render a block, splitting it into several same-tag elements if it exceeds budget."""
+    html = render_block(tag, inner)
+    if _quoted_length(html) <= budget:
+        yield html
+        return
+
+    room = budget - _quoted_length(render_block(tag, ""))
+    units = _definition_units(inner, room) if tag == "dl" else ESCAPED_UNIT_RE.findall(inner)
+    for piece in _pack(units, room):
+        yield render_block(tag, piece)
+
+def iter_html_chunks(text: str, max_encoded_length: int = DEFAULT_ENCODED_BUDGET) -> Iterator[str]:
+    """
+    Convert text into standalone HTML documents whose URL-encoded length
+    (see encoded_length) stays within max_encoded_length. Chunks break
+    between elements; an element larger than the budget on its own is
+    split into several elements of the same tag.
+    """
+    budget = max_encoded_length - encoded_length(HTML_HEAD + HTML_TAIL)
+    if budget <= 0:
+        raise ValueError(f"max_encoded_length {max_encoded_length} is smaller than the HTML wrapper")
+
+    parts, size = [], 0
+    for tag, inner in iter_html_blocks(text):
+        for fragment in _fit_block(tag, inner, budget):
+            n = _quoted_length(fragment)
+            if parts and size + n > budget:
+                yield HTML_HEAD + "".join(parts) + HTML_TAIL
+                parts, size = [], 0
+            parts.append(fragment)
+            size += n
+    if parts:
+        yield HTML_HEAD + "".join(parts) + HTML_TAIL
 
 def clean_text_from_ruleblock(text: str):
     """An incident detail often has a ruleblock text in it. Sometimes this are not required to include in the html body"""
-    pattern = re.compile(r'(Rule Block\s+\d+\s+Raw\s+Logs)\n?(.*?)\n(?=Rule Block|\Z)', re.DOTALL)
-    data = re.search(pattern, text)
-    return re.sub(r'Rule Block 1 Raw Logs.*', '', text, flags=re.DOTALL)
+    return RULEBLOCK_RE.sub('', text)
 
 def chunk_text(text: str, chunksize: int = 1600) -> list:
     """Chunk Text to convert to html body"""
     return [text[i: i+chunksize] for i in range(0, len(text), chunksize)]
 
+def render_note(note: dict[str, Any], text_field: str = "text", strip_ruleblock: bool = False,
+                max_encoded_length: int | None = None) -> dict[str, Any]:
+    """Convert one incident note ({"incident_id": ..., "text": ...}) to HTML."""
+    incident_id = note.get("incident_id", note.get("id"))
+    text = note.get(text_field)
+    if not isinstance(text, str):
+        return {"incident_id": incident_id, "error": f"note has no '{text_field}' string"}
+
+    if strip_ruleblock:
+        text = clean_text_from_ruleblock(text)
+    text = text.strip()
+    if max_encoded_length:
+        return {"incident_id": incident_id, "html_chunks": list(iter_html_chunks(text, max_encoded_length))}
+    return {"incident_id": incident_id, "html": convert_text_to_html(text)}
+
+def _render_line(line: str, **options) -> tuple[str, int, bool]:
+    try:
+        result = render_note(json.loads(line), **options)
+    except (json.JSONDecodeError, AttributeError) as e:
+        result = {"incident_id": None, "error": f"invalid note: {e}"}
+    return json.dumps(result), len(line), "error" in result
+
+def render_notes_batch(lines: Iterable[str], out: TextIO, workers: int | None = None,
+                       batch_size: int = 64, streaming: bool = False, **options) -> dict[str, float]:
+    """
+    Render a stream of JSONL notes with a worker pool, writing one JSON
+    result per line in input order. Workers live for the whole run, so
+    interpreter startup and pattern compilation are paid once per worker
+    rather than once per note. Returns throughput metrics.
+
+    Notes are handed to workers `batch_size` at a time, and at most a few
+    batches per worker are read ahead of the output. With streaming=True
+    (a long-lived pipe) each note is dispatched on its own and its result
+    is flushed as soon as it is ready.
+    """
+    started = time.perf_counter()
+    notes = errors = input_chars = output_chars = 0
+    render = partial(_render_line, **options)
+    chunksize = 1 if streaming else max(1, batch_size)
+    # imap's feeder thread would otherwise read the whole input ahead of the workers
+    read_ahead = threading.BoundedSemaphore(2 * (workers or os.cpu_count() or 1) * chunksize)
+    # set when the output loop exits, so a feeder waiting for a slot stops
+    # instead of blocking Pool.terminate() forever (e.g. BrokenPipeError)
+    stop = threading.Event()
+
+    def pending_lines() -> Iterator[str]:
+        for line in lines:
+            if line.strip():
+                while not read_ahead.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                yield line
+
+    with Pool(processes=workers) as pool:
+        try:
+            for result, size, failed in pool.imap(render, pending_lines(), chunksize=chunksize):
+                read_ahead.release()
+                out.write(result + "\n")
+                if streaming:
+                    out.flush()
+                notes += 1
+                errors += failed
+                input_chars += size
+                output_chars += len(result)
+        finally:
+            stop.set()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "notes": notes,
+        "errors": errors,
+        "input_chars": input_chars,
+        "output_chars": output_chars,
+        "elapsed_s": round(elapsed, 3),
+        "notes_per_s": round(notes / elapsed, 1) if elapsed else 0.0,
+    }
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert plain-text incident notes to HTML")
+    parser.add_argument("--batch", metavar="NOTES_JSONL",
+                        help="JSONL of notes to convert ('-' for stdin); omit to convert the sample text")
+    parser.add_argument("--output", default="-", help="JSONL output for --batch ('-' for stdout)")
+    parser.add_argument("--text-field", default="text", help="Field holding the note text")
+    parser.add_argument("--strip-ruleblock", action="store_true", help="Apply clean_text_from_ruleblock first")
+    parser.add_argument("--max-encoded-length", type=int, default=None,
+                        help="Emit html_chunks within this URL-encoded length instead of one html body")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.batch:
+        source = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8")
+        sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        with source, sink:
+            metrics = render_notes_batch(
+                source, sink, workers=args.workers, streaming=args.batch == "-", text_field=args.text_field,
+                strip_ruleblock=args.strip_ruleblock, max_encoded_length=args.max_encoded_length,
+            )
+        print(json.dumps(metrics), file=sys.stderr)
+        raise SystemExit(0)
+
     sample_text = """<Write your escalation notes here to convert to html>"""
     html = convert_text_to_html(sample_text.strip())
     with open(f"escalation_notes.html", "w", encoding='utf-8') as f:
         f.write(html)
 
 
-    ### Chunk option:
+    ### Chunk option (HTML, split between elements):
+    # for idx, chunk in enumerate(iter_html_chunks(sample_text.strip()), start=1):
+    #     with open(f"escalation_{idx}.html", "w", encoding="utf-8") as f:
+    #         f.write(chunk)
+
+    ### Chunk option (plain text):
     # chunks = chunk_text(sample_text)
     # first option:
     # for idx, item in enumerate(chunks, start=1):
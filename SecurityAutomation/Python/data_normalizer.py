@@ -1,7 +1,16 @@
+import argparse
+import difflib
+import hashlib
 import json
+import math
+import os
+import random
 import re
-from datetime import datetime
-from ipaddress import ip_address
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from ipaddress import IPv4Address, ip_address
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 # Canonical field mapping
 FIELD_MAP = {
@@ -13,6 +22,17 @@ FIELD_MAP = {
     "port": ["port", "Port"]
 }
 
+# Byte size of each JSONL slice handed to a worker process
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Rows per record batch when writing Parquet / Arrow IPC output
+DEFAULT_BATCH_SIZE = 65536
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Upper bound on distinct unknown keys tracked by the schema profiler
+DEFAULT_MAX_PROFILED_KEYS = 10000
+
 def normalize_timestamp(value: str):
     formats = [
         "%Y/%m/%d %H:%M:%S",
@@ -63,13 +83,307 @@ def normalize_record(record: dict):
 def normalize_logs(logs: list):
     return [normalize_record(log) for log in logs]
 
+def find_chunk_offsets(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple[int, int]]:
+    """Split a JSONL file into (start, end) byte ranges that end on a newline."""
+    size = os.path.getsize(path)
+    offsets = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                # move the boundary forward to the end of the line it falls in
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            offsets.append((start, end))
+            start = end
+    return offsets
+
+def _normalize_chunk_records(task: Tuple[str, int, int]) -> List[Dict[str, Any]]:
+    path, start, end = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return [normalize_record(json.loads(line)) for line in data.splitlines() if line.strip()]
+
+def _normalize_chunk(task: Tuple[str, int, int]) -> Tuple[int, str]:
+    records = _normalize_chunk_records(task)
+    # serialize in the worker so only one string crosses the process boundary
+    return len(records), "".join(f"{json.dumps(r)}\n" for r in records)
+
+def _run_chunks(worker, input_path: str, workers: Optional[int], chunk_size: int, ordered: bool) -> Iterator:
+    tasks = [(input_path, start, end) for start, end in find_chunk_offsets(input_path, chunk_size)]
+    with Pool(processes=workers) as pool:
+        results = pool.imap(worker, tasks) if ordered else pool.imap_unordered(worker, tasks)
+        yield from results
+
+def iter_normalized_jsonl(input_path: str, workers: Optional[int] = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE, ordered: bool = True) -> Iterator[Dict[str, Any]]:
+    """Yield normalized records from a JSONL file, normalized across worker processes."""
+    for records in _run_chunks(_normalize_chunk_records, input_path, workers, chunk_size, ordered):
+        yield from records
+
+def normalize_jsonl_parallel(input_path: str, output_path: str, workers: Optional[int] = None,
+                             chunk_size: int = DEFAULT_CHUNK_SIZE, ordered: bool = True) -> int:
+    """
+    Normalize a JSONL file across worker processes and write JSONL output.
+    With ordered=False chunks are written as soon as they finish, so output
+    order follows completion order instead of input order.
+    """
+    total = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        for count, text in _run_chunks(_normalize_chunk, input_path, workers, chunk_size, ordered):
+            out.write(text)
+            total += count
+    return total
+
+def timestamp_to_ns(value: Any) -> Optional[int]:
+    """Epoch nanoseconds for an ISO timestamp (naive values are treated as UTC)."""
+    try:
+        dt = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - EPOCH) // timedelta(microseconds=1) * 1000
+
+def pack_ip(value: Any) -> Optional[bytes]:
+    """16-byte big-endian form of an IP; IPv4 is stored IPv4-mapped (::ffff:a.b.c.d)."""
+    try:
+        ip = ip_address(str(value))
+    except ValueError:
+        return None
+    if isinstance(ip, IPv4Address):
+        return b"\x00" * 10 + b"\xff\xff" + ip.packed
+    return ip.packed
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("Columnar output requires pyarrow (pip install pyarrow)") from e
+    return pa
+
+def arrow_schema():
+    pa = _require_pyarrow()
+    return pa.schema([
+        ("timestamp", pa.timestamp("ns", tz="UTC")),
+        ("source_ip", pa.binary(16)),
+        ("destination_ip", pa.binary(16)),
+        ("port", pa.int32()),
+        ("event_type", pa.string()),
+        ("username", pa.string()),
+    ])
+
+def records_to_batch(records: List[Dict[str, Any]]):
+    """Build a typed Arrow RecordBatch from normalize_record output."""
+    pa = _require_pyarrow()
+    schema = arrow_schema()
+    ports = []
+    for r in records:
+        port = r.get("port")
+        ports.append(port if isinstance(port, int) and -2**31 <= port < 2**31 else None)
+
+    columns = [
+        [timestamp_to_ns(r["timestamp"]) if "timestamp" in r else None for r in records],
+        [pack_ip(r["source_ip"]) if "source_ip" in r else None for r in records],
+        [pack_ip(r["destination_ip"]) if "destination_ip" in r else None for r in records],
+        ports,
+        [None if r.get("event_type") is None else str(r["event_type"]) for r in records],
+        [None if r.get("username") is None else str(r["username"]) for r in records],
+    ]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+def write_columnar(records: Iterable[Dict[str, Any]], output_path: str, fmt: str = "parquet",
+                   batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Write normalized records as Parquet or Arrow IPC (fmt="arrow") in
+    batch_size record batches, so the input can be any iterator.
+    Arrow IPC files can be memory-mapped with pyarrow.memory_map.
+    """
+    pa = _require_pyarrow()
+    schema = arrow_schema()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(output_path, schema)
+    elif fmt == "arrow":
+        writer = pa.ipc.new_file(output_path, schema)
+    else:
+        raise ValueError(f"Unsupported columnar format: {fmt}")
+
+    total = 0
+    batch = []
+    with writer:
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                writer.write_batch(records_to_batch(batch))
+                total += len(batch)
+                batch = []
+        if batch:
+            writer.write_batch(records_to_batch(batch))
+            total += len(batch)
+    return total
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+class HyperLogLog:
+    """Fixed-size cardinality sketch: 2**precision one-byte registers."""
+
+    def __init__(self, precision: int = 12):
+        self.p = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, value: Any) -> None:
+        h = int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # small-range correction (linear counting)
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+def _value_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, list):
+        return "list"
+    if isinstance(value, dict):
+        return "dict"
+    return type(value).__name__
+
+def _squash_key(key: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", key.lower())
+
+def suggest_alias(key: str) -> Optional[str]:
+    """Canonical FIELD_MAP field an unmapped raw key most likely belongs to."""
+    candidates = {}
+    for canonical, variants in FIELD_MAP.items():
+        for name in [canonical, *variants]:
+            candidates.setdefault(_squash_key(name), canonical)
+
+    squashed = _squash_key(key)
+    if squashed in candidates:
+        return candidates[squashed]
+    match = difflib.get_close_matches(squashed, candidates.keys(), n=1, cutoff=0.8)
+    return candidates[match[0]] if match else None
+
+def profile_records(records: Iterable[Dict[str, Any]], sample_rate: float = 1.0,
+                    max_keys: int = DEFAULT_MAX_PROFILED_KEYS, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Single pass over raw records reporting keys that FIELD_MAP does not map.
+    Memory is bounded by max_keys: each tracked key keeps a counter, a small
+    type histogram and a HyperLogLog sketch of its distinct values.
+    """
+    known = {variant for variants in FIELD_MAP.values() for variant in variants}
+    rng = random.Random(seed)
+    seen = sampled = untracked = 0
+    counts: Counter = Counter()
+    types: Dict[str, Counter] = {}
+    sketches: Dict[str, HyperLogLog] = {}
+
+    for record in records:
+        seen += 1
+        if sample_rate < 1.0 and rng.random() >= sample_rate:
+            continue
+        sampled += 1
+        for key, value in record.items():
+            if key in known:
+                continue
+            if key not in counts:
+                if len(counts) >= max_keys:
+                    untracked += 1
+                    continue
+                types[key] = Counter()
+                sketches[key] = HyperLogLog()
+            counts[key] += 1
+            types[key][_value_type(value)] += 1
+            sketches[key].add(json.dumps(value, sort_keys=True, default=str))
+
+    unknown = []
+    for key, count in counts.most_common():
+        unknown.append({
+            "key": key,
+            "count": count,
+            "frequency": round(count / sampled, 4),
+            "types": dict(types[key]),
+            "approx_distinct": sketches[key].count(),
+            "suggested_field": suggest_alias(key),
+        })
+
+    return {
+        "records_seen": seen,
+        "records_sampled": sampled,
+        "untracked_occurrences": untracked,
+        "unknown_keys": unknown,
+    }
+
 if __name__ == "__main__":
-    with open("sample_logs.json", "r") as f:
-        logs = json.load(f)
+    parser = argparse.ArgumentParser(description="Normalize SIEM logs into canonical fields")
+    parser.add_argument("--input", default="sample_logs.json", help="JSON array file, or JSONL with --jsonl")
+    parser.add_argument("--output", default="normalized_logs.json", help="Output file")
+    parser.add_argument("--jsonl", action="store_true", help="Read/write JSONL and normalize in parallel")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Bytes per worker chunk")
+    parser.add_argument("--unordered", action="store_true", help="Write chunks in completion order")
+    parser.add_argument("--format", choices=["json", "parquet", "arrow"], default="json",
+                        help="Output format; parquet/arrow write typed columnar batches")
+    parser.add_argument("--profile", action="store_true",
+                        help="Report keys FIELD_MAP does not map instead of normalizing (JSONL input)")
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="Fraction of records to profile")
+    args = parser.parse_args()
+
+    if args.profile:
+        report = profile_records(iter_jsonl(args.input), sample_rate=args.sample_rate)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f" Profiled {report['records_sampled']} records, {len(report['unknown_keys'])} unknown keys. "
+              f"Saved to {args.output}")
+    elif args.format != "json":
+        if args.jsonl:
+            records = iter_normalized_jsonl(args.input, workers=args.workers,
+                                            chunk_size=args.chunk_size, ordered=not args.unordered)
+        else:
+            with open(args.input, "r") as f:
+                records = normalize_logs(json.load(f))
+        count = write_columnar(records, args.output, fmt=args.format)
+        print(f" Normalized {count} records. Saved to {args.output}")
+    elif args.jsonl:
+        count = normalize_jsonl_parallel(args.input, args.output, workers=args.workers,
+                                         chunk_size=args.chunk_size, ordered=not args.unordered)
+        print(f" Normalized {count} records. Saved to {args.output}")
+    else:
+        with open(args.input, "r") as f:
+            logs = json.load(f)
 
-    normalized = normalize_logs(logs)
+        normalized = normalize_logs(logs)
 
-    with open("normalized_logs.json", "w") as f:
-        json.dump(normalized, f, indent=4)
+        with open(args.output, "w") as f:
+            json.dump(normalized, f, indent=4)
 
-    print(f" Normalized {len(logs)} records. Saved to normalized_logs.json")
+        print(f" Normalized {len(logs)} records. Saved to {args.output}")
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import numpy as np
+from fastapi import FastAPI
+
+from .config import Settings, settings as default_settings
+from .features import extract_event_features
+from .models import DnsQueryEvent, ScoreResult
+from .scoring import score_block
+
+log = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """Latencies (seconds) of the last `size` observations."""
+
+    def __init__(self, size: int) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+
+    def summary(self) -> dict[str, float]:
+        if not self._samples:
+            return {"count": self.count, "p50_ms": 0.0, "p99_ms": 0.0}
+        p50, p99 = np.percentile(np.fromiter(self._samples, dtype=np.float64), [50, 99]) * 1000
+        return {"count": self.count, "p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3)}
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent score requests into one feature/scoring pass.
+
+    A batch closes when it holds `max_items` queries or `max_wait_ms` after
+    its first query arrived, whichever comes first; scoring runs in a worker
+    thread so the event loop keeps accepting requests meanwhile.
+    """
+
+    def __init__(self, cfg: Settings | None = None) -> None:
+        self.cfg = cfg or default_settings
+        self.max_items = self.cfg.score_batch_max_items
+        self.max_wait_s = self.cfg.score_batch_max_wait_ms / 1000
+        self._queue: asyncio.Queue[tuple[DnsQueryEvent, asyncio.Future[ScoreResult]]] = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+        self.batches = 0
+        self.batched_items = 0
+        self.batch_latency = LatencyWindow(self.cfg.score_latency_window)
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def score(self, events: list[DnsQueryEvent]) -> list[ScoreResult]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for event in events:
+            fut = loop.create_future()
+            self._queue.put_nowait((event, fut))
+            futures.append(fut)
+        return list(await asyncio.gather(*futures))
+
+    async def _collect(self) -> list[tuple[DnsQueryEvent, asyncio.Future[ScoreResult]]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait_s
+        while len(batch) < self.max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            events = [event for event, _ in batch]
+            t0 = time.perf_counter()
+            try:
+                results = await asyncio.to_thread(self._score_events, events)
+            except Exception as e:  # keep serving; fail just this batch
+                log.exception("scoring batch of %d failed", len(batch))
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batch_latency.observe(time.perf_counter() - t0)
+            self.batches += 1
+            self.batched_items += len(batch)
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():  # caller may have gone away
+                    fut.set_result(result)
+
+    def _score_events(self, events: list[DnsQueryEvent]) -> list[ScoreResult]:
+        return score_block(extract_event_features(events), self.cfg)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+            "scoring": self.batch_latency.summary(),
+        }
+
+
+def create_app(cfg: Settings | None = None) -> FastAPI:
+    cfg = cfg or default_settings
+    batcher = MicroBatcher(cfg)
+    request_latency = LatencyWindow(cfg.score_latency_window)
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI):
+        batcher.start()
+        yield
+        await batcher.stop()
+
+    app = FastAPI(title="DNS Automation Scoring", version="0.1.0", lifespan=lifespan)
+    app.state.batcher = batcher
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/score", response_model=ScoreResult | list[ScoreResult])
+    async def score(body: DnsQueryEvent | list[DnsQueryEvent]):
+        """Score one query or a list of queries; lists keep their order."""
+        t0 = time.perf_counter()
+        events = body if isinstance(body, list) else [body]
+        results = await batcher.score(events) if events else []
+        request_latency.observe(time.perf_counter() - t0)
+        return results if isinstance(body, list) else results[0]
+
+    @app.get("/metrics")
+    async def metrics():
+        return {"requests": request_latency.summary(), **batcher.stats()}
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from .config import Settings, settings as default_settings
+from .enrichment import DnsEnricher, DomainLookup
+from .models import Enrichment
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    lookup: DomainLookup
+    expires_at: float
+
+
+class EnrichmentCache:
+    """
+    LRU cache of DomainLookup results that expire with their DNS TTL.
+
+    NXDOMAIN answers are cached for `negative_ttl_s`. Lookups that produced
+    neither an answer nor NXDOMAIN (timeouts, SERVFAIL) are not cached, and
+    partial ones, where some record types failed, are kept no longer than
+    `negative_ttl_s` so the missing types are retried soon.
+    Expiry uses wall-clock time so entries persisted with save() stay
+    valid across restarts.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        negative_ttl_s: int = 300,
+        max_ttl_s: int = 86_400,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_entries = max_entries
+        self.negative_ttl_s = negative_ttl_s
+        self.max_ttl_s = max_ttl_s
+        self.clock = clock
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_settings(cls, cfg: Settings) -> EnrichmentCache:
+        return cls(cfg.cache_max_entries, cfg.cache_negative_ttl_s, cfg.cache_max_ttl_s)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, domain: str) -> DomainLookup | None:
+        entry = self._entries.get(domain)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= self.clock():
+            del self._entries[domain]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(domain)
+        self.hits += 1
+        if entry.lookup.nxdomain:
+            self.negative_hits += 1
+        return entry.lookup
+
+    def put(self, domain: str, lookup: DomainLookup) -> None:
+        if lookup.nxdomain:
+            ttl = self.negative_ttl_s
+        elif lookup.ttl is not None:
+            ttl = min(lookup.ttl, self.max_ttl_s)
+            if lookup.errors:
+                ttl = min(ttl, self.negative_ttl_s)
+        else:
+            return
+        if ttl <= 0:
+            return
+
+        self._entries[domain] = CacheEntry(lookup, self.clock() + ttl)
+        self._entries.move_to_end(domain)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def save(self, path: str | Path) -> int:
+        """Write unexpired entries as JSONL (atomically replacing `path`)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        now = self.clock()
+        written = 0
+        with tmp.open("w", encoding="utf-8") as f:
+            for domain, entry in self._entries.items():
+                if entry.expires_at <= now:
+                    continue
+                f.write(json.dumps({
+                    "domain": domain,
+                    "expires_at": entry.expires_at,
+                    "ttl": entry.lookup.ttl,
+                    "nxdomain": entry.lookup.nxdomain,
+                    "errors": list(entry.lookup.errors),
+                    "enrichment": entry.lookup.enrichment.model_dump(),
+                }) + "\n")
+                written += 1
+        os.replace(tmp, path)
+        return written
+
+    def load(self, path: str | Path) -> int:
+        """Load entries written by save(), skipping those that have expired."""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        now = self.clock()
+        loaded = 0
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if item["expires_at"] <= now:
+                    continue
+                lookup = DomainLookup(
+                    enrichment=Enrichment.model_validate(item["enrichment"]),
+                    ttl=item["ttl"],
+                    nxdomain=item["nxdomain"],
+                    errors=tuple(item.get("errors", ())),
+                )
+                self._entries[item["domain"]] = CacheEntry(lookup, item["expires_at"])
+                loaded += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return loaded
+
+
+class CachedEnricher:
+    """DnsEnricher front-end that serves repeat domains from an EnrichmentCache."""
+
+    def __init__(self, enricher: DnsEnricher | None = None, cache: EnrichmentCache | None = None,
+                 cfg: Settings | None = None) -> None:
+        self.cfg = cfg or default_settings
+        self.enricher = enricher or DnsEnricher(self.cfg)
+        self.cache = cache or EnrichmentCache.from_settings(self.cfg)
+        self.hit_latency_s = 0.0
+        self.miss_latency_s = 0.0
+
+    async def lookup(self, domain: str) -> DomainLookup:
+        name = domain.strip().rstrip(".").lower()
+        started = time.perf_counter()
+        cached = self.cache.get(name)
+        if cached is not None:
+            self.hit_latency_s += time.perf_counter() - started
+            return cached
+
+        result = await self.enricher.lookup(name)
+        self.cache.put(name, result)
+        self.miss_latency_s += time.perf_counter() - started
+        return result
+
+    async def enrich(self, domain: str) -> Enrichment:
+        return (await self.lookup(domain)).enrichment
+
+    def stats(self) -> dict[str, float]:
+        out = self.cache.stats()
+        out["avg_hit_latency_ms"] = round(1000 * self.hit_latency_s / self.cache.hits, 3) if self.cache.hits else 0.0
+        out["avg_miss_latency_ms"] = round(1000 * self.miss_latency_s / self.cache.misses, 3) if self.cache.misses else 0.0
+        return out
+
+    def load(self) -> int:
+        if not self.cfg.cache_path:
+            return 0
+        loaded = self.cache.load(self.cfg.cache_path)
+        log.info("enrichment cache warm start: %d entries from %s", loaded, self.cfg.cache_path)
+        return loaded
+
+    def save(self) -> int:
+        if not self.cfg.cache_path:
+            return 0
+        return self.cache.save(self.cfg.cache_path)
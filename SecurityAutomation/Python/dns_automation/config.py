@@ -12,21 +12,54 @@ class Settings(BaseSettings):
 
     resolver_timeout_s: float = 2.5
     resolver_lifetime_s: float = 3.5
+    resolver_concurrency: int = Field(default=200, ge=1)
+    resolver_nameservers: list[str] = Field(default_factory=list)  # empty: system resolv.conf
+    resolver_port: int = 53
+
+    # Enrichment cache
+    cache_max_entries: int = Field(default=100_000, ge=1)
+    cache_negative_ttl_s: int = 300
+    cache_max_ttl_s: int = 86_400
+    cache_path: str = ""  # empty: in-memory only
 
     rpz_origin: str = "rpz.local."
     rpz_output_path: str = "./output/rpz.zone"
     block_action: str = "CNAME ."  # “sinkhole” variant: CNAME sinkhole.local.
+    rpz_ttl: int = 300
+    rpz_compact_every: int = Field(default=10_000, ge=1)  # journaled changes before a full rewrite
+    rpz_journal_path: str = ""  # empty: <rpz_output_path>.journal
+    rpz_ixfr_path: str = ""  # empty: no IXFR-style diffs
     allowlist_path: str = "./data/allowlist.txt"
     denylist_path: str = "./data/denylist.txt"
+    list_reload_interval_s: float = 5.0
     feeds_path: str = "./data/feeds.txt"
+    feed_state_path: str = "./data/feeds_state.json"  # ETag / Last-Modified per feed
+    feed_cache_dir: str = "./data/feeds_cache"  # parsed entries of the last good download
+    feed_concurrency: int = Field(default=8, ge=1)
+    feed_timeout_s: float = 30.0
 
     zone_snapshot_a: str = "./data/zone_snapshot_a.txt"
     zone_snapshot_b: str = "./data/zone_snapshot_b.txt"
+    zone_sort_chunk_records: int = Field(default=500_000, ge=1)  # records sorted in memory per spill run
 
     # Hygiene checks
     stale_a_records_report: str = "./output/stale_a_records.json"
+    stale_check_batch_size: int = Field(default=500, ge=1)
 
     # Scoring thresholds
     score_block_threshold: int = Field(default=85, ge=0, le=100)
+    score_review_threshold: int = Field(default=50, ge=0, le=100)
+
+    # /score micro-batching
+    score_batch_max_items: int = Field(default=256, ge=1)
+    score_batch_max_wait_ms: float = Field(default=5.0, ge=0)
+    score_latency_window: int = Field(default=10_000, ge=1)  # recent requests kept for p50/p99
+
+    # Query log pipeline
+    pipeline_batch_size: int = Field(default=512, ge=1)
+    pipeline_batch_timeout_ms: int = Field(default=200, ge=1)
+    pipeline_queue_size: int = Field(default=10_000, ge=1)
+    pipeline_dedupe_window_s: float = 60.0
+    pipeline_dedupe_max_entries: int = Field(default=200_000, ge=1)
 
 settings = Settings()
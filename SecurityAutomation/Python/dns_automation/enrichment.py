@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Iterable
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from .config import Settings, settings as default_settings
+from .models import Enrichment
+
+log = logging.getLogger(__name__)
+
+RECORD_TYPES = ("A", "AAAA", "CNAME", "MX", "TXT")
+
+
+@dataclass(frozen=True)
+class DomainLookup:
+    enrichment: Enrichment
+    ttl: int | None  # lowest TTL across the answers, None if nothing answered
+    nxdomain: bool
+    errors: tuple[str, ...] = ()  # record types whose query failed (timeout, SERVFAIL), not just empty
+
+
+def build_resolver(cfg: Settings) -> dns.asyncresolver.Resolver:
+    resolver = dns.asyncresolver.Resolver(configure=not cfg.resolver_nameservers)
+    if cfg.resolver_nameservers:
+        resolver.nameservers = list(cfg.resolver_nameservers)
+    resolver.port = cfg.resolver_port
+    resolver.timeout = cfg.resolver_timeout_s
+    resolver.lifetime = cfg.resolver_lifetime_s
+    return resolver
+
+
+def _rdata_text(rtype: str, rdata) -> str:
+    if rtype == "MX":
+        return f"{rdata.preference} {rdata.exchange.to_text()}"
+    if rtype == "TXT":
+        return b"".join(rdata.strings).decode("utf-8", errors="replace")
+    if rtype == "CNAME":
+        return rdata.target.to_text()
+    return rdata.to_text()
+
+
+class DnsEnricher:
+    """
+    Asyncio enrichment engine filling Enrichment records (A/AAAA/CNAME/MX/TXT).
+
+    All record types for a domain are queried concurrently; `concurrency`
+    caps outstanding queries across every domain. Concurrent requests for
+    the same name share one in-flight lookup.
+    """
+
+    def __init__(
+        self,
+        cfg: Settings | None = None,
+        resolver: dns.asyncresolver.Resolver | None = None,
+        concurrency: int | None = None,
+    ) -> None:
+        self.cfg = cfg or default_settings
+        self.resolver = resolver or build_resolver(self.cfg)
+        self._limit = asyncio.Semaphore(concurrency or self.cfg.resolver_concurrency)
+        self._in_flight: dict[str, asyncio.Future[DomainLookup]] = {}
+
+    async def enrich(self, domain: str) -> Enrichment:
+        return (await self.lookup(domain)).enrichment
+
+    async def enrich_many(self, domains: Iterable[str]) -> list[Enrichment]:
+        return list(await asyncio.gather(*(self.enrich(d) for d in domains)))
+
+    async def lookup(self, domain: str) -> DomainLookup:
+        name = domain.strip().rstrip(".").lower()
+        pending = self._in_flight.get(name)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        task = asyncio.ensure_future(self._query_all(name))
+        self._in_flight[name] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(name, None))
+        return await asyncio.shield(task)
+
+    async def _query(self, name: str, rtype: str) -> tuple[dns.resolver.Answer | None, bool, bool]:
+        """(answer, nxdomain, failed); failed means the type's records are unknown, not empty."""
+        async with self._limit:
+            try:
+                answer = await self.resolver.resolve(name, rtype, lifetime=self.cfg.resolver_lifetime_s)
+                return answer, False, False
+            except dns.resolver.NXDOMAIN:
+                return None, True, False
+            except dns.resolver.NoAnswer:
+                return None, False, False
+            except dns.exception.DNSException as e:
+                # timeouts, SERVFAIL and malformed names (EmptyLabel, LabelTooLong) alike:
+                # one bad name must not fail the whole gather()
+                log.debug("dns %s %s: %s", name, rtype, e.__class__.__name__)
+                return None, False, True
+
+    async def _query_all(self, name: str) -> DomainLookup:
+        results = await asyncio.gather(*(self._query(name, rtype) for rtype in RECORD_TYPES))
+        answers = dict(zip(RECORD_TYPES, (answer for answer, _, _ in results)))
+        nxdomain = any(nx for _, nx, _ in results)
+        errors = tuple(rtype for rtype, (_, _, failed) in zip(RECORD_TYPES, results) if failed)
+
+        records: dict[str, list[str]] = {}
+        ttls = []
+        for rtype, answer in answers.items():
+            if answer is None or answer.rrset is None:
+                records[rtype] = []
+                continue
+            records[rtype] = [_rdata_text(rtype, rdata) for rdata in answer.rrset]
+            ttls.append(answer.rrset.ttl)
+
+        enrichment = Enrichment(
+            domain=name,
+            a_records=records["A"],
+            aaaa_records=records["AAAA"],
+            cname_chain=self._cname_chain(answers["A"]) or records["CNAME"],
+            mx_records=records["MX"],
+            txt_records=records["TXT"],
+        )
+        return DomainLookup(enrichment=enrichment, ttl=min(ttls) if ttls else None, nxdomain=nxdomain, errors=errors)
+
+    @staticmethod
+    def _cname_chain(answer: dns.resolver.Answer | None) -> list[str]:
+        chaining = getattr(answer, "chaining_result", None)
+        if chaining is None:
+            return []
+        return [rdata.target.to_text() for rrset in chaining.cnames for rdata in rrset]
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterator, Sequence
+
+import numpy as np
+
+from .models import DnsQueryEvent, Features
+
+MAX_QNAME_LEN = 253  # longest presentation-format name DNS allows
+CHUNK_ROWS = 8192  # rows per histogram pass; bounds the (rows x 256) count matrix
+
+SUSPICIOUS_TLDS = frozenset({
+    "zip", "mov", "top", "xyz", "tk", "ml", "ga", "cf", "gq", "work", "click",
+    "country", "kim", "loan", "men", "party", "review", "stream", "gdn", "icu",
+})
+MANY_DASHES = 3
+DGA_MIN_ENTROPY = 3.5
+DGA_MIN_LABEL_LEN = 12
+DGA_MAX_VOWEL_RATIO = 0.3
+DGA_MIN_DIGIT_RATIO = 0.15
+TUNNEL_MIN_QNAME_LEN = 60
+TUNNEL_MIN_LABEL_LEN = 40
+
+_DIGITS = np.frombuffer(b"0123456789", dtype=np.uint8)
+_VOWELS = np.frombuffer(b"aeiou", dtype=np.uint8)
+_DOT, _DASH = ord("."), ord("-")
+
+
+@dataclass
+class FeatureBlock:
+    """Columnar features: one numpy array per Features field, row-aligned with the input."""
+
+    qname_len: np.ndarray
+    label_count: np.ndarray
+    entropy: np.ndarray
+    has_digits: np.ndarray
+    has_many_dashes: np.ndarray
+    suspicious_tld: np.ndarray
+    looks_like_dga: np.ndarray
+    looks_like_tunnel: np.ndarray
+    uses_txt: np.ndarray
+    max_label_len: np.ndarray
+    digit_ratio: np.ndarray
+    vowel_ratio: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.qname_len)
+
+    def row(self, i: int) -> Features:
+        return Features(**{name: getattr(self, name)[i].item() for name in Features.model_fields})
+
+    def rows(self) -> Iterator[Features]:
+        for i in range(len(self)):
+            yield self.row(i)
+
+
+def normalize_qname(qname: str) -> str:
+    return qname.strip().rstrip(".").lower()
+
+
+def byte_matrix(qnames: Sequence[str], width: int = MAX_QNAME_LEN) -> tuple[np.ndarray, np.ndarray]:
+    """Zero-padded (n, width) uint8 matrix of the names plus their true byte lengths."""
+    encoded = [q.encode("utf-8", errors="replace") for q in qnames]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int32, count=len(encoded))
+    width = max(1, min(width, int(lengths.max()) if len(encoded) else 1))
+    buf = b"".join(b[:width].ljust(width, b"\0") for b in encoded)
+    return np.frombuffer(buf, dtype=np.uint8).reshape(len(encoded), width), lengths
+
+
+def _chunk_features(mat: np.ndarray) -> dict[str, np.ndarray]:
+    n, width = mat.shape
+    valid = mat != 0
+    is_dot = mat == _DOT
+    n_valid = valid.sum(axis=1)
+
+    # byte histograms per row -> Shannon entropy (bits per character)
+    flat = (np.arange(n)[:, None] * 256 + mat)[valid]
+    counts = np.bincount(flat, minlength=n * 256).reshape(n, 256)
+    total = np.maximum(n_valid, 1).astype(np.float64)
+    rows, byte_values = np.nonzero(counts)
+    c = counts[rows, byte_values]
+    entropy = np.bincount(rows, weights=c * np.log2(total[rows] / c) / total[rows], minlength=n)
+
+    digits = counts[:, _DIGITS].sum(axis=1)
+    vowels = counts[:, _VOWELS].sum(axis=1)
+    dashes = counts[:, _DASH]
+    dots = counts[:, _DOT]
+    letters_and_digits = np.maximum(n_valid - dots - dashes, 1)
+
+    # longest label: distance from the last dot (or start) at each position
+    idx = np.arange(width)
+    last_break = np.maximum.accumulate(np.where(is_dot, idx, -1), axis=1)
+    run = np.where(valid & ~is_dot, idx - last_break, 0)
+    max_label_len = run.max(axis=1)
+
+    return {
+        "entropy": entropy,
+        "digits": digits,
+        "dashes": dashes,
+        "dots": dots,
+        "max_label_len": max_label_len,
+        "digit_ratio": digits / letters_and_digits,
+        "vowel_ratio": vowels / letters_and_digits,
+    }
+
+
+def extract_features_batch(
+    qnames: Sequence[str],
+    qtypes: Sequence[str] | None = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> FeatureBlock:
+    """
+    Compute Features for many qnames at once over a padded byte matrix.
+    Histograms are built `chunk_rows` names at a time to bound memory.
+    """
+    names = [normalize_qname(q) for q in qnames]
+    n = len(names)
+    mat, lengths = byte_matrix(names)
+
+    parts = [_chunk_features(mat[i:i + chunk_rows]) for i in range(0, n, chunk_rows)]
+    cols = {k: np.concatenate([p[k] for p in parts]) if parts else np.zeros(0) for k in
+            ("entropy", "digits", "dashes", "dots", "max_label_len", "digit_ratio", "vowel_ratio")}
+
+    label_count = np.where(lengths > 0, cols["dots"] + 1, 0).astype(np.int64)
+    tlds = np.array([q.rsplit(".", 1)[-1] if "." in q else "" for q in names], dtype=object)
+    suspicious_tld = np.isin(tlds, list(SUSPICIOUS_TLDS))
+    uses_txt = (
+        np.array([t.upper() == "TXT" for t in qtypes], dtype=bool) if qtypes is not None else np.zeros(n, dtype=bool)
+    )
+
+    entropy = cols["entropy"]
+    max_label_len = cols["max_label_len"].astype(np.int64)
+    looks_like_dga = (
+        (entropy >= DGA_MIN_ENTROPY)
+        & (max_label_len >= DGA_MIN_LABEL_LEN)
+        & ((cols["vowel_ratio"] < DGA_MAX_VOWEL_RATIO) | (cols["digit_ratio"] >= DGA_MIN_DIGIT_RATIO))
+    )
+    looks_like_tunnel = (
+        (lengths >= TUNNEL_MIN_QNAME_LEN)
+        | (max_label_len >= TUNNEL_MIN_LABEL_LEN)
+        | (uses_txt & (lengths >= TUNNEL_MIN_QNAME_LEN // 2) & (entropy >= DGA_MIN_ENTROPY))
+    )
+
+    return FeatureBlock(
+        qname_len=lengths.astype(np.int64),
+        label_count=label_count,
+        entropy=entropy,
+        has_digits=cols["digits"] > 0,
+        has_many_dashes=cols["dashes"] >= MANY_DASHES,
+        suspicious_tld=suspicious_tld,
+        looks_like_dga=looks_like_dga,
+        looks_like_tunnel=looks_like_tunnel,
+        uses_txt=uses_txt,
+        max_label_len=max_label_len,
+        digit_ratio=cols["digit_ratio"],
+        vowel_ratio=cols["vowel_ratio"],
+    )
+
+
+def extract_event_features(events: Sequence[DnsQueryEvent], chunk_rows: int = CHUNK_ROWS) -> FeatureBlock:
+    return extract_features_batch([e.qname for e in events], [e.qtype for e in events], chunk_rows)
+
+
+def extract_features(event: DnsQueryEvent) -> Features:
+    """Single-event convenience wrapper around the batch extractor."""
+    return extract_event_features([event]).row(0)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+import httpx
+
+from .config import Settings, settings as default_settings
+from .lists import WILDCARD, SuffixTrie, parse_entry
+
+log = logging.getLogger(__name__)
+
+FeedStatus = Literal["updated", "not_modified", "error"]
+
+
+@dataclass
+class FeedResult:
+    url: str
+    status: FeedStatus
+    entries: int = 0
+    bytes: int = 0
+    error: str | None = None
+
+
+def read_feed_urls(path: str | Path) -> list[str]:
+    urls = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                urls.append(line)
+    return urls
+
+
+def parse_feed_line(line: str) -> tuple[str, int] | None:
+    """parse_entry() plus Adblock-style "||example.com^" rules; "!" and "[" lines are comments."""
+    line = line.strip()
+    if not line or line[0] in "![":
+        return None
+    if line.startswith("||"):
+        rule = line[2:].split("$", 1)[0]
+        if not rule.endswith("^") or "/" in rule:
+            return None  # path or option rules can't be expressed as a DNS block
+        line = rule[:-1]
+    return parse_entry(line)
+
+
+class FeedFetcher:
+    """
+    Downloads every feed in `feeds_path` concurrently over one pooled
+    httpx.AsyncClient, parsing the bodies as they stream in.
+
+    Entries are kept per feed, and only a download that completed replaces
+    that feed's entries. Once all feeds are done, `trie` is rebuilt from
+    the current set and swapped in place (SuffixTrie.replace_with), so names
+    dropped upstream stop matching and holders of `trie` such as
+    ListPolicy.feeds see the new index without re-wiring.
+
+    ETag / Last-Modified validators are kept in `feed_state_path` so that
+    unchanged feeds come back as 304 and are not re-downloaded. Parsed
+    entries of the last good download are cached per feed, which lets a
+    fresh process fill its trie from disk when the server says 304.
+    """
+
+    def __init__(
+        self,
+        cfg: Settings | None = None,
+        trie: SuffixTrie | None = None,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self.cfg = cfg or default_settings
+        self.trie = trie if trie is not None else SuffixTrie()
+        self.client = client
+        self.state_path = Path(self.cfg.feed_state_path)
+        self.cache_dir = Path(self.cfg.feed_cache_dir)
+        self.state: dict[str, dict[str, str]] = self._load_state()
+        self.entries: dict[str, list[tuple[str, int]]] = {}  # url -> entries of its last good download
+
+    def _load_state(self) -> dict[str, dict[str, str]]:
+        if not self.state_path.exists():
+            return {}
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            log.warning("ignoring unreadable feed state %s", self.state_path)
+            return {}
+
+    def _save_state(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp.write_text(json.dumps(self.state, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def _cache_path(self, url: str) -> Path:
+        return self.cache_dir / (hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".txt")
+
+    async def fetch_all(self, urls: list[str] | None = None) -> list[FeedResult]:
+        urls = urls if urls is not None else read_feed_urls(self.cfg.feeds_path)
+        limit = asyncio.Semaphore(self.cfg.feed_concurrency)
+
+        async def run(client: httpx.AsyncClient, url: str) -> FeedResult:
+            async with limit:
+                return await self.fetch(client, url)
+
+        if self.client is not None:
+            results = await asyncio.gather(*(run(self.client, u) for u in urls))
+        else:
+            limits = httpx.Limits(
+                max_connections=self.cfg.feed_concurrency,
+                max_keepalive_connections=self.cfg.feed_concurrency,
+            )
+            async with httpx.AsyncClient(
+                timeout=self.cfg.feed_timeout_s, limits=limits, follow_redirects=True
+            ) as client:
+                results = await asyncio.gather(*(run(client, u) for u in urls))
+
+        self._save_state()
+        await asyncio.to_thread(self._rebuild, urls)
+        for r in results:
+            if r.status == "error":
+                log.warning("feed %s failed: %s", r.url, r.error)
+        log.info(
+            "feeds: %d updated, %d not modified, %d failed; %d names indexed",
+            sum(r.status == "updated" for r in results),
+            sum(r.status == "not_modified" for r in results),
+            sum(r.status == "error" for r in results),
+            len(self.trie),
+        )
+        return list(results)
+
+    def _rebuild(self, urls: list[str]) -> None:
+        """Index the entries of `urls` into a fresh trie and swap it in; feeds no longer listed are dropped."""
+        self.entries = {url: self.entries[url] for url in urls if url in self.entries}
+        trie = SuffixTrie()
+        for entries in self.entries.values():
+            trie.update(entries)
+        self.trie.replace_with(trie)
+
+    async def fetch(self, client: httpx.AsyncClient, url: str) -> FeedResult:
+        cache = self._cache_path(url)
+        tmp = cache.with_name(cache.name + ".tmp")
+        headers = {}
+        validators = self.state.get(url, {})
+        if cache.exists():  # a 304 is only useful if we still have the entries
+            if "etag" in validators:
+                headers["If-None-Match"] = validators["etag"]
+            if "last_modified" in validators:
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        try:
+            async with client.stream("GET", url, headers=headers) as resp:
+                if resp.status_code == 304:
+                    return FeedResult(url, "not_modified", entries=self._load_cached(url))
+                resp.raise_for_status()
+
+                cache.parent.mkdir(parents=True, exist_ok=True)
+                parsed: list[tuple[str, int]] = []
+                with tmp.open("w", encoding="utf-8") as out:
+                    async for line in resp.aiter_lines():
+                        entry = parse_feed_line(line)
+                        if entry is None:
+                            continue
+                        parsed.append(entry)
+                        out.write(("*." if entry[1] == WILDCARD else "") + entry[0] + "\n")
+                os.replace(tmp, cache)
+                size = resp.num_bytes_downloaded
+        except (httpx.HTTPError, OSError) as e:
+            # a partial body is discarded; the feed keeps its previous entries
+            tmp.unlink(missing_ok=True)
+            return FeedResult(url, "error", entries=self._load_cached(url), error=str(e) or e.__class__.__name__)
+
+        self.entries[url] = parsed
+        validators = {"etag": resp.headers.get("etag"), "last_modified": resp.headers.get("last-modified")}
+        self.state[url] = {k: v for k, v in validators.items() if v}
+        return FeedResult(url, "updated", entries=len(parsed), bytes=size)
+
+    def _load_cached(self, url: str) -> int:
+        """Entries in effect for `url`, read from the last good download if this process has none yet."""
+        cache = self._cache_path(url)
+        if url not in self.entries and cache.exists():
+            with cache.open("r", encoding="utf-8") as f:
+                self.entries[url] = [entry for entry in map(parse_entry, f) if entry is not None]
+        return len(self.entries.get(url, ()))
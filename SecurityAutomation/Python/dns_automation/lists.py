@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import marshal
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Iterable, Iterator, Literal
+
+from .config import Settings, settings as default_settings
+from .features import normalize_qname
+
+log = logging.getLogger(__name__)
+
+# entry flags
+SUBTREE = 1  # "example.com": the name itself and every subdomain
+WILDCARD = 2  # "*.example.com": subdomains only
+
+# Compiled lists are a trusted local cache, never an exchange format: marshal
+# is unsafe on crafted input and its output is tied to the interpreter that
+# wrote it. The header pins both the marshal and the Python version.
+COMPILED_MAGIC = b"DNSTRIE2"
+_COMPILED_HEADER = struct.Struct("<BBBQ")  # marshal version, Python major, minor, entry count
+# names every stock hosts file maps to loopback/link-local; never list entries
+LOCAL_NAMES = frozenset({
+    "localhost", "localhost.localdomain", "local", "broadcasthost",
+    "ip6-localhost", "ip6-loopback", "ip6-localnet", "ip6-mcastprefix",
+    "ip6-allnodes", "ip6-allrouters", "ip6-allhosts", "0.0.0.0",
+})
+_FLAGS = ""  # trie node key holding match flags; never a real label
+
+
+def parse_entry(line: str) -> tuple[str, int] | None:
+    """
+    One list line -> (name, flags). Accepts bare domains, "*." wildcards and
+    hosts-file lines ("0.0.0.0 example.com"); comments start with # or ;.
+    The standard local entries of a hosts file ("127.0.0.1 localhost",
+    "::1 ip6-localhost", ...) are skipped.
+    """
+    line = line.split("#", 1)[0].split(";", 1)[0].strip()
+    if not line:
+        return None
+    token = line.split()[-1]
+    flags = SUBTREE
+    if token.startswith("*."):
+        token, flags = token[2:], WILDCARD
+    name = normalize_qname(token)
+    if not name or "*" in name or "" in name.split("."):
+        return None  # empty labels ("a..b", ".a") would collide with the _FLAGS key
+    if name in LOCAL_NAMES:
+        return None
+    return name, flags
+
+
+def _child(node: dict, label: str) -> dict:
+    child = node.get(label)
+    if type(child) is dict:
+        return child
+    # leaves are stored as bare flag ints until something is added below them
+    child = {_FLAGS: child} if child else {}
+    node[label] = child
+    return child
+
+
+class SuffixTrie:
+    """
+    Reversed-label trie: "www.example.com" is stored as com -> example -> www.
+
+    Interior nodes are dicts keyed by label; leaves are just their flag int,
+    which keeps large lists of distinct names from allocating a dict apiece.
+    match() walks at most one node per label of the query, independent of
+    how many entries the trie holds.
+    """
+
+    __slots__ = ("root", "size")
+
+    def __init__(self) -> None:
+        self.root: dict = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, name: str, flags: int = SUBTREE) -> None:
+        labels = name.split(".")
+        if "" in labels:
+            raise ValueError(f"empty label in {name!r}")
+        node = self.root
+        for label in reversed(labels[1:]):
+            node = _child(node, label)
+        self._mark(node, labels[0], flags)
+
+    def _mark(self, parent: dict, label: str, flags: int) -> None:
+        current = parent.get(label)
+        if isinstance(current, dict):
+            if not current.get(_FLAGS):
+                self.size += 1
+            current[_FLAGS] = current.get(_FLAGS, 0) | flags
+        else:
+            if not current:
+                self.size += 1
+            parent[label] = (current or 0) | flags
+
+    def replace_with(self, other: SuffixTrie) -> None:
+        """Take over `other`'s nodes; match() sees the old or the new set, never a mix."""
+        self.root, self.size = other.root, other.size
+
+    def update(self, entries: Iterable[tuple[str, int]]) -> None:
+        for name, flags in entries:
+            self.add(name, flags)
+
+    def match(self, qname: str) -> str | None:
+        """The most specific entry covering `qname`, formatted as in the list file."""
+        labels = normalize_qname(qname).split(".")
+        if "" in labels:
+            return None
+        node = self.root
+        best = None
+        remaining = len(labels)
+        for label in reversed(labels):
+            node = node.get(label)
+            if node is None:
+                break
+            remaining -= 1
+            flags = node if type(node) is int else node.get(_FLAGS, 0)
+            if flags & SUBTREE or (flags & WILDCARD and remaining):
+                suffix = ".".join(labels[remaining:])
+                best = suffix if flags & SUBTREE else f"*.{suffix}"
+            if type(node) is int:
+                break
+        return best
+
+    def __contains__(self, qname: str) -> bool:
+        return self.match(qname) is not None
+
+    def entries(self) -> Iterator[tuple[str, int]]:
+        """(name, flags) pairs, depth-first in reversed-label order."""
+        stack: list[tuple[dict | int, tuple[str, ...]]] = [(self.root, ())]
+        while stack:
+            node, path = stack.pop()
+            flags = node if type(node) is int else node.get(_FLAGS, 0)
+            if flags and path:
+                name = ".".join(reversed(path))
+                for flag in (SUBTREE, WILDCARD):
+                    if flags & flag:
+                        yield name, flag
+            if type(node) is dict:
+                for label in sorted((k for k in node if k != _FLAGS), reverse=True):
+                    stack.append((node[label], path + (label,)))
+
+    def save(self, path: str | Path) -> int:
+        """
+        Write the compiled format: a short header followed by the marshalled
+        node dicts. Loading it is a single C-level decode instead of
+        re-parsing and re-inserting every name. Only load() files this
+        deployment compiled itself; see COMPILED_MAGIC.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:
+            f.write(COMPILED_MAGIC + _COMPILED_HEADER.pack(marshal.version, *sys.version_info[:2], self.size))
+            f.write(marshal.dumps(self.root))
+        os.replace(tmp, path)
+        return self.size
+
+    @classmethod
+    def load(cls, path: str | Path) -> SuffixTrie:
+        """
+        Load a compiled file written by save() or a plain text list. Compiled
+        files from another format or interpreter version raise ValueError;
+        recompile them from the text list.
+        """
+        trie = cls()
+        with open(path, "rb") as f:
+            magic = f.read(len(COMPILED_MAGIC))
+            if magic == COMPILED_MAGIC:
+                version, major, minor, size = _COMPILED_HEADER.unpack(f.read(_COMPILED_HEADER.size))
+                if (version, major, minor) != (marshal.version, *sys.version_info[:2]):
+                    raise ValueError(
+                        f"{path} was compiled by Python {major}.{minor} (marshal v{version}); recompile it for "
+                        f"Python {sys.version_info[0]}.{sys.version_info[1]} (marshal v{marshal.version})"
+                    )
+                trie.root, trie.size = marshal.loads(f.read()), size
+                return trie
+            if magic.startswith(COMPILED_MAGIC[:-1]):
+                raise ValueError(f"{path} uses an older compiled list format; recompile it")
+            f.seek(0)
+            lines = io.TextIOWrapper(f, encoding="utf-8", errors="replace")
+            trie.update(filter(None, map(parse_entry, lines)))
+        return trie
+
+    @classmethod
+    def compile(cls, source: str | Path, target: str | Path) -> int:
+        """Text list -> compiled file; returns the number of entries."""
+        return cls.load(source).save(target)
+
+
+class DomainListMatcher:
+    """
+    A SuffixTrie backed by a file, swapped wholesale on reload.
+
+    reload() builds the replacement trie before replacing the reference, so
+    concurrent match() calls see either the old or the new list, never a
+    half-built one. watch() runs the rebuild in a worker thread.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.trie = SuffixTrie()
+        self._mtime_ns: int | None = None
+
+    def __len__(self) -> int:
+        return len(self.trie)
+
+    def match(self, qname: str) -> str | None:
+        return self.trie.match(qname)
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuild from disk if the file changed; returns True when the list was swapped."""
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if not force and mtime_ns == self._mtime_ns:
+            return False
+        trie = SuffixTrie.load(self.path)
+        self.trie, self._mtime_ns = trie, mtime_ns
+        log.info("loaded %d entries from %s", len(trie), self.path)
+        return True
+
+    async def watch(self, interval_s: float) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.reload)
+            except (OSError, ValueError) as e:
+                log.warning("reload of %s failed, keeping previous list: %s", self.path, e)
+            await asyncio.sleep(interval_s)
+
+
+class ListPolicy:
+    """
+    Allowlist wins over denylist; names on neither list get None.
+    `feeds` holds entries merged in from remote blocklists and counts as deny.
+    """
+
+    def __init__(self, allow: DomainListMatcher, deny: DomainListMatcher, reload_interval_s: float = 5.0) -> None:
+        self.allow = allow
+        self.deny = deny
+        self.feeds = SuffixTrie()
+        self.reload_interval_s = reload_interval_s
+
+    @classmethod
+    def from_settings(cls, cfg: Settings | None = None) -> ListPolicy:
+        cfg = cfg or default_settings
+        policy = cls(
+            DomainListMatcher(cfg.allowlist_path),
+            DomainListMatcher(cfg.denylist_path),
+            cfg.list_reload_interval_s,
+        )
+        policy.reload()
+        return policy
+
+    def reload(self) -> bool:
+        allow_changed = self.allow.reload()
+        deny_changed = self.deny.reload()
+        return allow_changed or deny_changed
+
+    def check(self, qname: str) -> Literal["allow", "deny"] | None:
+        if self.allow.match(qname):
+            return "allow"
+        if self.deny.match(qname) or self.feeds.match(qname):
+            return "deny"
+        return None
+
+    async def watch(self) -> None:
+        """Poll both files and hot-swap whichever changed; run as a background task."""
+        await asyncio.gather(self.allow.watch(self.reload_interval_s), self.deny.watch(self.reload_interval_s))
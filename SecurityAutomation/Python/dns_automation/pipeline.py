@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Callable, Literal
+
+from pydantic import ValidationError
+
+from .config import Settings, settings as default_settings
+from .features import extract_event_features, normalize_qname
+from .models import BlockDecision, DnsQueryEvent
+from .scoring import score_block
+
+log = logging.getLogger(__name__)
+
+LogFormat = Literal["jsonl", "bind"]
+
+# 19-Oct-2026 10:00:00.123 queries: info: client @0x7f 192.0.2.1#53211 (example.com): query: example.com IN A +E(0)K (10.0.0.1)
+BIND_QUERY_RE = re.compile(
+    r"^(?P<timestamp>\S+ \S+)\s.*?client (?:@\S+ )?(?P<src_ip>[0-9A-Fa-f:.]+)#\d+ "
+    r"\([^)]*\):(?: view \S+:)? query: (?P<qname>\S+) \S+ (?P<qtype>\S+)"
+)
+
+# dnstap-to-JSON and resolver exporters disagree on field names
+JSON_ALIASES: dict[str, tuple[str, ...]] = {
+    "qname": ("qname", "query_name", "query", "name"),
+    "qtype": ("qtype", "query_type", "type"),
+    "src_ip": ("src_ip", "client_ip", "query_address", "client"),
+    "timestamp": ("timestamp", "query_time", "time", "ts"),
+    "rcode": ("rcode", "response_code"),
+}
+
+_EOF = object()
+
+
+def parse_jsonl_line(line: str) -> DnsQueryEvent | None:
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    flat = {**record, **record["message"]} if isinstance(record.get("message"), dict) else record
+
+    fields = {}
+    for name, aliases in JSON_ALIASES.items():
+        value = next((flat[a] for a in aliases if flat.get(a) not in (None, "")), None)
+        if value is not None:
+            fields[name] = str(value)
+    if "qname" not in fields:
+        return None
+    try:
+        return DnsQueryEvent(**fields, raw=record)
+    except ValidationError:
+        return None
+
+
+def parse_bind_line(line: str) -> DnsQueryEvent | None:
+    m = BIND_QUERY_RE.search(line)
+    if not m:
+        return None
+    return DnsQueryEvent(**m.groupdict())
+
+
+PARSERS: dict[str, Callable[[str], DnsQueryEvent | None]] = {
+    "jsonl": parse_jsonl_line,
+    "bind": parse_bind_line,
+}
+
+
+async def tail_lines(path: str, follow: bool = True, poll_interval_s: float = 0.5) -> AsyncIterator[str]:
+    """
+    Yield complete lines from `path`, then keep following it like `tail -F`.
+    A partial trailing line is held back until its newline arrives. The file
+    is reopened when it is rotated (new inode) or truncated.
+    """
+    f = open(path, "r", encoding="utf-8", errors="replace")
+    pending = ""
+    try:
+        while True:
+            chunk = f.readline()
+            if chunk:
+                pending += chunk
+                if pending.endswith("\n"):
+                    yield pending.rstrip("\r\n")
+                    pending = ""
+                continue
+            if not follow:
+                if pending:
+                    yield pending
+                return
+
+            await asyncio.sleep(poll_interval_s)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue  # mid-rotation
+            rotated = st.st_ino != os.fstat(f.fileno()).st_ino
+            if rotated or st.st_size < f.tell():
+                log.info("query log %s rotated, reopening", path)
+                if rotated:
+                    # lines appended before the rename are only in the old file
+                    for chunk in iter(f.readline, ""):
+                        pending += chunk
+                        if pending.endswith("\n"):
+                            yield pending.rstrip("\r\n")
+                            pending = ""
+                    if pending:
+                        yield pending
+                f.close()
+                f = open(path, "r", encoding="utf-8", errors="replace")
+                pending = ""
+    finally:
+        f.close()
+
+
+class SlidingWindowDeduper:
+    """
+    Drops qnames already seen within the last `window_s` seconds.
+
+    A name is scored at most once per window; a repeat after the window
+    has passed starts a new one. At most `max_entries` names are tracked,
+    oldest first out.
+    """
+
+    def __init__(self, window_s: float, max_entries: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self.window_s = window_s
+        self.max_entries = max_entries
+        self.clock = clock
+        self._seen: OrderedDict[str, float] = OrderedDict()  # insertion order == first-seen order
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def is_new(self, qname: str) -> bool:
+        now = self.clock()
+        cutoff = now - self.window_s
+        while self._seen:
+            seen_at = next(iter(self._seen.values()))
+            if seen_at > cutoff and len(self._seen) < self.max_entries:
+                break
+            self._seen.popitem(last=False)
+        if qname in self._seen:
+            return False
+        self._seen[qname] = now
+        return True
+
+
+@dataclass
+class StageMetrics:
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    dropped: int = 0
+    busy_s: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def snapshot(self) -> dict:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "dropped": self.dropped,
+            "busy_s": round(self.busy_s, 6),
+            "in_per_s": round(self.items_in / elapsed, 2),
+            "out_per_s": round(self.items_out / elapsed, 2),
+        }
+
+
+class QueryLogPipeline:
+    """
+    parse -> dedupe/batch -> score, connected by bounded asyncio queues.
+
+    A full queue blocks the stage feeding it, so a slow scorer throttles
+    log reading instead of buffering without limit. A batch is flushed when
+    it reaches `batch_size` events or `batch_timeout_ms` after its first
+    event, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        cfg: Settings | None = None,
+        log_format: LogFormat = "jsonl",
+        emit_allow: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.cfg = cfg or default_settings
+        self.parse = PARSERS[log_format]
+        self.emit_allow = emit_allow
+        self.batch_size = self.cfg.pipeline_batch_size
+        self.batch_timeout_s = self.cfg.pipeline_batch_timeout_ms / 1000
+        self.deduper = SlidingWindowDeduper(
+            self.cfg.pipeline_dedupe_window_s, self.cfg.pipeline_dedupe_max_entries, clock
+        )
+        self.stages = {name: StageMetrics(name) for name in ("parse", "batch", "score")}
+        self._events: asyncio.Queue = asyncio.Queue(self.cfg.pipeline_queue_size)
+        self._batches: asyncio.Queue = asyncio.Queue(max(1, self.cfg.pipeline_queue_size // self.batch_size))
+        self._decisions: asyncio.Queue = asyncio.Queue(self.cfg.pipeline_queue_size)
+
+    def metrics(self) -> dict:
+        return {
+            "stages": {name: m.snapshot() for name, m in self.stages.items()},
+            "queues": {
+                "events": self._events.qsize(),
+                "batches": self._batches.qsize(),
+                "decisions": self._decisions.qsize(),
+            },
+            "dedupe_tracked": len(self.deduper),
+        }
+
+    async def run(self, lines: AsyncIterable[str]) -> AsyncIterator[BlockDecision]:
+        """Consume `lines` and yield a BlockDecision per scored (non-allow) query."""
+        tasks = [
+            asyncio.create_task(self._parse_stage(lines)),
+            asyncio.create_task(self._batch_stage()),
+            asyncio.create_task(self._score_stage()),
+        ]
+        try:
+            while True:
+                decision = await self._decisions.get()
+                if decision is _EOF:
+                    break
+                yield decision
+            await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    async def _parse_stage(self, lines: AsyncIterable[str]) -> None:
+        m = self.stages["parse"]
+        try:
+            async for line in lines:
+                m.items_in += 1
+                if not line.strip():
+                    m.dropped += 1
+                    continue
+                t0 = time.perf_counter()
+                event = self.parse(line)
+                m.busy_s += time.perf_counter() - t0
+                if event is None:
+                    m.dropped += 1
+                    continue
+                await self._events.put(event)
+                m.items_out += 1
+        finally:
+            await self._events.put(_EOF)
+
+    async def _batch_stage(self) -> None:
+        m = self.stages["batch"]
+        loop = asyncio.get_running_loop()
+        batch: list[DnsQueryEvent] = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(deadline - loop.time(), 0)
+                try:
+                    event = await asyncio.wait_for(self._events.get(), timeout)
+                except asyncio.TimeoutError:
+                    event = None
+                if event is _EOF:
+                    break
+                if event is not None:
+                    m.items_in += 1
+                    event.qname = normalize_qname(event.qname)
+                    if self.deduper.is_new(event.qname):
+                        batch.append(event)
+                        deadline = deadline or loop.time() + self.batch_timeout_s
+                    else:
+                        m.dropped += 1
+                if batch and (len(batch) >= self.batch_size or loop.time() >= deadline):
+                    m.items_out += len(batch)
+                    await self._batches.put(batch)
+                    batch, deadline = [], None
+        finally:
+            if batch:
+                m.items_out += len(batch)
+                await self._batches.put(batch)
+            await self._batches.put(_EOF)
+
+    async def _score_stage(self) -> None:
+        m = self.stages["score"]
+        try:
+            while True:
+                batch = await self._batches.get()
+                if batch is _EOF:
+                    break
+                m.items_in += len(batch)
+                t0 = time.perf_counter()
+                decisions = await asyncio.to_thread(self._score, batch)
+                m.busy_s += time.perf_counter() - t0
+                m.dropped += len(batch) - len(decisions)
+                for decision in decisions:
+                    await self._decisions.put(decision)
+                    m.items_out += 1
+        finally:
+            await self._decisions.put(_EOF)
+
+    def _score(self, batch: list[DnsQueryEvent]) -> list[BlockDecision]:
+        results = score_block(extract_event_features(batch), self.cfg)
+        return [
+            BlockDecision(domain=event.qname, score=r.score, disposition=r.disposition, written_to_rpz=False)
+            for event, r in zip(batch, results)
+            if self.emit_allow or r.disposition != "allow"
+        ]
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from .config import Settings, settings as default_settings
+from .features import normalize_qname
+from .models import BlockDecision
+
+log = logging.getLogger(__name__)
+
+SOA_MNAME = "localhost."
+SOA_RNAME = "hostmaster.localhost."
+SOA_TIMERS = (3600, 600, 86400, 300)  # refresh, retry, expire, negative TTL
+SOA_SERIAL_RE = re.compile(r"\bSOA\s+\S+\s+\S+\s+\(?\s*(\d+)")
+
+
+def canonical_key(name: str) -> tuple[str, ...]:
+    """RFC 4034 canonical order: compare labels right to left."""
+    return tuple(reversed(name.split(".")))
+
+
+def next_serial(current: int, now: float | None = None) -> int:
+    """YYYYMMDDnn serial; falls back to +1 when today's range is exhausted or behind."""
+    day = datetime.fromtimestamp(now if now is not None else time.time(), timezone.utc)
+    dated = int(day.strftime("%Y%m%d")) * 100
+    return max(current + 1, dated) % 2**32
+
+
+def _fsync_dir(path: Path) -> None:
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class RpzWriter:
+    """
+    Maintains an RPZ zone for blocked names without rewriting it per change.
+
+    Names live in a dict plus an index sorted in canonical DNS order; new
+    names are merged into the index in bulk when it is next read. add() and
+    remove() only append a line to a journal; compact() rewrites the zone
+    (temp file, fsync, rename) with a bumped SOA serial and truncates the
+    journal. When `ixfr_path` is set, each compaction also appends the
+    delta in IXFR layout: old SOA, deleted records, new SOA, added records.
+    """
+
+    def __init__(
+        self,
+        cfg: Settings | None = None,
+        path: str | Path | None = None,
+        journal_path: str | Path | None = None,
+        ixfr_path: str | Path | None = None,
+        compact_every: int | None = None,
+        include_wildcards: bool = True,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.cfg = cfg or default_settings
+        self.path = Path(path or self.cfg.rpz_output_path)
+        self.journal_path = Path(journal_path or self.cfg.rpz_journal_path or f"{self.path}.journal")
+        ixfr = ixfr_path or self.cfg.rpz_ixfr_path
+        self.ixfr_path = Path(ixfr) if ixfr else None
+        self.compact_every = compact_every or self.cfg.rpz_compact_every
+        self.include_wildcards = include_wildcards
+        self.clock = clock
+
+        self.serial = 0
+        self._actions: dict[str, str] = {}
+        self._index: list[tuple[tuple[str, ...], str]] = []  # (canonical key, name), sorted
+        self._unsorted: list[tuple[tuple[str, ...], str]] = []  # added since the last merge
+        self._stale = 0  # removals not yet purged from the index
+        # name -> (action at last compaction, current action); None means absent
+        self._changes: dict[str, tuple[str | None, str | None]] = {}
+        self._journal = None
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    def __contains__(self, name: str) -> bool:
+        return normalize_qname(name) in self._actions
+
+    @property
+    def pending(self) -> int:
+        return len(self._changes)
+
+    def names(self) -> Iterator[str]:
+        """Blocked names in canonical order."""
+        for _, name in self._sorted_index():
+            yield name
+
+    # loading
+
+    def load(self) -> int:
+        """Read the zone written by compact() and replay any journal left behind."""
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip() or line.startswith((";", "$", "*.")):
+                        continue
+                    if line.startswith("@"):
+                        m = SOA_SERIAL_RE.search(line)
+                        if m:
+                            self.serial = int(m.group(1))
+                        continue
+                    name, action = line.rstrip("\n").split(None, 1)
+                    self._set(name, action)
+        replayed = 0
+        if self.journal_path.exists():
+            with self.journal_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    op, _, rest = line.rstrip("\n").partition(" ")
+                    name, _, action = rest.partition("\t")
+                    if op == "+" and name:
+                        self._record(name, action or self.cfg.block_action)
+                    elif op == "-" and name:
+                        self._record(name, None)
+                    else:
+                        continue
+                    replayed += 1
+        if replayed:
+            log.info("rpz replayed %d journal entries from %s", replayed, self.journal_path)
+        return len(self._actions)
+
+    # deltas
+
+    def add(self, name: str, action: str | None = None) -> bool:
+        name = normalize_qname(name)
+        action = action or self.cfg.block_action
+        if not name or self._actions.get(name) == action:
+            return False
+        self._journal_write(f"+ {name}\t{action}\n")
+        self._record(name, action)
+        return True
+
+    def remove(self, name: str) -> bool:
+        name = normalize_qname(name)
+        if name not in self._actions:
+            return False
+        self._journal_write(f"- {name}\n")
+        self._record(name, None)
+        return True
+
+    def apply(self, decisions: Iterable[BlockDecision]) -> list[BlockDecision]:
+        """Add every "block" decision; returns the decisions with written_to_rpz filled in."""
+        out = []
+        for d in decisions:
+            if d.disposition == "block":
+                self.add(d.domain)
+                d = d.model_copy(update={"written_to_rpz": True})
+            out.append(d)
+        self.maybe_compact()
+        return out
+
+    def maybe_compact(self) -> bool:
+        if self.pending < self.compact_every:
+            return False
+        self.compact()
+        return True
+
+    def _journal_write(self, line: str) -> None:
+        if self._journal is None:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._journal = self.journal_path.open("a", encoding="utf-8")
+        self._journal.write(line)
+        self._journal.flush()
+
+    def _record(self, name: str, action: str | None) -> None:
+        before = self._actions.get(name)
+        base = self._changes[name][0] if name in self._changes else before
+        self._set(name, action)
+        if base == action:
+            self._changes.pop(name, None)
+        else:
+            self._changes[name] = (base, action)
+
+    def _set(self, name: str, action: str | None) -> None:
+        if action is None:
+            if self._actions.pop(name, None) is not None:
+                self._stale += 1
+            return
+        if name not in self._actions:
+            self._unsorted.append((canonical_key(name), name))
+        self._actions[name] = action
+
+    def _sorted_index(self) -> list[tuple[tuple[str, ...], str]]:
+        """Merge names added since the last call into the sorted index."""
+        if self._stale:
+            live = {item for item in self._index if item[1] in self._actions}
+            live.update(item for item in self._unsorted if item[1] in self._actions)
+            self._index = sorted(live)
+        elif self._unsorted:
+            self._index.extend(self._unsorted)
+            self._index.sort()  # timsort merges the two sorted runs
+        self._unsorted.clear()
+        self._stale = 0
+        return self._index
+
+    # compaction
+
+    def _soa(self, serial: int) -> str:
+        timers = " ".join(map(str, SOA_TIMERS))
+        return f"@ {self.cfg.rpz_ttl} IN SOA {SOA_MNAME} {SOA_RNAME} ( {serial} {timers} )\n"
+
+    def _records(self, name: str, action: str) -> list[str]:
+        records = [f"{name} {action}\n"]
+        if self.include_wildcards:
+            records.append(f"*.{name} {action}\n")
+        return records
+
+    def compact(self) -> int:
+        """Atomically rewrite the full zone with a new serial; returns that serial."""
+        old_serial, new_serial = self.serial, next_serial(self.serial, self.clock())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write(f"$ORIGIN {self.cfg.rpz_origin}\n$TTL {self.cfg.rpz_ttl}\n")
+            f.write(self._soa(new_serial))
+            f.write(f"@ IN NS {SOA_MNAME}\n")
+            for name in self.names():
+                f.writelines(self._records(name, self._actions[name]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        _fsync_dir(self.path.parent)
+
+        if self.ixfr_path is not None and self._changes:
+            self._write_ixfr(old_serial, new_serial)
+
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self.journal_path.unlink(missing_ok=True)
+
+        log.info("rpz compacted %d names (%d changes) serial %d -> %d",
+                 len(self._actions), len(self._changes), old_serial, new_serial)
+        self.serial = new_serial
+        self._changes.clear()
+        return new_serial
+
+    def _write_ixfr(self, old_serial: int, new_serial: int) -> None:
+        changes = sorted(self._changes.items(), key=lambda item: canonical_key(item[0]))
+        self.ixfr_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.ixfr_path.open("a", encoding="utf-8") as f:
+            f.write(f"; serial {old_serial} -> {new_serial}\n")
+            f.write(self._soa(old_serial))
+            for name, (before, _) in changes:
+                if before is not None:
+                    f.writelines(self._records(name, before))
+            f.write(self._soa(new_serial))
+            for name, (_, after) in changes:
+                if after is not None:
+                    f.writelines(self._records(name, after))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import numpy as np
+
+from .config import Settings, settings as default_settings
+from .features import FeatureBlock
+from .models import Features, ScoreResult
+
+# Features flag -> points added to the score when the flag is set
+SCORE_WEIGHTS: dict[str, int] = {
+    "looks_like_dga": 50,
+    "looks_like_tunnel": 45,
+    "suspicious_tld": 20,
+    "uses_txt": 10,
+    "has_many_dashes": 10,
+    "has_digits": 5,
+}
+HIGH_ENTROPY = 4.0
+HIGH_ENTROPY_POINTS = 15
+
+
+def disposition_for(score: int, cfg: Settings) -> str:
+    if score >= cfg.score_block_threshold:
+        return "block"
+    if score >= cfg.score_review_threshold:
+        return "review"
+    return "allow"
+
+
+def score_features(features: Features, cfg: Settings | None = None) -> ScoreResult:
+    cfg = cfg or default_settings
+    reasons = [flag for flag in SCORE_WEIGHTS if getattr(features, flag)]
+    score = sum(SCORE_WEIGHTS[flag] for flag in reasons)
+    if features.entropy >= HIGH_ENTROPY:
+        reasons.append("high_entropy")
+        score += HIGH_ENTROPY_POINTS
+    score = min(score, 100)
+    return ScoreResult(score=score, reasons=reasons, disposition=disposition_for(score, cfg))
+
+
+def score_block(block: FeatureBlock, cfg: Settings | None = None) -> list[ScoreResult]:
+    """Vectorized score_features over a FeatureBlock; same weights, one result per row."""
+    cfg = cfg or default_settings
+    flags = {flag: getattr(block, flag).astype(bool) for flag in SCORE_WEIGHTS}
+    flags["high_entropy"] = block.entropy >= HIGH_ENTROPY
+
+    scores = np.zeros(len(block), dtype=np.int64)
+    for flag, weight in SCORE_WEIGHTS.items():
+        scores += flags[flag] * weight
+    scores += flags["high_entropy"] * HIGH_ENTROPY_POINTS
+    scores = np.minimum(scores, 100)
+
+    results = []
+    for i, score in enumerate(scores.tolist()):
+        reasons = [flag for flag, column in flags.items() if column[i]]
+        results.append(ScoreResult(score=score, reasons=reasons, disposition=disposition_for(score, cfg)))
+    return results
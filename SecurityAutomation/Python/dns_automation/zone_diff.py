@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Literal
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from .config import Settings, settings as default_settings
+from .enrichment import build_resolver
+
+log = logging.getLogger(__name__)
+
+# (name, type, ttl, rdata); name absolute and lower-cased, type upper-cased
+Record = tuple[str, str, int, str]
+
+CLASSES = frozenset({"IN", "CH", "HS", "CS"})
+SORT_CHUNK_RECORDS = 500_000
+
+
+@dataclass(frozen=True)
+class RRset:
+    name: str
+    rtype: str
+    ttl: int
+    rdata: tuple[str, ...]  # sorted
+
+
+@dataclass(frozen=True)
+class RRsetChange:
+    kind: Literal["added", "removed", "changed"]
+    name: str
+    rtype: str
+    old: RRset | None
+    new: RRset | None
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "type": self.rtype,
+            "old": asdict(self.old) if self.old else None,
+            "new": asdict(self.new) if self.new else None,
+        }
+
+
+def _absolute(name: str, origin: str) -> str:
+    if name == "@":
+        return origin
+    if name.endswith("."):
+        return name.lower()
+    return f"{name}.{origin}".lower() if origin != "." else f"{name}.".lower()
+
+
+def _strip_comment(line: str) -> str:
+    """Drop a ";" comment, leaving semicolons inside quoted rdata (TXT, SPF, DKIM) alone."""
+    if '"' not in line:
+        return line.split(";", 1)[0]
+    quoted = escaped = False
+    for i, ch in enumerate(line):
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif ch == ";" and not quoted:
+            return line[:i]
+    return line
+
+
+def parse_zone_lines(lines: Iterable[str], origin: str = ".", default_ttl: int = 3600) -> Iterator[Record]:
+    """
+    Stream records from a zone dump (AXFR / named-compilezone style, one
+    record per line). Handles $ORIGIN, $TTL, comments, "@", inherited owner
+    names and optional TTL/class columns.
+    """
+    origin = _absolute(origin, ".") if origin != "." else "."
+    owner = origin
+    for line in lines:
+        body = _strip_comment(line).rstrip()
+        if not body.strip():
+            continue
+        tokens = body.split()
+        if tokens[0] == "$ORIGIN":
+            origin = _absolute(tokens[1], origin)
+            continue
+        if tokens[0] == "$TTL":
+            default_ttl = int(tokens[1])
+            continue
+        if tokens[0].startswith("$"):
+            continue
+
+        if not body[0].isspace():
+            owner = _absolute(tokens.pop(0), origin)
+        ttl = default_ttl
+        for _ in range(2):  # TTL and class may appear in either order
+            if tokens and tokens[0].isdigit():
+                ttl = int(tokens.pop(0))
+            elif tokens and tokens[0].upper() in CLASSES:
+                tokens.pop(0)
+        if len(tokens) < 2:
+            continue
+        yield owner, tokens[0].upper(), ttl, " ".join(tokens[1:])
+
+
+def _spill(chunk: list[Record], tmpdir: str | None) -> str:
+    chunk.sort()
+    fd, path = tempfile.mkstemp(prefix="zone-run-", suffix=".tsv", dir=tmpdir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.writelines(f"{n}\t{t}\t{ttl}\t{r}\n" for n, t, ttl, r in chunk)
+    return path
+
+
+def _read_run(path: str) -> Iterator[Record]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            name, rtype, ttl, rdata = line.rstrip("\n").split("\t", 3)
+            yield name, rtype, int(ttl), rdata
+
+
+def sorted_records(
+    records: Iterable[Record],
+    chunk_records: int = SORT_CHUNK_RECORDS,
+    tmpdir: str | None = None,
+) -> Iterator[Record]:
+    """
+    Records ordered by (name, type, ttl, rdata) with at most `chunk_records`
+    held in memory: larger inputs are sorted in runs spilled to temp files
+    and k-way merged.
+    """
+    runs: list[str] = []
+    try:
+        it = iter(records)
+        while True:
+            chunk = list(itertools.islice(it, chunk_records))
+            if not chunk:
+                break
+            if not runs and len(chunk) < chunk_records:
+                chunk.sort()
+                yield from chunk
+                return
+            runs.append(_spill(chunk, tmpdir))
+        yield from heapq.merge(*(_read_run(p) for p in runs))
+    finally:
+        for path in runs:
+            os.unlink(path)
+
+
+def group_rrsets(records: Iterable[Record]) -> Iterator[RRset]:
+    """Collapse sorted records into RRsets; the lowest TTL in a set wins."""
+    for (name, rtype), group in itertools.groupby(records, key=lambda r: (r[0], r[1])):
+        group = list(group)
+        rdata = tuple(sorted({r[3] for r in group}))
+        yield RRset(name, rtype, min(r[2] for r in group), rdata)
+
+
+def iter_snapshot(
+    path: str | Path,
+    chunk_records: int = SORT_CHUNK_RECORDS,
+    tmpdir: str | None = None,
+) -> Iterator[RRset]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        yield from group_rrsets(sorted_records(parse_zone_lines(f), chunk_records, tmpdir))
+
+
+def diff_rrsets(old: Iterable[RRset], new: Iterable[RRset], compare_ttl: bool = True) -> Iterator[RRsetChange]:
+    """Sort-merge two (name, type)-ordered RRset streams."""
+    sentinel = None
+    a_it, b_it = iter(old), iter(new)
+    a, b = next(a_it, sentinel), next(b_it, sentinel)
+    while a is not None or b is not None:
+        a_key = (a.name, a.rtype) if a is not None else None
+        b_key = (b.name, b.rtype) if b is not None else None
+        if b_key is None or (a_key is not None and a_key < b_key):
+            yield RRsetChange("removed", a.name, a.rtype, a, None)
+            a = next(a_it, sentinel)
+        elif a_key is None or b_key < a_key:
+            yield RRsetChange("added", b.name, b.rtype, None, b)
+            b = next(b_it, sentinel)
+        else:
+            if a.rdata != b.rdata or (compare_ttl and a.ttl != b.ttl):
+                yield RRsetChange("changed", a.name, a.rtype, a, b)
+            a, b = next(a_it, sentinel), next(b_it, sentinel)
+
+
+def diff_snapshots(
+    cfg: Settings | None = None,
+    old_path: str | Path | None = None,
+    new_path: str | Path | None = None,
+    compare_ttl: bool = True,
+) -> Iterator[RRsetChange]:
+    cfg = cfg or default_settings
+    chunk = cfg.zone_sort_chunk_records
+    yield from diff_rrsets(
+        iter_snapshot(old_path or cfg.zone_snapshot_a, chunk),
+        iter_snapshot(new_path or cfg.zone_snapshot_b, chunk),
+        compare_ttl,
+    )
+
+
+def write_diff(changes: Iterable[RRsetChange], path: str | Path) -> dict[str, int]:
+    """Write changes as JSONL; returns counts per kind."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    counts = {"added": 0, "removed": 0, "changed": 0}
+    with path.open("w", encoding="utf-8") as f:
+        for change in changes:
+            counts[change.kind] += 1
+            f.write(json.dumps(change.to_dict()) + "\n")
+    return counts
+
+
+# Hygiene: stale A records
+
+
+async def _check_a_rrset(
+    resolver: dns.asyncresolver.Resolver,
+    limit: asyncio.Semaphore,
+    rrset: RRset,
+) -> dict | None:
+    async with limit:
+        try:
+            answer = await resolver.resolve(rrset.name, "A")
+            live = sorted(r.to_text() for r in answer.rrset) if answer.rrset else []
+        except dns.resolver.NXDOMAIN:
+            return {"name": rrset.name, "reason": "nxdomain", "zone": list(rrset.rdata), "live": []}
+        except dns.resolver.NoAnswer:
+            return {"name": rrset.name, "reason": "no_answer", "zone": list(rrset.rdata), "live": []}
+        except (dns.resolver.NoNameservers, dns.exception.Timeout):
+            return None  # inconclusive; not reported as stale
+        except dns.exception.DNSException as e:
+            # unresolvable name in the snapshot (LabelTooLong, EmptyLabel, YXDOMAIN): also inconclusive
+            log.warning("stale A check skipped %s: %s", rrset.name, e.__class__.__name__)
+            return None
+    if not set(live) & set(rrset.rdata):
+        return {"name": rrset.name, "reason": "address_mismatch", "zone": list(rrset.rdata), "live": live}
+    return None
+
+
+async def find_stale_a_records(
+    rrsets: Iterable[RRset],
+    resolver: dns.asyncresolver.Resolver,
+    concurrency: int,
+    batch_size: int,
+) -> tuple[int, list[dict]]:
+    """
+    Resolve the A RRsets from a snapshot in batches of `batch_size` and
+    report those whose name no longer resolves or no longer returns any of
+    the snapshot's addresses. Only one batch is in memory at a time.
+    """
+    limit = asyncio.Semaphore(concurrency)
+    checked, stale = 0, []
+    a_rrsets = (r for r in rrsets if r.rtype == "A")
+    while batch := list(itertools.islice(a_rrsets, batch_size)):
+        results = await asyncio.gather(*(_check_a_rrset(resolver, limit, r) for r in batch))
+        checked += len(batch)
+        stale.extend(r for r in results if r is not None)
+    return checked, stale
+
+
+async def stale_a_records_report(
+    cfg: Settings | None = None,
+    resolver: dns.asyncresolver.Resolver | None = None,
+    snapshot_path: str | Path | None = None,
+) -> dict:
+    """Check every A RRset in the newer snapshot and write `stale_a_records_report`."""
+    cfg = cfg or default_settings
+    rrsets = iter_snapshot(snapshot_path or cfg.zone_snapshot_b, cfg.zone_sort_chunk_records)
+    checked, stale = await find_stale_a_records(
+        rrsets, resolver or build_resolver(cfg), cfg.resolver_concurrency, cfg.stale_check_batch_size
+    )
+    report = {"snapshot": str(snapshot_path or cfg.zone_snapshot_b), "checked": checked, "stale": stale}
+
+    path = Path(cfg.stale_a_records_report)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    log.info("stale A check: %d checked, %d stale", checked, len(stale))
+    return report
@@ -11,7 +11,22 @@ Useful for:
 """
 
 import logging
-from typing import List, Dict, Set, Optional
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+# Number of example keys included in aggregated warning summaries
+SUMMARY_SAMPLE_SIZE = 5
+
+KeySource = Union[Mapping[str, Any], List[Dict], Iterable[str]]
+
+# Separators between a region name and its prefix/suffix ("US North", "EU-West")
+TOKEN_SPLIT_RE = re.compile(r"[^0-9a-z]+")
+
+# Fuzzy matches must be about as long as the indexed form: typos ("Nrth")
+# pass, distinct regions sharing a stem ("Northeast" vs "North") do not
+FUZZY_LENGTH_SLACK = 2
+FUZZY_LENGTH_RATIO = 0.25
 
 
 logging.basicConfig(
@@ -24,7 +39,8 @@ def extract_keys(dict_list: List[Dict]) -> Set[str]:
     return {k for d in dict_list for k in d.keys()}
 
 
-def normalize_keys(list_a: List[Dict], list_b: List[Dict], prefix: str = "US ") -> List[Dict]:
+def normalize_keys(list_a: List[Dict], list_b: List[Dict], prefix: str = "US ",
+                   index: Optional["RegionIndex"] = None) -> List[Dict]:
     """
     Normalize dictionary keys from list_a so they align with the
     prefixed format found in list_b (e.g., "North" -> "US North").
@@ -33,6 +49,8 @@ def normalize_keys(list_a: List[Dict], list_b: List[Dict], prefix: str = "US ")
         list_a: Source list of dictionaries (e.g., [{"North": "ip"}]).
         list_b: Reference list (e.g., [{"US North": "ip"}]).
         prefix: Prefix to prepend (default: "US ").
+        index: Optional RegionIndex over list_b; keys it can match map to
+            the matched reference key, whatever its prefix.
 
     Returns:
         A new list with normalized keys.
@@ -42,6 +60,10 @@ def normalize_keys(list_a: List[Dict], list_b: List[Dict], prefix: str = "US ")
 
     for d in list_a:
         for k, v in d.items():
+            matched = index.match(k, prefix=prefix) if index is not None else None
+            if matched is not None:
+                updated.append({matched: v})
+                continue
             prefixed = f"{prefix}{k}"
             if prefixed not in keys_b:
                 logging.warning(f"Key '{k}' not found in reference list. Mapping to '{prefixed}'.")
@@ -116,6 +138,236 @@ def auto_detect_prefix(dict_list: List[Dict]) -> Optional[str]:
     return None
 
 
+def _tokens(key: str) -> tuple:
+    return tuple(t for t in TOKEN_SPLIT_RE.split(key.strip().lower()) if t)
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class RegionIndex:
+    """
+    Lookup index over reference region keys with mixed prefixes and
+    suffixes ("US North", "EU-West", "APAC South", "Central (EU)").
+
+    Every reference key is indexed by its normalized tokens and by each
+    form with leading or trailing tokens stripped, so "West" and "eu west"
+    both find "EU-West" with one dict lookup. Keys that still do not match
+    fall back to trigram similarity.
+    """
+
+    def __init__(self, reference_keys: Iterable[str], fuzzy_threshold: float = 0.5):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.prefixes: Counter = Counter()
+        self.suffixes: Counter = Counter()
+        self._exact: Dict[tuple, str] = {}
+        self._partial: Dict[tuple, List[str]] = defaultdict(list)
+        self._affix: Dict[tuple, tuple] = {}
+        self._grams: Dict[str, Set[tuple]] = defaultdict(set)
+
+        for key in reference_keys:
+            tokens = _tokens(key)
+            if not tokens:
+                continue
+            self._exact.setdefault(tokens, key)
+            if len(tokens) > 1:
+                self.prefixes[tokens[0]] += 1
+                self.suffixes[tokens[-1]] += 1
+            self._add_grams(tokens)
+            for i in range(1, len(tokens)):
+                # tokens[i:] strips a prefix, tokens[:i] strips a suffix
+                self._add_partial(tokens[i:], key, tokens[:i])
+                self._add_partial(tokens[:i], key, tokens[i:])
+
+    @classmethod
+    def from_dicts(cls, dict_list: List[Dict], **kwargs) -> "RegionIndex":
+        return cls(extract_keys(dict_list), **kwargs)
+
+    def _add_partial(self, tokens: tuple, key: str, affix: tuple) -> None:
+        candidates = self._partial[tokens]
+        if not candidates:
+            self._add_grams(tokens)
+        if key not in candidates:
+            candidates.append(key)
+            self._affix[(tokens, key)] = affix
+
+    def _add_grams(self, tokens: tuple) -> None:
+        for gram in _trigrams(" ".join(tokens)):
+            self._grams[gram].add(tokens)
+
+    def match(self, key: str, prefix: Optional[str] = None) -> Optional[str]:
+        """
+        Reference key matching `key`, or None.
+
+        Args:
+            key: Source key, with or without a prefix/suffix.
+            prefix: Preferred affix (e.g. "US") when several reference keys
+                share the same base name.
+        """
+        return self.lookup(key, prefix)[0]
+
+    def lookup(self, key: str, prefix: Optional[str] = None) -> Tuple[Optional[str], bool]:
+        """Like match(), but returns (reference key or None, matched fuzzily?)."""
+        tokens = _tokens(key)
+        if not tokens:
+            return None, False
+        resolved = self._resolve(tokens, prefix)
+        if resolved is not None:
+            return resolved, False
+        fuzzy = self.fuzzy_match(key, prefix)
+        return fuzzy, fuzzy is not None
+
+    def _resolve(self, tokens: tuple, prefix: Optional[str]) -> Optional[str]:
+        if tokens in self._exact:
+            return self._exact[tokens]
+        candidates = self._partial.get(tokens)
+        if not candidates:
+            return None
+        return self._pick(tokens, candidates, prefix)
+
+    def _pick(self, tokens: tuple, candidates: List[str], prefix: Optional[str]) -> str:
+        if len(candidates) == 1 or prefix is None:
+            return candidates[0]
+        wanted = _tokens(prefix)
+        for candidate in candidates:
+            if self._affix[(tokens, candidate)] == wanted:
+                return candidate
+        return candidates[0]
+
+    def fuzzy_match(self, key: str, prefix: Optional[str] = None) -> Optional[str]:
+        """
+        Reference key whose closest indexed form (trigram Dice score) clears
+        fuzzy_threshold. Forms whose length differs from the key by more than
+        FUZZY_LENGTH_SLACK characters or FUZZY_LENGTH_RATIO are never candidates.
+        """
+        text = " ".join(_tokens(key))
+        grams = _trigrams(text)
+        shared: Counter = Counter()
+        for gram in grams:
+            for form in self._grams.get(gram, ()):
+                shared[form] += 1
+
+        best, best_score = None, 0.0
+        for form, count in shared.items():
+            form_text = " ".join(form)
+            if abs(len(form_text) - len(text)) > max(FUZZY_LENGTH_SLACK, FUZZY_LENGTH_RATIO * len(form_text)):
+                continue
+            score = 2 * count / (len(grams) + len(_trigrams(form_text)))
+            if score > best_score:
+                best, best_score = form, score
+        if best is None or best_score < self.fuzzy_threshold:
+            return None
+        matched = self._resolve(best, prefix)
+        logging.debug(f"Fuzzy matched '{key}' to '{matched}' (score {best_score:.2f})")
+        return matched
+
+
+def to_mapping(data: Union[Mapping[str, Any], List[Dict]]) -> Dict[str, Any]:
+    """Merge a list of dictionaries into one flat dict (later keys win)."""
+    if isinstance(data, Mapping):
+        return dict(data)
+    merged: Dict[str, Any] = {}
+    for d in data:
+        merged.update(d)
+    return merged
+
+
+def columns_to_mapping(keys: Sequence[str], values: Sequence[Any]) -> Dict[str, Any]:
+    """Build a flat mapping from columnar key/value arrays."""
+    if len(keys) != len(values):
+        raise ValueError(f"keys and values differ in length ({len(keys)} != {len(values)})")
+    return dict(zip(keys, values))
+
+
+def reference_key_set(reference: KeySource) -> Set[str]:
+    """Key set of a reference given as a mapping, a list of dicts or plain keys."""
+    if isinstance(reference, Mapping):
+        return set(reference.keys())
+    if isinstance(reference, (set, frozenset)):
+        return set(reference)
+    items = list(reference)
+    if items and isinstance(items[0], dict):
+        return extract_keys(items)
+    return set(items)
+
+
+def summarize_keys(keys: Set[str], message: str, level: int = logging.WARNING) -> None:
+    """Log one aggregated line for a set of keys instead of one line per key."""
+    if not keys:
+        return
+    sample = ", ".join(sorted(keys)[:SUMMARY_SAMPLE_SIZE])
+    more = f" (+{len(keys) - SUMMARY_SAMPLE_SIZE} more)" if len(keys) > SUMMARY_SAMPLE_SIZE else ""
+    logging.log(level, f"{len(keys)} keys {message}: {sample}{more}")
+
+
+def bulk_missing_keys(source: Union[Mapping[str, Any], List[Dict]], reference: KeySource,
+                      prefix: str = "US ") -> Set[str]:
+    """Source keys whose prefixed form is absent from the reference, via one set difference."""
+    src = to_mapping(source)
+    prefixed = {f"{prefix}{k}": k for k in src}
+    return {prefixed[p] for p in prefixed.keys() - reference_key_set(reference)}
+
+
+def bulk_normalize_keys(source: Union[Mapping[str, Any], List[Dict]], reference: KeySource,
+                        prefix: str = "US ", index: Optional[RegionIndex] = None) -> Dict[str, Any]:
+    """
+    Bulk form of normalize_keys: prefix every key of a flat mapping and
+    return one merged dict. Keys missing from the reference are reported
+    in a single summary warning. With an index, fuzzy matches are logged,
+    and when several source keys resolve to the same reference key the
+    first one wins and the collision is reported rather than overwritten.
+
+    Args:
+        source: Flat mapping or list of dictionaries (see columns_to_mapping for arrays).
+        reference: Reference mapping, list of dictionaries or iterable of keys.
+        prefix: Prefix to prepend (default: "US ").
+        index: Optional RegionIndex; matched keys map to their reference key.
+
+    Returns:
+        Merged dict with prefixed keys.
+    """
+    src = to_mapping(source)
+    if index is None:
+        normalized = {f"{prefix}{k}": v for k, v in src.items()}
+    else:
+        normalized = {}
+        sources: Dict[str, List[str]] = defaultdict(list)
+        fuzzy: Set[str] = set()
+        for k, v in src.items():
+            matched, is_fuzzy = index.lookup(k, prefix=prefix)
+            target = matched or f"{prefix}{k}"
+            if is_fuzzy:
+                fuzzy.add(f"{k} -> {target}")
+            sources[target].append(k)
+            normalized.setdefault(target, v)
+        summarize_keys(fuzzy, "matched by fuzzy similarity", logging.INFO)
+        collisions = {f"{', '.join(ks)} -> {target} (kept '{ks[0]}')" for target, ks in sources.items() if len(ks) > 1}
+        summarize_keys(collisions, "map to the same reference key, later values dropped")
+    missing = normalized.keys() - reference_key_set(reference)
+    summarize_keys(missing, "not found in reference list, mapped anyway")
+    return normalized
+
+
+def bulk_map_if_missing(source: Union[Mapping[str, Any], List[Dict]], reference: KeySource,
+                        prefix: str = "US ") -> Dict[str, Any]:
+    """
+    Bulk form of map_if_missing: only keys whose prefixed version is
+    missing from the reference are prefixed; the rest are kept as-is.
+    """
+    src = to_mapping(source)
+    missing = bulk_missing_keys(src, reference, prefix)
+    summarize_keys(missing, f"missing from reference, mapped with prefix '{prefix}'", logging.INFO)
+    return {(f"{prefix}{k}" if k in missing else k): v for k, v in src.items()}
+
+
+def bulk_inverse_mapping(source: Union[Mapping[str, Any], List[Dict]], prefix: str = "US ") -> Dict[str, Any]:
+    """Bulk form of inverse_mapping returning one merged dict."""
+    n = len(prefix)
+    return {(k[n:] if k.startswith(prefix) else k): v for k, v in to_mapping(source).items()}
+
+
 if __name__ == "__main__":
     list1 = [
         {"North": "208.127.241.247"},
@@ -0,0 +1,167 @@
+# test_convert_text_to_html.py
+import io
+import json
+import re
+import threading
+import time
+
+import pytest
+
+from convert_text_to_html import (
+    HTML_HEAD,
+    HTML_TAIL,
+    convert_text_to_html,
+    encoded_length,
+    iter_html_chunks,
+    iter_html_fragments,
+    render_note,
+    render_notes_batch,
+)
+
+
+@pytest.fixture
+def note():
+    return "\n".join([
+        "Incident Summary",
+        "Analyst: J",
+        "The host was observed beaconing to a known C2 domain.",
+        "Multiple <script> attempts & failures were seen.",
+        "  powershell -enc AAAA",
+        "C:\\Windows\\System32\\cmd.exe /c whoami",
+        "---",
+        "Recommendations",
+        'Isolate host "WS-01" immediately.',
+    ])
+
+
+def test_convert_text_to_html_output(note):
+    assert convert_text_to_html(note) == (
+        HTML_HEAD
+        + "<h2>Incident Summary</h2><dl><dt>Analyst</dt><dd>J</dd></dl>"
+        "<p>The host was observed beaconing to a known C2 domain. "
+        "Multiple &lt;script&gt; attempts &amp; failures were seen.</p>"
+        "<pre>  powershell -enc AAAA\nC:\\Windows\\System32\\cmd.exe /c whoami</pre>"
+        "<hr /><h2>Recommendations</h2><p>Isolate host &quot;WS-01&quot; immediately.</p>"
+        + HTML_TAIL
+    )
+
+
+def test_fragments_join_to_document(note):
+    assert "".join(iter_html_fragments(note)) == convert_text_to_html(note)
+
+
+def test_chunks_respect_budget_and_element_boundaries(note):
+    text = "\n---\n".join([note] * 50)
+    chunks = list(iter_html_chunks(text, max_encoded_length=1500))
+
+    assert len(chunks) > 1
+    body = convert_text_to_html(text)[len(HTML_HEAD):-len(HTML_TAIL)]
+    assert "".join(c[len(HTML_HEAD):-len(HTML_TAIL)] for c in chunks) == body
+    for chunk in chunks:
+        assert encoded_length(chunk) <= 1500
+        assert chunk.startswith(HTML_HEAD) and chunk.endswith(HTML_TAIL)
+
+
+def test_oversized_element_is_split_without_breaking_entities():
+    text = "Logs\n  " + "a<b & c " * 2000
+    chunks = list(iter_html_chunks(text, max_encoded_length=2000))
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert encoded_length(chunk) <= 2000
+        inner = chunk[len(HTML_HEAD):-len(HTML_TAIL)]
+        assert inner.count("<pre>") == inner.count("</pre>")
+        assert "&am<" not in inner and not inner.endswith("&")
+
+
+def test_oversized_definition_is_split_within_budget():
+    key = "k&" * 1000
+    chunks = list(iter_html_chunks(f"Details\n{key}: x", max_encoded_length=600))
+
+    assert len(chunks) > 1
+    assert all(encoded_length(chunk) <= 600 for chunk in chunks)
+    body = "".join(c[len(HTML_HEAD):-len(HTML_TAIL)] for c in chunks)
+    assert "".join(re.findall(r"<dt>(.*?)</dt>", body)) == key.replace("&", "&amp;")
+    assert body.endswith("</dt><dd>x</dd></dl>")
+
+
+def test_budget_smaller_than_wrapper_raises():
+    with pytest.raises(ValueError):
+        list(iter_html_chunks("x", max_encoded_length=10))
+
+
+def test_render_note_strips_ruleblock_and_chunks(note):
+    raw = {"incident_id": "INC-1", "text": note + "\nRule Block 1 Raw Logs\nraw secret"}
+    assert "raw secret" not in render_note(raw, strip_ruleblock=True)["html"]
+    assert "raw secret" in render_note(raw)["html"]
+
+    chunked = render_note(raw, max_encoded_length=600)
+    assert len(chunked["html_chunks"]) > 1
+    assert render_note({"id": 7})["error"]
+
+
+def test_render_notes_batch_preserves_order_and_reports_metrics(note):
+    lines = [json.dumps({"incident_id": i, "text": note}) for i in range(20)] + ["not json"]
+    out = io.StringIO()
+    metrics = render_notes_batch(lines, out, workers=2, batch_size=4)
+
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["incident_id"] for r in results[:20]] == list(range(20))
+    assert results[0]["html"] == convert_text_to_html(note)
+    assert metrics["notes"] == 21 and metrics["errors"] == 1
+
+
+class _FlushTracker(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.flushed = threading.Event()
+        self.written = 0
+
+    def write(self, s):
+        self.written += 1
+        return super().write(s)
+
+    def flush(self):
+        self.flushed.set()
+
+
+def test_render_notes_batch_streaming_flushes_each_result_and_bounds_read_ahead(note):
+    out = _FlushTracker()
+    ahead = []
+
+    def pipe():
+        yield json.dumps({"incident_id": 0, "text": note})
+        # a long-lived pipe: the next note only arrives after the first result went out
+        assert out.flushed.wait(10), "first result was not flushed before more input arrived"
+        for i in range(1, 40):
+            ahead.append(i - out.written)
+            yield json.dumps({"incident_id": i, "text": note})
+
+    metrics = render_notes_batch(pipe(), out, workers=1, streaming=True)
+
+    assert metrics["notes"] == 40
+    assert [json.loads(l)["incident_id"] for l in out.getvalue().splitlines()] == list(range(40))
+    assert max(ahead) <= 4
+
+
+class _BrokenPipe(io.StringIO):
+    def write(self, s):
+        time.sleep(0.2)  # let the feeder fill its window and block
+        raise BrokenPipeError("reader went away")
+
+
+def test_render_notes_batch_raises_instead_of_hanging_when_output_fails(note):
+    lines = [json.dumps({"incident_id": i, "text": note}) for i in range(200)]
+    raised = []
+
+    def run():
+        try:
+            render_notes_batch(lines, _BrokenPipe(), workers=1, batch_size=1)
+        except BrokenPipeError as e:
+            raised.append(e)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    worker.join(20)
+    assert not worker.is_alive(), "render_notes_batch hung after the writer failed"
+    assert raised
@@ -0,0 +1,144 @@
+# test_data_normalizer.py
+import json
+
+import pytest
+
+from data_normalizer import (
+    HyperLogLog,
+    find_chunk_offsets,
+    normalize_jsonl_parallel,
+    normalize_logs,
+    pack_ip,
+    profile_records,
+    suggest_alias,
+    timestamp_to_ns,
+    write_columnar,
+)
+
+
+@pytest.fixture
+def raw_logs():
+    # Mixed vendor field names, same shape as SIEM exports
+    return [
+        {
+            "SourceIP": "010.000.000.001",
+            "dst_ip": "192.168.1.20",
+            "Time": "2024/01/05 10:15:00",
+            "EventType": "login",
+            "User": f"user{i}",
+            "Port": str(1000 + i),
+        }
+        for i in range(200)
+    ]
+
+
+@pytest.fixture
+def jsonl_file(tmp_path, raw_logs):
+    path = tmp_path / "logs.jsonl"
+    path.write_text("".join(json.dumps(log) + "\n" for log in raw_logs), encoding="utf-8")
+    return path
+
+
+def test_chunk_offsets_cover_file_and_end_on_newlines(jsonl_file):
+    data = jsonl_file.read_bytes()
+    offsets = find_chunk_offsets(str(jsonl_file), chunk_size=500)
+
+    assert offsets[0][0] == 0
+    assert offsets[-1][1] == len(data)
+    for (_, end), (next_start, _) in zip(offsets, offsets[1:]):
+        assert end == next_start
+        assert data[end - 1:end] == b"\n"
+
+
+def test_chunk_offsets_empty_file(tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_text("", encoding="utf-8")
+    assert find_chunk_offsets(str(path)) == []
+
+
+def test_parallel_ordered_matches_serial(jsonl_file, raw_logs, tmp_path):
+    out = tmp_path / "out.jsonl"
+    count = normalize_jsonl_parallel(str(jsonl_file), str(out), workers=2, chunk_size=700)
+
+    lines = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert count == len(raw_logs)
+    assert lines == normalize_logs(raw_logs)
+
+
+def test_parallel_unordered_has_same_records(jsonl_file, raw_logs, tmp_path):
+    out = tmp_path / "out.jsonl"
+    normalize_jsonl_parallel(str(jsonl_file), str(out), workers=2, chunk_size=700, ordered=False)
+
+    lines = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    key = lambda r: r["username"]
+    assert sorted(lines, key=key) == sorted(normalize_logs(raw_logs), key=key)
+
+
+def test_write_columnar_parquet_types(raw_logs, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    out = tmp_path / "out.parquet"
+    count = write_columnar(normalize_logs(raw_logs), str(out), fmt="parquet", batch_size=64)
+
+    table = pq.read_table(str(out))
+    assert count == table.num_rows == len(raw_logs)
+    assert str(table.schema.field("port").type) == "int32"
+    row = table.slice(0, 1).to_pylist()[0]
+    assert row["source_ip"] == pack_ip("10.0.0.1")
+    assert row["port"] == 1000
+    assert row["timestamp"].isoformat() == "2024-01-05T10:15:00+00:00"
+
+
+def test_write_columnar_arrow_ipc_memory_maps(raw_logs, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    out = tmp_path / "out.arrow"
+    write_columnar(iter(normalize_logs(raw_logs)), str(out), fmt="arrow")
+
+    with pa.memory_map(str(out)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    assert table.column("username").to_pylist() == [log["User"] for log in raw_logs]
+
+
+def test_pack_ip_and_timestamp_helpers():
+    assert pack_ip("not-an-ip") is None
+    assert len(pack_ip("2001:db8::1")) == 16
+    assert timestamp_to_ns("1970-01-01T00:00:01") == 1_000_000_000
+    assert timestamp_to_ns("05-01-2024") is None
+
+
+def test_hyperloglog_estimate_is_close():
+    hll = HyperLogLog()
+    for i in range(50000):
+        hll.add(f"host-{i}")
+    assert abs(hll.count() - 50000) / 50000 < 0.05
+
+
+def test_profile_reports_unknown_keys_and_suggestions():
+    records = [
+        {"src_ip": "10.0.0.1", "SrcPort": 443, "hostname": f"ws{i % 3}", "src-ip": "x"}
+        for i in range(30)
+    ]
+    report = profile_records(records)
+
+    by_key = {item["key"]: item for item in report["unknown_keys"]}
+    assert report["records_seen"] == 30
+    assert "src_ip" not in by_key
+    assert by_key["hostname"]["approx_distinct"] == 3
+    assert by_key["SrcPort"]["types"] == {"int": 30}
+    assert by_key["src-ip"]["suggested_field"] == "source_ip"
+
+
+def test_profile_respects_max_keys_and_sampling():
+    records = [{f"k{i}": i} for i in range(10)]
+    report = profile_records(records, max_keys=4)
+    assert len(report["unknown_keys"]) == 4
+    assert report["untracked_occurrences"] == 6
+
+    sampled = profile_records(records, sample_rate=0.5, seed=1)
+    assert sampled["records_seen"] == 10
+    assert sampled["records_sampled"] < 10
+
+
+def test_suggest_alias():
+    assert suggest_alias("DestinationIp") == "destination_ip"
+    assert suggest_alias("user_name") == "username"
+    assert suggest_alias("process_guid") is None
@@ -0,0 +1,76 @@
+# test_dns_api.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+
+from dns_automation.api import MicroBatcher, create_app
+from dns_automation.config import Settings
+from dns_automation.models import DnsQueryEvent
+
+DGA = "xjw8q2kd9z3mfl1pq7.top"
+
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    cfg = Settings(score_batch_max_items=64, score_batch_max_wait_ms=50)
+
+    async def scenario():
+        batcher = MicroBatcher(cfg)
+        batcher.start()
+        try:
+            results = await asyncio.gather(*(
+                batcher.score([DnsQueryEvent(qname=f"host{i}.example.com")]) for i in range(20)
+            ))
+        finally:
+            await batcher.stop()
+        return batcher, results
+
+    batcher, results = asyncio.run(scenario())
+    assert len(results) == 20
+    assert batcher.batches == 1
+    assert batcher.stats()["avg_batch_size"] == 20
+
+
+def test_micro_batcher_splits_at_max_items():
+    cfg = Settings(score_batch_max_items=4, score_batch_max_wait_ms=200)
+
+    async def scenario():
+        batcher = MicroBatcher(cfg)
+        batcher.start()
+        try:
+            events = [DnsQueryEvent(qname=f"h{i}.example") for i in range(10)]
+            return batcher, await batcher.score(events)
+        finally:
+            await batcher.stop()
+
+    batcher, results = asyncio.run(scenario())
+    assert len(results) == 10
+    assert batcher.batches == 3
+
+
+def test_score_endpoint_single_batch_and_metrics():
+    app = create_app(Settings(score_batch_max_wait_ms=1))
+
+    async def scenario():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                single = await client.post("/score", json={"qname": DGA})
+                batch = await client.post("/score", json=[{"qname": "www.example.com"}, {"qname": DGA}])
+                empty = await client.post("/score", json=[])
+                metrics = await client.get("/metrics")
+        return single, batch, empty, metrics
+
+    single, batch, empty, metrics = asyncio.run(scenario())
+    assert single.status_code == 200
+    assert single.json()["disposition"] == "block"
+    assert "looks_like_dga" in single.json()["reasons"]
+    assert [r["disposition"] for r in batch.json()] == ["allow", "block"]
+    assert empty.json() == []
+    body = metrics.json()
+    assert body["requests"]["count"] == 3
+    assert body["requests"]["p99_ms"] >= body["requests"]["p50_ms"] > 0
+    assert body["scoring"]["count"] == body["batches"] >= 2
@@ -0,0 +1,115 @@
+# test_dns_cache.py
+import asyncio
+
+import pytest
+
+pytest.importorskip("dns.asyncresolver")
+
+from dns_automation.cache import CachedEnricher, EnrichmentCache
+from dns_automation.config import Settings
+from dns_automation.enrichment import DomainLookup
+from dns_automation.models import Enrichment
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeEnricher:
+    """Stands in for DnsEnricher; answers every name with a fixed TTL."""
+
+    def __init__(self, ttl=60, nxdomain=()):
+        self.ttl = ttl
+        self.nxdomain = set(nxdomain)
+        self.calls = 0
+
+    async def lookup(self, name):
+        self.calls += 1
+        if name in self.nxdomain:
+            return DomainLookup(Enrichment(domain=name), ttl=None, nxdomain=True)
+        return DomainLookup(Enrichment(domain=name, a_records=["192.0.2.1"]), ttl=self.ttl, nxdomain=False)
+
+
+def lookup(name, ttl=60, nxdomain=False, errors=()):
+    return DomainLookup(Enrichment(domain=name), ttl=ttl, nxdomain=nxdomain, errors=errors)
+
+
+def test_entries_expire_with_ttl():
+    clock = FakeClock()
+    cache = EnrichmentCache(clock=clock)
+    cache.put("a.test", lookup("a.test", ttl=30))
+
+    assert cache.get("a.test") is not None
+    clock.now += 31
+    assert cache.get("a.test") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_negative_answers_use_negative_ttl_and_failures_are_skipped():
+    clock = FakeClock()
+    cache = EnrichmentCache(negative_ttl_s=10, clock=clock)
+    cache.put("nx.test", lookup("nx.test", ttl=None, nxdomain=True))
+    cache.put("timeout.test", lookup("timeout.test", ttl=None))
+
+    assert cache.get("nx.test").nxdomain
+    assert cache.get("timeout.test") is None
+    clock.now += 11
+    assert cache.get("nx.test") is None
+    assert cache.negative_hits == 1
+
+
+def test_partial_lookups_use_negative_ttl():
+    clock = FakeClock()
+    cache = EnrichmentCache(negative_ttl_s=10, clock=clock)
+    cache.put("partial.test", lookup("partial.test", ttl=3600, errors=("MX", "TXT")))
+    cache.put("full.test", lookup("full.test", ttl=3600))
+
+    clock.now += 11
+    assert cache.get("partial.test") is None
+    assert cache.get("full.test") is not None
+
+
+def test_lru_eviction():
+    cache = EnrichmentCache(max_entries=2, clock=FakeClock())
+    cache.put("a.test", lookup("a.test"))
+    cache.put("b.test", lookup("b.test"))
+    cache.get("a.test")
+    cache.put("c.test", lookup("c.test"))
+
+    assert cache.get("b.test") is None
+    assert cache.get("a.test") is not None
+    assert cache.evictions == 1
+
+
+def test_save_and_load_round_trip(tmp_path):
+    clock = FakeClock()
+    cache = EnrichmentCache(clock=clock)
+    cache.put("a.test", lookup("a.test", ttl=100))
+    cache.put("short.test", lookup("short.test", ttl=5))
+    cache.put("partial.test", lookup("partial.test", ttl=100, errors=("TXT",)))
+    path = tmp_path / "cache.jsonl"
+    assert cache.save(path) == 3
+
+    clock.now += 10
+    warm = EnrichmentCache(clock=clock)
+    assert warm.load(path) == 2
+    assert warm.get("a.test").enrichment.domain == "a.test"
+    assert warm.get("partial.test").errors == ("TXT",)
+
+
+def test_cached_enricher_counts_hits_and_misses():
+    async def scenario():
+        fake = FakeEnricher(nxdomain={"nx.test"})
+        enricher = CachedEnricher(fake, EnrichmentCache(clock=FakeClock()), cfg=Settings())
+        for name in ["a.test", "A.test.", "a.test", "nx.test", "nx.test"]:
+            await enricher.lookup(name)
+        return fake, enricher.stats()
+
+    fake, stats = asyncio.run(scenario())
+    assert fake.calls == 2
+    assert stats["hits"] == 3 and stats["misses"] == 2
+    assert stats["hit_rate"] == 0.6
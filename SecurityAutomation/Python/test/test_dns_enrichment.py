@@ -0,0 +1,151 @@
+# test_dns_enrichment.py
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import pytest
+
+dns_message = pytest.importorskip("dns.message")
+import dns.rcode
+import dns.rrset
+
+from dns_automation.config import Settings
+from dns_automation.enrichment import DnsEnricher
+
+STUB_ZONE = {
+    ("example.test.", "A"): ["192.0.2.10"],
+    ("example.test.", "AAAA"): ["2001:db8::10"],
+    ("example.test.", "MX"): ["10 mail.example.test."],
+    ("example.test.", "TXT"): ['"v=spf1 -all"'],
+    ("alias.test.", "CNAME"): ["example.test."],
+    ("flaky.test.", "A"): ["192.0.2.20"],
+}
+STUB_SERVFAIL = {("flaky.test.", "TXT")}
+
+
+class StubDnsServer(asyncio.DatagramProtocol):
+    """Answers from STUB_ZONE, NXDOMAIN for unknown names, following CNAMEs for A."""
+
+    def __init__(self):
+        self.queries = Counter()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query = dns_message.from_wire(data)
+        question = query.question[0]
+        name, rtype = question.name.to_text(), dns.rdatatype.to_text(question.rdtype)
+        self.queries[(name, rtype)] += 1
+
+        response = dns_message.make_response(query)
+        known = {n for n, _ in STUB_ZONE}
+        if (name, rtype) in STUB_SERVFAIL:
+            response.set_rcode(dns.rcode.SERVFAIL)
+        elif name not in known:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        else:
+            target = name
+            cname = STUB_ZONE.get((name, "CNAME"))
+            if cname and rtype != "CNAME":
+                response.answer.append(dns.rrset.from_text(name, 300, "IN", "CNAME", *cname))
+                target = cname[0]
+            values = STUB_ZONE.get((target, rtype))
+            if values:
+                response.answer.append(dns.rrset.from_text(target, 60, "IN", rtype, *values))
+        self.transport.sendto(response.to_wire(), addr)
+
+
+@asynccontextmanager
+async def stub_dns():
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(StubDnsServer, local_addr=("127.0.0.1", 0))
+    server.port = transport.get_extra_info("sockname")[1]
+    try:
+        yield server
+    finally:
+        transport.close()
+
+
+def stub_settings(server):
+    return Settings(
+        resolver_nameservers=["127.0.0.1"],
+        resolver_port=server.port,
+        resolver_timeout_s=1.0,
+        resolver_lifetime_s=2.0,
+    )
+
+
+def test_enrich_collects_all_record_types():
+    async def scenario():
+        async with stub_dns() as server:
+            enricher = DnsEnricher(stub_settings(server), concurrency=4)
+            result = await enricher.lookup("Example.test.")
+
+            assert result.enrichment.a_records == ["192.0.2.10"]
+            assert result.enrichment.aaaa_records == ["2001:db8::10"]
+            assert result.enrichment.mx_records == ["10 mail.example.test."]
+            assert result.enrichment.txt_records == ["v=spf1 -all"]
+            assert result.ttl == 60
+            assert not result.nxdomain
+
+    asyncio.run(scenario())
+
+
+def test_enrich_follows_cname_chain():
+    async def scenario():
+        async with stub_dns() as server:
+            enricher = DnsEnricher(stub_settings(server))
+            enrichment = await enricher.enrich("alias.test")
+            assert enrichment.cname_chain == ["example.test."]
+            assert enrichment.a_records == ["192.0.2.10"]
+
+    asyncio.run(scenario())
+
+
+def test_nxdomain_is_reported():
+    async def scenario():
+        async with stub_dns() as server:
+            result = await DnsEnricher(stub_settings(server)).lookup("missing.test")
+            assert result.nxdomain
+            assert result.enrichment.a_records == []
+
+    asyncio.run(scenario())
+
+
+def test_failed_record_types_are_reported():
+    async def scenario():
+        async with stub_dns() as server:
+            enricher = DnsEnricher(stub_settings(server))
+            flaky, full = await asyncio.gather(enricher.lookup("flaky.test"), enricher.lookup("example.test"))
+            assert flaky.enrichment.a_records == ["192.0.2.20"]
+            assert flaky.errors == ("TXT",)  # SERVFAIL; the empty MX/AAAA answers are not errors
+            assert full.errors == ()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_lookups_for_same_name_are_deduped():
+    async def scenario():
+        async with stub_dns() as server:
+            enricher = DnsEnricher(stub_settings(server), concurrency=2)
+            results = await enricher.enrich_many(["example.test"] * 10 + ["alias.test"])
+
+            assert len(results) == 11
+            assert server.queries[("example.test.", "A")] == 1
+            assert not enricher._in_flight
+
+    asyncio.run(scenario())
+
+
+def test_malformed_names_return_empty_lookup():
+    async def scenario():
+        async with stub_dns() as server:
+            enricher = DnsEnricher(stub_settings(server))
+            ok, empty_label, too_long = await enricher.enrich_many(["example.test", "a..b", "x" * 64 + ".test"])
+
+            assert ok.a_records == ["192.0.2.10"]
+            assert empty_label.domain == "a..b"
+            assert empty_label.a_records == [] and too_long.mx_records == []
+
+    asyncio.run(scenario())
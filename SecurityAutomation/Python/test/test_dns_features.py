@@ -0,0 +1,52 @@
+# test_dns_features.py
+import math
+from collections import Counter
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from dns_automation.features import extract_event_features, extract_features, extract_features_batch
+from dns_automation.models import DnsQueryEvent
+
+
+def shannon(name: str) -> float:
+    counts = Counter(name)
+    return -sum(c / len(name) * math.log2(c / len(name)) for c in counts.values()) if name else 0.0
+
+
+QNAMES = [
+    "www.google.com.",
+    "xjw8q2kd9z3mfl1p.top",
+    "a-b-c-d.example.org",
+    "aGVsbG8gd29ybGQgdGhpcyBpcyBhIGxvbmcgdHVubmVsIGxhYmVs.t.example.net",
+    "",
+]
+
+
+def test_batch_matches_per_name_reference():
+    block = extract_features_batch(QNAMES, ["A", "A", "A", "TXT", "A"], chunk_rows=2)
+
+    for i, qname in enumerate(QNAMES):
+        name = qname.rstrip(".").lower()
+        assert block.qname_len[i] == len(name)
+        assert block.label_count[i] == (len(name.split(".")) if name else 0)
+        assert block.entropy[i] == pytest.approx(shannon(name))
+        assert block.has_digits[i] == any(ch.isdigit() for ch in name)
+
+
+def test_flags():
+    rows = list(extract_features_batch(QNAMES, ["A", "A", "A", "TXT", "A"]).rows())
+
+    assert not rows[0].looks_like_dga and not rows[0].suspicious_tld
+    assert rows[1].looks_like_dga and rows[1].suspicious_tld
+    assert rows[2].has_many_dashes
+    assert rows[3].looks_like_tunnel and rows[3].uses_txt
+
+
+def test_event_helpers_and_empty_batch():
+    events = [DnsQueryEvent(qname="mail.corp.example"), DnsQueryEvent(qname="x.example", qtype="TXT")]
+    block = extract_event_features(events)
+    assert block.uses_txt.tolist() == [False, True]
+    assert extract_features(events[0]) == block.row(0)
+    assert len(extract_features_batch([])) == 0
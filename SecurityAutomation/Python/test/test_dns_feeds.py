@@ -0,0 +1,139 @@
+# test_dns_feeds.py
+import asyncio
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("numpy")
+
+from dns_automation.config import Settings
+from dns_automation.feeds import FeedFetcher, parse_feed_line
+from dns_automation.lists import SUBTREE, WILDCARD, ListPolicy, DomainListMatcher
+
+FEEDS = {
+    "/hosts.txt": ('"v1"', "# hosts feed\n0.0.0.0 ads.example\n0.0.0.0 track.example\n"),
+    "/adblock.txt": ('"v7"', "[Adblock Plus 2.0]\n! comment\n||evil.example^\n||cdn.example/path^\n*.wild.example\n"),
+}
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    hits = Counter()
+
+    def do_GET(self):
+        self.hits[self.path] += 1
+        if self.path not in FEEDS:
+            self.send_error(500)
+            return
+        etag, body = FEEDS[self.path]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        # a "truncated" etag announces more bytes than are sent: the download breaks off midway
+        self.send_header("Content-Length", str(len(data) + (100 if "truncated" in etag else 0)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feed_server():
+    FeedHandler.hits.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cfg(tmp_path, feed_server):
+    feeds = tmp_path / "feeds.txt"
+    feeds.write_text(
+        f"{feed_server}/hosts.txt\n{feed_server}/adblock.txt  # adblock\n{feed_server}/broken.txt\n",
+        encoding="utf-8",
+    )
+    return Settings(
+        feeds_path=str(feeds),
+        feed_state_path=str(tmp_path / "state.json"),
+        feed_cache_dir=str(tmp_path / "cache"),
+        feed_timeout_s=5,
+    )
+
+
+def test_parse_feed_line():
+    assert parse_feed_line("||Evil.Example^") == ("evil.example", SUBTREE)
+    assert parse_feed_line("||evil.example^$third-party") == ("evil.example", SUBTREE)
+    assert parse_feed_line("||evil.example/ads^") is None
+    assert parse_feed_line("! title") is None
+    assert parse_feed_line("*.wild.example") == ("wild.example", WILDCARD)
+
+
+def test_fetch_all_merges_then_uses_conditional_requests(cfg):
+    fetcher = FeedFetcher(cfg)
+    first = {r.url.rsplit("/", 1)[-1]: r for r in asyncio.run(fetcher.fetch_all())}
+
+    assert first["hosts.txt"].status == "updated" and first["hosts.txt"].entries == 2
+    assert first["adblock.txt"].entries == 2
+    assert first["broken.txt"].status == "error"
+    assert fetcher.trie.match("x.track.example") == "track.example"
+    assert fetcher.trie.match("a.wild.example") == "*.wild.example"
+    assert fetcher.trie.match("cdn.example") is None
+
+    second = {r.url.rsplit("/", 1)[-1]: r.status for r in asyncio.run(fetcher.fetch_all())}
+    assert second == {"hosts.txt": "not_modified", "adblock.txt": "not_modified", "broken.txt": "error"}
+
+
+def test_fresh_process_fills_trie_from_cache_on_304(cfg):
+    asyncio.run(FeedFetcher(cfg).fetch_all())
+
+    policy = ListPolicy(DomainListMatcher(cfg.allowlist_path), DomainListMatcher(cfg.denylist_path))
+    fetcher = FeedFetcher(cfg, trie=policy.feeds)
+    results = asyncio.run(fetcher.fetch_all())
+
+    assert [r.status for r in results[:2]] == ["not_modified", "not_modified"]
+    assert sum(r.entries for r in results) == 4
+    assert policy.check("www.evil.example") == "deny"
+    assert FeedHandler.hits["/hosts.txt"] == 2
+
+
+def test_names_removed_upstream_stop_matching(cfg, feed_server, monkeypatch):
+    fetcher = FeedFetcher(cfg)
+    asyncio.run(fetcher.fetch_all())
+    assert fetcher.trie.match("ads.example") == "ads.example"
+
+    monkeypatch.setitem(FEEDS, "/hosts.txt", ('"v2"', "0.0.0.0 track.example\n0.0.0.0 new.example\n"))
+    asyncio.run(fetcher.fetch_all())
+    assert fetcher.trie.match("ads.example") is None
+    assert fetcher.trie.match("new.example") == "new.example"
+    assert fetcher.trie.match("evil.example") == "evil.example"
+    assert len(fetcher.trie) == 4
+
+    Path(cfg.feeds_path).write_text(f"{feed_server}/adblock.txt\n", encoding="utf-8")
+    asyncio.run(fetcher.fetch_all())
+    assert fetcher.trie.match("track.example") is None
+    assert len(fetcher.trie) == 2
+
+
+def test_interrupted_download_keeps_previous_entries(cfg, monkeypatch):
+    fetcher = FeedFetcher(cfg)
+    asyncio.run(fetcher.fetch_all())
+
+    monkeypatch.setitem(FEEDS, "/hosts.txt", ('"v3-truncated"', "0.0.0.0 partial.example\n"))
+    results = {r.url.rsplit("/", 1)[-1]: r for r in asyncio.run(fetcher.fetch_all())}
+
+    assert results["hosts.txt"].status == "error"
+    assert results["hosts.txt"].entries == 2
+    assert fetcher.trie.match("partial.example") is None
+    assert fetcher.trie.match("ads.example") == "ads.example"
@@ -0,0 +1,140 @@
+# test_dns_lists.py
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from dns_automation.config import Settings
+from dns_automation.lists import (
+    COMPILED_MAGIC,
+    SUBTREE,
+    WILDCARD,
+    DomainListMatcher,
+    ListPolicy,
+    SuffixTrie,
+    parse_entry,
+)
+
+
+@pytest.fixture
+def trie():
+    t = SuffixTrie()
+    for line in ["example.com", "*.wild.org", "0.0.0.0 ads.tracker.net  # hosts format", "deep.sub.example.com"]:
+        t.add(*parse_entry(line))
+    return t
+
+
+def test_parse_entry():
+    assert parse_entry("Example.COM.") == ("example.com", SUBTREE)
+    assert parse_entry("*.wild.org") == ("wild.org", WILDCARD)
+    assert parse_entry("127.0.0.1 bad.example ; note") == ("bad.example", SUBTREE)
+    assert parse_entry("# only a comment") is None
+    assert parse_entry("a.*.example") is None
+
+
+def test_parse_entry_skips_local_hosts_entries():
+    for line in ["127.0.0.1 localhost", "127.0.0.1\tlocalhost.localdomain", "::1 ip6-localhost",
+                 "::1 localhost ip6-loopback", "255.255.255.255 broadcasthost", "ff02::2 ip6-allrouters",
+                 "0.0.0.0 0.0.0.0"]:
+        assert parse_entry(line) is None, line
+    assert parse_entry("0.0.0.0 localhost.evil.com") == ("localhost.evil.com", SUBTREE)
+
+
+def test_empty_labels_rejected(trie):
+    assert parse_entry("a..evil.com") is None
+    assert parse_entry(".evil.com") is None
+    with pytest.raises(ValueError):
+        trie.add("a..example.com")
+    trie.add("evil.com", WILDCARD)
+    assert trie.match("b.evil.com") == "*.evil.com"
+    assert trie.match("evil.com") is None
+    assert trie.match("a..evil.com") is None
+    assert trie.match(".example.com") is None
+
+
+def test_match_parent_and_wildcard(trie):
+    assert trie.match("example.com") == "example.com"
+    assert trie.match("WWW.Example.com.") == "example.com"
+    assert trie.match("x.deep.sub.example.com") == "deep.sub.example.com"
+    assert trie.match("wild.org") is None
+    assert trie.match("a.b.wild.org") == "*.wild.org"
+    assert trie.match("tracker.net") is None
+    assert trie.match("cdn.ads.tracker.net") == "ads.tracker.net"
+    assert "notexample.com" not in trie
+    assert len(trie) == 4
+
+
+def test_leaf_promoted_when_child_added():
+    t = SuffixTrie()
+    t.add("b.example")
+    t.add("b.example", WILDCARD)
+    t.add("a.b.example")
+    assert len(t) == 2
+    assert t.match("b.example") == "b.example"
+    assert sorted(t.entries()) == [("a.b.example", SUBTREE), ("b.example", SUBTREE), ("b.example", WILDCARD)]
+
+
+def test_compiled_round_trip(trie, tmp_path):
+    text = tmp_path / "deny.txt"
+    text.write_text("example.com\n*.wild.org\n\n# c\n", encoding="utf-8")
+    compiled = tmp_path / "deny.trie"
+    assert SuffixTrie.compile(text, compiled) == 2
+
+    loaded = SuffixTrie.load(compiled)
+    assert len(loaded) == 2
+    assert loaded.match("a.wild.org") == "*.wild.org"
+    assert loaded.root == SuffixTrie.load(text).root
+
+
+def test_compiled_file_from_another_interpreter_is_rejected(tmp_path):
+    compiled = tmp_path / "deny.trie"
+    text = tmp_path / "deny.txt"
+    text.write_text("example.com\n", encoding="utf-8")
+    SuffixTrie.compile(text, compiled)
+    data = bytearray(compiled.read_bytes())
+    data[len(COMPILED_MAGIC) + 2] ^= 0xFF  # Python minor version
+    compiled.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="recompile"):
+        SuffixTrie.load(compiled)
+
+    compiled.write_bytes(b"DNSTRIE1" + bytes(9) + b"\x00")
+    with pytest.raises(ValueError, match="older compiled list format"):
+        SuffixTrie.load(compiled)
+
+
+def test_matcher_hot_reload(tmp_path):
+    path = tmp_path / "deny.txt"
+    path.write_text("old.example\n", encoding="utf-8")
+    matcher = DomainListMatcher(path)
+    assert matcher.reload()
+    assert not matcher.reload()
+    before = matcher.trie
+
+    path.write_text("new.example\n", encoding="utf-8")
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+
+    async def scenario():
+        task = asyncio.create_task(matcher.watch(0.01))
+        for _ in range(100):
+            if matcher.trie is not before:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert matcher.match("x.new.example") == "new.example"
+    assert matcher.match("old.example") is None
+    assert before.match("old.example") == "old.example"
+
+
+def test_policy_allow_overrides_deny(tmp_path):
+    (tmp_path / "allow.txt").write_text("good.example.com\n", encoding="utf-8")
+    (tmp_path / "deny.txt").write_text("example.com\n", encoding="utf-8")
+    cfg = Settings(allowlist_path=str(tmp_path / "allow.txt"), denylist_path=str(tmp_path / "deny.txt"))
+    policy = ListPolicy.from_settings(cfg)
+
+    assert policy.check("www.good.example.com") == "allow"
+    assert policy.check("bad.example.com") == "deny"
+    assert policy.check("example.org") is None
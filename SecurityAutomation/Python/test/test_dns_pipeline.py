@@ -0,0 +1,151 @@
+# test_dns_pipeline.py
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from dns_automation.config import Settings
+from dns_automation.models import Features
+from dns_automation.pipeline import (
+    QueryLogPipeline,
+    SlidingWindowDeduper,
+    parse_bind_line,
+    parse_jsonl_line,
+    tail_lines,
+)
+from dns_automation.scoring import score_features
+
+DGA = "xjw8q2kd9z3mfl1pq7.top"
+TUNNEL = "aGVsbG8gd29ybGQgdGhpcyBpcyBhIGxvbmcgdHVubmVsIGxhYmVs.t.example.net"
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+def test_parse_bind_line():
+    line = (
+        "19-Oct-2026 10:00:00.123 queries: info: client @0x7f12 192.0.2.10#53211 "
+        "(Example.COM): query: Example.COM IN TXT +E(0)K (10.0.0.1)"
+    )
+    event = parse_bind_line(line)
+    assert (event.src_ip, event.qname, event.qtype) == ("192.0.2.10", "Example.COM", "TXT")
+    assert event.timestamp == "19-Oct-2026 10:00:00.123"
+    assert parse_bind_line("19-Oct-2026 10:00:00.123 general: info: zone loaded") is None
+
+
+def test_parse_jsonl_line_aliases():
+    event = parse_jsonl_line(json.dumps({"message": {"query_name": "a.example.", "query_type": "AAAA"}}))
+    assert (event.qname, event.qtype) == ("a.example.", "AAAA")
+    assert parse_jsonl_line('{"qtype": "A"}') is None
+    assert parse_jsonl_line("not json") is None
+
+
+def test_deduper_window_and_capacity():
+    now = [0.0]
+    dedupe = SlidingWindowDeduper(window_s=10, max_entries=2, clock=lambda: now[0])
+
+    assert dedupe.is_new("a")
+    assert not dedupe.is_new("a")
+    now[0] = 11
+    assert dedupe.is_new("a")
+    assert dedupe.is_new("b") and dedupe.is_new("c")
+    assert len(dedupe) == 2
+
+
+def test_score_features_thresholds():
+    cfg = Settings(score_block_threshold=85, score_review_threshold=50)
+    base = dict(qname_len=10, label_count=2, entropy=2.0, has_digits=False, has_many_dashes=False,
+                suspicious_tld=False, looks_like_dga=False, looks_like_tunnel=False, uses_txt=False)
+    assert score_features(Features(**base), cfg).disposition == "allow"
+
+    result = score_features(Features(**{**base, "looks_like_dga": True, "suspicious_tld": True, "entropy": 4.2}), cfg)
+    assert result.disposition == "block"
+    assert result.reasons == ["looks_like_dga", "suspicious_tld", "high_entropy"]
+
+
+def test_pipeline_dedupes_scores_and_reports_metrics():
+    cfg = Settings(pipeline_batch_size=2, pipeline_queue_size=4)
+    lines = [json.dumps({"qname": q, "qtype": t}) for q, t in [
+        ("www.google.com", "A"),
+        (DGA, "A"),
+        (DGA.upper() + ".", "A"),
+        (TUNNEL, "TXT"),
+        ("mail.example.org", "MX"),
+    ]] + ["garbage", ""]
+
+    async def scenario():
+        pipeline = QueryLogPipeline(cfg)
+        decisions = [d async for d in pipeline.run(_aiter(lines))]
+        return pipeline, decisions
+
+    pipeline, decisions = asyncio.run(scenario())
+    assert {d.domain for d in decisions} == {DGA, TUNNEL.lower()}
+    assert all(d.disposition in ("review", "block") and not d.written_to_rpz for d in decisions)
+
+    stages = pipeline.metrics()["stages"]
+    assert stages["parse"]["items_in"] == 7 and stages["parse"]["dropped"] == 2
+    assert stages["batch"]["dropped"] == 1
+    assert stages["score"]["items_in"] == 4 and stages["score"]["items_out"] == 2
+
+
+def test_pipeline_flushes_partial_batch_on_timeout():
+    cfg = Settings(pipeline_batch_size=100, pipeline_batch_timeout_ms=20)
+
+    async def slow_source():
+        yield json.dumps({"qname": DGA})
+        await asyncio.sleep(0.2)
+        yield json.dumps({"qname": "www.example.com"})
+
+    async def scenario():
+        pipeline = QueryLogPipeline(cfg, emit_allow=True)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async for decision in pipeline.run(slow_source()):
+            return decision, loop.time() - start
+
+    decision, elapsed = asyncio.run(scenario())
+    assert decision.domain == DGA
+    assert elapsed < 0.2
+
+
+def test_tail_lines_follows_appends(tmp_path):
+    path = tmp_path / "queries.log"
+    path.write_text("one\ntw", encoding="utf-8")
+
+    async def scenario():
+        seen = []
+        gen = tail_lines(str(path), poll_interval_s=0.01)
+        seen.append(await gen.__anext__())
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("o\nthree\n")
+        seen.append(await gen.__anext__())
+        seen.append(await gen.__anext__())
+        await gen.aclose()
+        return seen
+
+    assert asyncio.run(scenario()) == ["one", "two", "three"]
+
+
+def test_tail_lines_drains_old_file_on_rotation(tmp_path):
+    path = tmp_path / "queries.log"
+    path.write_text("one\n", encoding="utf-8")
+
+    async def scenario():
+        gen = tail_lines(str(path), poll_interval_s=0.2)
+        seen = [await gen.__anext__()]
+        nxt = asyncio.ensure_future(gen.__anext__())
+        await asyncio.sleep(0.05)  # tail is now waiting at EOF
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("two\n")
+        path.rename(tmp_path / "queries.log.1")
+        path.write_text("three\n", encoding="utf-8")
+        seen.append(await asyncio.wait_for(nxt, 2))
+        seen.append(await asyncio.wait_for(gen.__anext__(), 2))
+        await gen.aclose()
+        return seen
+
+    assert asyncio.run(scenario()) == ["one", "two", "three"]
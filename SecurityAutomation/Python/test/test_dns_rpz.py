@@ -0,0 +1,100 @@
+# test_dns_rpz.py
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from dns_automation.config import Settings
+from dns_automation.models import BlockDecision
+from dns_automation.rpz import RpzWriter, next_serial
+
+NOW = datetime(2026, 10, 19, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def writer(tmp_path):
+    cfg = Settings(rpz_output_path=str(tmp_path / "rpz.zone"), rpz_compact_every=100)
+    w = RpzWriter(cfg, ixfr_path=tmp_path / "rpz.ixfr", clock=lambda: NOW)
+    yield w
+    w.close()
+
+
+def test_next_serial():
+    assert next_serial(0, NOW) == 2026101900
+    assert next_serial(2026101900, NOW) == 2026101901
+    assert next_serial(2030010100, NOW) == 2030010101
+
+
+def test_index_is_canonical_order(writer):
+    for name in ["b.example.com", "a.example.org", "example.com.", "A.Example.com"]:
+        writer.add(name)
+    assert list(writer.names()) == ["example.com", "a.example.com", "b.example.com", "a.example.org"]
+    assert "EXAMPLE.COM" in writer
+    assert writer.remove("b.example.com")
+    assert not writer.remove("b.example.com")
+    assert list(writer.names()) == ["example.com", "a.example.com", "a.example.org"]
+
+
+def test_deltas_are_journaled_and_replayed(writer):
+    writer.add("bad.example")
+    writer.add("evil.example", "CNAME sinkhole.local.")
+    writer.remove("bad.example")
+    writer.close()
+    assert not writer.path.exists()
+
+    restored = RpzWriter(writer.cfg)
+    assert restored.load() == 1
+    assert list(restored.names()) == ["evil.example"]
+    assert restored.pending == 1
+
+
+def test_compact_writes_zone_bumps_serial_and_clears_journal(writer):
+    writer.add("bad.example")
+    assert writer.compact() == 2026101900
+    zone = writer.path.read_text(encoding="utf-8")
+    assert "$ORIGIN rpz.local." in zone
+    assert "( 2026101900 " in zone
+    assert "bad.example CNAME .\n*.bad.example CNAME .\n" in zone
+    assert not writer.journal_path.exists()
+    assert writer.pending == 0
+
+    writer.add("worse.example")
+    writer.remove("bad.example")
+    assert writer.compact() == 2026101901
+
+    reloaded = RpzWriter(writer.cfg)
+    reloaded.load()
+    assert reloaded.serial == 2026101901
+    assert list(reloaded.names()) == ["worse.example"]
+
+
+def test_ixfr_diff_lists_deleted_then_added(writer):
+    writer.add("bad.example")
+    writer.compact()
+    writer.add("worse.example")
+    writer.remove("bad.example")
+    writer.add("flip.example")
+    writer.remove("flip.example")  # net no-op, not in the diff
+    writer.compact()
+
+    last = writer.ixfr_path.read_text(encoding="utf-8").split("; serial ")[-1].splitlines()
+    assert last[0] == "2026101900 -> 2026101901"
+    assert "SOA" in last[1] and "( 2026101900 " in last[1]
+    assert last[2:4] == ["bad.example CNAME .", "*.bad.example CNAME ."]
+    assert "( 2026101901 " in last[4]
+    assert last[5:] == ["worse.example CNAME .", "*.worse.example CNAME ."]
+
+
+def test_apply_marks_blocks_and_compacts_at_threshold(tmp_path):
+    cfg = Settings(rpz_output_path=str(tmp_path / "rpz.zone"), rpz_compact_every=2)
+    writer = RpzWriter(cfg)
+    decisions = [
+        BlockDecision(domain="a.example", score=95, disposition="block", written_to_rpz=False),
+        BlockDecision(domain="b.example", score=60, disposition="review", written_to_rpz=False),
+        BlockDecision(domain="c.example", score=90, disposition="block", written_to_rpz=False),
+    ]
+    out = writer.apply(decisions)
+    assert [d.written_to_rpz for d in out] == [True, False, True]
+    assert writer.path.exists() and writer.pending == 0
+    writer.close()
@@ -0,0 +1,123 @@
+# test_dns_zone_diff.py
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("dns.message")
+
+from dns_automation.config import Settings
+from dns_automation.zone_diff import (
+    diff_snapshots,
+    iter_snapshot,
+    parse_zone_lines,
+    sorted_records,
+    stale_a_records_report,
+    write_diff,
+)
+from test_dns_enrichment import stub_dns, stub_settings
+
+SNAPSHOT_A = """\
+$ORIGIN example.test.
+$TTL 300
+@           IN SOA ns1 hostmaster 1 3600 600 86400 300
+@           IN NS  ns1
+www         IN A   192.0.2.1
+www         IN A   192.0.2.2
+old     60  IN A   192.0.2.9   ; decommissioned later
+mail        IN MX  10 mx1
+"""
+
+SNAPSHOT_B = """\
+mail.example.test. 300 IN MX 10 mx2.example.test.
+www.example.test.  300 IN A  192.0.2.2
+www.example.test.  300 IN A  192.0.2.1
+new.example.test.  300 IN A  192.0.2.50
+example.test.      300 IN NS ns1.example.test.
+example.test.      300 IN SOA ns1.example.test. hostmaster.example.test. 2 3600 600 86400 300
+"""
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    a, b = tmp_path / "a.zone", tmp_path / "b.zone"
+    a.write_text(SNAPSHOT_A, encoding="utf-8")
+    b.write_text(SNAPSHOT_B, encoding="utf-8")
+    return Settings(zone_snapshot_a=str(a), zone_snapshot_b=str(b), zone_sort_chunk_records=2)
+
+
+def test_parse_zone_lines_expands_relative_names():
+    records = list(parse_zone_lines(SNAPSHOT_A.splitlines()))
+    assert ("www.example.test.", "A", 300, "192.0.2.1") in records
+    assert ("old.example.test.", "A", 60, "192.0.2.9") in records
+    assert ("example.test.", "NS", 300, "ns1") in records
+
+
+def test_parse_zone_lines_keeps_semicolons_in_quoted_rdata():
+    lines = [
+        '$ORIGIN example.test.',
+        'sel._domainkey 300 IN TXT "v=DKIM1; k=rsa; p=AAAA" ; rotated 2026-01',
+        'q 300 IN TXT "say \\"hi;\\" there" ; note',
+        'plain 300 IN A 192.0.2.7 ; "quoted" comment',
+    ]
+    assert list(parse_zone_lines(lines)) == [
+        ("sel._domainkey.example.test.", "TXT", 300, '"v=DKIM1; k=rsa; p=AAAA"'),
+        ("q.example.test.", "TXT", 300, '"say \\"hi;\\" there"'),
+        ("plain.example.test.", "A", 300, "192.0.2.7"),
+    ]
+
+
+def test_sorted_records_spills_and_merges(tmp_path):
+    records = [(f"n{i % 7}.", "A", 60, f"192.0.2.{i}") for i in range(50)]
+    merged = list(sorted_records(records, chunk_records=8, tmpdir=str(tmp_path)))
+    assert merged == sorted(records)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_diff_reports_added_removed_changed(snapshots, tmp_path):
+    changes = list(diff_snapshots(snapshots))
+    by_key = {(c.name, c.rtype): c for c in changes}
+
+    assert by_key[("old.example.test.", "A")].kind == "removed"
+    assert by_key[("new.example.test.", "A")].kind == "added"
+    assert by_key[("example.test.", "SOA")].kind == "changed"
+    assert ("www.example.test.", "A") not in by_key  # same RRset, different record order
+    assert by_key[("mail.example.test.", "MX")].new.rdata == ("10 mx2.example.test.",)
+
+    counts = write_diff(changes, tmp_path / "out" / "diff.jsonl")
+    assert counts == {"added": 1, "removed": 1, "changed": len(changes) - 2}
+    first = json.loads((tmp_path / "out" / "diff.jsonl").read_text().splitlines()[0])
+    assert set(first) == {"kind", "name", "type", "old", "new"}
+
+
+def test_iter_snapshot_groups_rrsets(snapshots):
+    rrsets = {(r.name, r.rtype): r for r in iter_snapshot(snapshots.zone_snapshot_a, chunk_records=2)}
+    assert rrsets[("www.example.test.", "A")].rdata == ("192.0.2.1", "192.0.2.2")
+    assert rrsets[("old.example.test.", "A")].ttl == 60
+
+
+def test_stale_a_records_report(tmp_path):
+    snapshot = tmp_path / "b.zone"
+    snapshot.write_text(
+        "example.test. 60 IN A 192.0.2.10\n"
+        "alias.test. 60 IN A 198.51.100.7\n"
+        "gone.test. 60 IN A 192.0.2.99\n"
+        f"{'x' * 70}.test. 60 IN A 192.0.2.70\n"
+        "example.test. 60 IN MX 10 mail.example.test.\n",
+        encoding="utf-8",
+    )
+
+    async def scenario():
+        async with stub_dns() as server:
+            cfg = stub_settings(server).model_copy(update={
+                "zone_snapshot_b": str(snapshot),
+                "stale_a_records_report": str(tmp_path / "stale.json"),
+                "stale_check_batch_size": 2,
+            })
+            return await stale_a_records_report(cfg)
+
+    report = asyncio.run(scenario())
+    assert report["checked"] == 4  # the 70-character label cannot be queried: inconclusive, not stale
+    reasons = {item["name"]: item["reason"] for item in report["stale"]}
+    assert reasons == {"alias.test.": "address_mismatch", "gone.test.": "nxdomain"}
+    assert json.loads((tmp_path / "stale.json").read_text()) == report
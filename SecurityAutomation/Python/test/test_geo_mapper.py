@@ -1,12 +1,20 @@
 # test_geo_mapper.py
+import logging
+
 import pytest
 
-from geo_mapper import (
+from geo_map import (
+    RegionIndex,
     extract_keys,
     normalize_keys,
     map_if_missing,
     inverse_mapping,
     auto_detect_prefix,
+    bulk_inverse_mapping,
+    bulk_map_if_missing,
+    bulk_missing_keys,
+    bulk_normalize_keys,
+    columns_to_mapping,
 )
 
 
@@ -150,3 +158,96 @@ def test_case_sensitivity_behavior():
     out = normalize_keys(a, b, prefix=prefix)
     # Since "north" is not "North", it still maps with exact lower-case:
     assert out == [{"US north": 1}]
+
+
+
+def test_bulk_normalize_keys_returns_merged_dict(list_a_unprefixed, list_b_prefixed):
+    out = bulk_normalize_keys(list_a_unprefixed, list_b_prefixed, prefix="US ")
+    assert out == {
+        "US North": "208.127.241.247",
+        "US South": "165.1.201.45",
+        "US Central": "130.41.64.241",
+    }
+
+
+def test_bulk_normalize_keys_logs_one_summary(caplog):
+    source = {f"Region{i}": i for i in range(100)}
+    with caplog.at_level("WARNING"):
+        out = bulk_normalize_keys(source, {"US Region0"}, prefix="US ")
+    assert len(out) == 100
+    assert len(caplog.records) == 1
+    assert "99 keys not found" in caplog.records[0].getMessage()
+
+
+def test_bulk_map_if_missing_matches_list_version(list_a_unprefixed, list_b_prefixed_partial):
+    out = bulk_map_if_missing(list_a_unprefixed, list_b_prefixed_partial, prefix="US ")
+    expected = map_if_missing(list_a_unprefixed, list_b_prefixed_partial, prefix="US ")
+    assert out == {k: v for d in expected for k, v in d.items()}
+
+
+def test_bulk_missing_keys_accepts_columns_and_key_sets():
+    source = columns_to_mapping(["North", "South"], ["a", "b"])
+    assert bulk_missing_keys(source, {"US South"}, prefix="US ") == {"North"}
+    assert bulk_missing_keys(source, ["US North", "US South"], prefix="US ") == set()
+
+
+def test_columns_to_mapping_length_mismatch():
+    with pytest.raises(ValueError):
+        columns_to_mapping(["North"], [])
+
+
+def test_bulk_inverse_mapping_roundtrip(list_a_unprefixed, list_b_prefixed):
+    normalized = bulk_normalize_keys(list_a_unprefixed, list_b_prefixed, prefix="US ")
+    assert bulk_inverse_mapping(normalized, prefix="US ") == {
+        "North": "208.127.241.247",
+        "South": "165.1.201.45",
+        "Central": "130.41.64.241",
+    }
+
+
+
+@pytest.fixture
+def mixed_region_index():
+    return RegionIndex(["US North", "US South", "EU-West", "APAC South", "Central (EU)"])
+
+
+def test_region_index_learns_prefixes(mixed_region_index):
+    assert mixed_region_index.prefixes == {"us": 2, "eu": 1, "apac": 1, "central": 1}
+
+
+def test_region_index_matches_across_prefixes_and_suffixes(mixed_region_index):
+    assert mixed_region_index.match("North") == "US North"
+    assert mixed_region_index.match("eu west") == "EU-West"
+    assert mixed_region_index.match("West") == "EU-West"
+    assert mixed_region_index.match("Central") == "Central (EU)"
+    assert mixed_region_index.match("South", prefix="APAC") == "APAC South"
+
+
+def test_region_index_fuzzy_fallback(mixed_region_index):
+    assert mixed_region_index.match("Nrth") == "US North"
+    assert mixed_region_index.match("Antarctica") is None
+
+
+def test_region_index_fuzzy_keeps_distinct_regions_apart():
+    index = RegionIndex(["US North", "US South", "US Central"])
+    assert index.match("Northeast") is None
+    assert index.match("Southwest") is None
+    assert index.match("South America") is None
+    assert index.lookup("Centrl") == ("US Central", True)
+    assert index.lookup("North") == ("US North", False)
+
+
+def test_bulk_normalize_keys_reports_collisions(caplog):
+    index = RegionIndex(["US North", "US South"])
+    with caplog.at_level(logging.INFO):
+        out = bulk_normalize_keys({"North": 1, "Northeast": 2, "Nrth": 3}, ["US North", "US South"], index=index)
+    assert out == {"US North": 1, "US Northeast": 2}
+    assert "North, Nrth -> US North (kept 'North')" in caplog.text
+    assert "Nrth -> US North" in caplog.text
+
+
+def test_normalize_keys_with_index_uses_matched_reference_keys():
+    source = [{"North": 1}, {"West": 2}, {"Mars": 3}]
+    reference = [{"US North": 0}, {"EU-West": 0}]
+    out = normalize_keys(source, reference, prefix="US ", index=RegionIndex.from_dicts(reference))
+    assert out == [{"US North": 1}, {"EU-West": 2}, {"US Mars": 3}]
@@ -13,9 +13,21 @@ from sklearn.metrics import classification_report
 import joblib
 import re
 import string
+import base64
+import io
 from typing import Dict, List, Tuple, Any
 import json
 
+MODEL_LIST_NAME = 'EmailClassificationModel'
+MODEL_VERSION_LIST_NAME = 'EmailClassificationModelVersion'
+
+# Incident IDs are interpolated into a getIncidents query, so only plain IDs are accepted
+INCIDENT_ID_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+# Survives across calls in the same script run (and across runs in a
+# long-running container): the model is only re-parsed when its version changes
+_MODEL_CACHE: Dict[str, Any] = {'version': None, 'model': None}
+
 class EmailClassifier:
     def __init__(self):
         self.vectorizer = None
@@ -122,6 +134,23 @@ def classify_email_content(email_data: Dict) -> Dict:
     
     return final_result
 
+def classify_emails_batch(emails: List[Dict]) -> List[Dict]:
+    """
+    Classify many emails at once; the ML step runs as a single batch
+    """
+    classifier = EmailClassifier()
+    features = [classifier.extract_email_features(email) for email in emails]
+    ml_results = ml_based_classification_batch(emails)
+    
+    return [
+        combine_classification_results(
+            rule_based_classification(email, email_features),
+            ml_result,
+            genai_classification(email)
+        )
+        for email, email_features, ml_result in zip(emails, features, ml_results)
+    ]
+
 def rule_based_classification(email_data: Dict, features: Dict) -> Dict:
     """
     Rule-based classification using heuristics
@@ -164,39 +193,42 @@ def ml_based_classification(email_data: Dict, features: Dict) -> Dict:
     """
     Machine Learning based classification using TF-IDF and various algorithms
     """
+    return ml_based_classification_batch([email_data])[0]
+
+def ml_based_classification_batch(emails: List[Dict]) -> List[Dict]:
+    """
+    Classify many emails with one vectorizer.transform and one predict_proba call
+    """
+    texts = [f"{email.get('subject', '')} {email.get('body', '')}" for email in emails]
     try:
-        # Prepare text data
-        subject = email_data.get('subject', '')
-        body = email_data.get('body', '')
-        combined_text = f"{subject} {body}"
+        model_data = get_cached_model()
         
-        # Load or train model (this would typically be pre-trained)
-        model_data = load_trained_model()
+        if not model_data:
+            # Fallback to simple bag of words approach
+            return [simple_bow_classification(text) for text in texts]
         
-        if model_data:
-            vectorizer = model_data['vectorizer']
-            classifier = model_data['classifier']
-            
-            # Vectorize the email text
-            text_features = vectorizer.transform([combined_text])
-            
-            # Predict
-            prediction = classifier.predict(text_features)[0]
-            confidence = max(classifier.predict_proba(text_features)[0])
-            
-            return {
-                'incident_type': prediction,
-                'confidence': confidence,
+        vectorizer = model_data['vectorizer']
+        classifier = model_data['classifier']
+        algorithm = model_data.get('algorithm', 'unknown')
+        
+        # One sparse matrix for the whole batch, one matrix op for all predictions
+        text_features = vectorizer.transform(texts)
+        probabilities = classifier.predict_proba(text_features)
+        best = np.argmax(probabilities, axis=1)
+        
+        return [
+            {
+                'incident_type': str(classifier.classes_[idx]),
+                'confidence': float(row[idx]),
                 'method': 'ml_based',
-                'algorithm': model_data.get('algorithm', 'unknown')
+                'algorithm': algorithm
             }
-        else:
-            # Fallback to simple bag of words approach
-            return simple_bow_classification(combined_text)
+            for row, idx in zip(probabilities, best)
+        ]
             
     except Exception as e:
         demisto.error(f"ML classification failed: {str(e)}")
-        return {'incident_type': 'general', 'confidence': 0.0, 'method': 'ml_failed'}
+        return [{'incident_type': 'general', 'confidence': 0.0, 'method': 'ml_failed'} for _ in texts]
 
 def simple_bow_classification(text: str) -> Dict:
     """
@@ -393,23 +425,59 @@ def combine_classification_results(rule_result: Dict, ml_result: Dict, genai_res
 
 def load_trained_model():
     """
-    Load pre-trained ML model from XSOAR storage or external source
+    Load pre-trained ML model from XSOAR storage or external source.
+    The list holds the base64 joblib payload written by training_classification;
+    it is only ever read back from our own list, never from incident data
     """
     try:
         # Try to load from XSOAR list or integration storage
-        model_data = demisto.getList('EmailClassificationModel')
+        model_data = demisto.getList(MODEL_LIST_NAME)
         if model_data:
-            return json.loads(model_data)
+            return joblib.load(io.BytesIO(base64.b64decode(model_data)))
         else:
             return None
-    except:
+    except Exception as e:
+        demisto.error(f"Could not load the trained model: {str(e)}")
         return None
 
+def get_model_version() -> str:
+    """
+    Current model version from the small version list written at training
+    time; empty when there is none
+    """
+    try:
+        version = demisto.getList(MODEL_VERSION_LIST_NAME)
+        return version.strip() if version else ''
+    except:
+        return ''
+
+def get_cached_model():
+    """
+    Return the trained model, reloading it only when its version has changed.
+    Without a version list there is nothing cheap to compare, so the model
+    is loaded on every call and not cached
+    """
+    version = get_model_version()
+    if version and version == _MODEL_CACHE['version']:
+        return _MODEL_CACHE['model']
+    
+    model_data = load_trained_model()
+    cacheable = bool(version and model_data)
+    _MODEL_CACHE['version'] = version if cacheable else None
+    _MODEL_CACHE['model'] = model_data if cacheable else None
+    return model_data
+
 def main():
     """
     Main execution function for XSOAR automation
     """
     try:
+        # Batch mode: classify a list of incidents in one run
+        incident_ids = argToList(demisto.args().get('incident_ids'))
+        if incident_ids:
+            classify_incidents_batch_command(incident_ids)
+            return
+        
         # Get email data from XSOAR context
         email_data = {
             'subject': demisto.args().get('subject', ''),
@@ -462,6 +530,82 @@ def main():
         demisto.error(f"Email classification failed: {str(e)}")
         return_error(f"Email classification failed: {str(e)}")
 
+def fetch_incident_emails(incident_ids: List[str]) -> List[Tuple[str, Dict]]:
+    """
+    Fetch the email fields of the given incidents with one getIncidents query.
+    Callers pass IDs already checked against INCIDENT_ID_RE; they are quoted as well
+    """
+    if not incident_ids:
+        return []
+    
+    res = demisto.executeCommand('getIncidents', {
+        'query': 'id:({})'.format(' '.join(f'"{incident_id}"' for incident_id in incident_ids)),
+        'size': len(incident_ids)
+    })
+    if isError(res[0]):
+        raise DemistoException(f"getIncidents failed: {get_error(res)}")
+    
+    incidents = (res[0].get('Contents') or {}).get('data') or []
+    return [
+        (str(incident.get('id')), {
+            'subject': incident.get('emailsubject') or '',
+            'body': incident.get('emailbody') or '',
+            'sender': incident.get('emailfrom') or '',
+            'attachments': incident.get('attachment') or []
+        })
+        for incident in incidents
+    ]
+
+def classify_incidents_batch_command(incident_ids: List[str]):
+    """
+    Classify many incidents in one run and return a result per incident
+    """
+    incident_ids = [str(incident_id).strip() for incident_id in incident_ids]
+    valid_ids = [incident_id for incident_id in dict.fromkeys(incident_ids) if INCIDENT_ID_RE.match(incident_id)]
+    incident_emails = fetch_incident_emails(valid_ids)
+    results = classify_emails_batch([email for _, email in incident_emails])
+    confidence_threshold = float(demisto.params().get('confidence_threshold', 0.7))
+    
+    by_id = {}
+    for (incident_id, _), result in zip(incident_emails, results):
+        incident_type = result.get('incident_type', 'general')
+        confidence = result.get('confidence', 0.0)
+        auto_classified = confidence >= confidence_threshold
+        
+        if auto_classified:
+            demisto.executeCommand('setIncident', {
+                'id': incident_id,
+                'type': incident_type,
+                'severity': calculate_severity(incident_type, confidence)
+            })
+        
+        by_id[incident_id] = {'IncidentID': incident_id, 'AutoClassified': auto_classified, **result}
+    
+    # One result per requested ID, in request order; malformed IDs and IDs getIncidents
+    # did not return are reported
+    outputs = [
+        by_id.get(incident_id) or {
+            'IncidentID': incident_id,
+            'AutoClassified': False,
+            'error': 'not found' if INCIDENT_ID_RE.match(incident_id) else 'invalid incident id'
+        }
+        for incident_id in dict.fromkeys(incident_ids)
+    ]
+    
+    summary = [
+        {k: o.get(k) for k in ('IncidentID', 'incident_type', 'confidence', 'AutoClassified', 'error')}
+        for o in outputs
+    ]
+    demisto.results({
+        'Type': entryTypes['note'],
+        'Contents': outputs,
+        'ContentsFormat': formats['json'],
+        'HumanReadable': tableToMarkdown(f'Email classification for {len(outputs)} incidents', summary),
+        'EntryContext': {
+            'EmailClassification(val.IncidentID && val.IncidentID == obj.IncidentID)': outputs
+        }
+    })
+
 def calculate_severity(incident_type: str, confidence: float) -> int:
     """
     Calculate incident severity based on type and confidence
@@ -0,0 +1,180 @@
+# test_automation_script.py
+import base64
+import hashlib
+import importlib
+import sys
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+pytest.importorskip("joblib")
+
+
+class FakeDemisto:
+    """Stand-in for demistomock: lists, command responses and entries live in memory."""
+
+    def __init__(self):
+        self.lists = {}
+        self.list_reads = []
+        self.responses = {}
+        self.commands = []
+        self.entries = []
+        self.errors = []
+        self.script_args = {}
+
+    def getList(self, name):
+        self.list_reads.append(name)
+        return self.lists.get(name)
+
+    def setList(self, name, value):
+        self.lists[name] = value
+
+    def executeCommand(self, command, args):
+        self.commands.append((command, args))
+        return self.responses.get(command, [{'Type': 1, 'Contents': None}])
+
+    def results(self, entry):
+        self.entries.append(entry)
+
+    def error(self, message):
+        self.errors.append(message)
+
+    def params(self):
+        return {'confidence_threshold': '0.3'}
+
+    def args(self):
+        return self.script_args
+
+
+def _common_server_python():
+    csp = types.ModuleType('CommonServerPython')
+    csp.entryTypes = {'note': 1, 'error': 4}
+    csp.formats = {'json': 'json'}
+    csp.argToList = lambda value: [v.strip() for v in value.split(',') if v.strip()] if isinstance(value, str) else (value or [])
+    csp.isError = lambda entry: entry.get('Type') == 4
+    csp.get_error = lambda res: res[0].get('Contents')
+    csp.DemistoException = type('DemistoException', (Exception,), {})
+    csp.tableToMarkdown = lambda title, rows: title
+    csp.return_error = lambda message: None
+    csp.__all__ = ['entryTypes', 'formats', 'argToList', 'isError', 'get_error', 'DemistoException',
+                   'tableToMarkdown', 'return_error']
+    return csp
+
+
+@pytest.fixture
+def demisto(monkeypatch):
+    fake = FakeDemisto()
+    monkeypatch.setitem(sys.modules, 'demistomock', fake)
+    monkeypatch.setitem(sys.modules, 'CommonServerPython', _common_server_python())
+    monkeypatch.setitem(sys.modules, 'CommonServerUserPython', types.ModuleType('CommonServerUserPython'))
+    return fake
+
+
+def _fresh_import(name):
+    sys.modules.pop(name, None)
+    return importlib.import_module(name)
+
+
+@pytest.fixture
+def script(demisto):
+    return _fresh_import('automation_script')
+
+
+class StubVectorizer:
+    def __init__(self):
+        self.calls = 0
+
+    def transform(self, texts):
+        self.calls += 1
+        return list(texts)
+
+
+class StubClassifier:
+    classes_ = np.array(['phishing', 'spam', 'malware'])
+
+    def predict_proba(self, texts):
+        return np.array([[0.1, 0.2, 0.7] if 'invoice.exe' in t else [0.6, 0.3, 0.1] for t in texts])
+
+
+def test_trained_model_round_trips_through_the_list(demisto):
+    demisto.responses['getIncidents'] = [
+        {'emailsubject': subject, 'emailbody': body, 'type': kind}
+        for subject, body, kind in [
+            ('verify your account', 'click here to verify your password', 'phishing'),
+            ('account suspended', 'login now to restore your account', 'phishing'),
+            ('password expires', 'confirm your login details today', 'phishing'),
+            ('unusual sign in', 'verify account password immediately', 'phishing'),
+            ('reset required', 'click the link and confirm your password', 'phishing'),
+            ('big sale', 'cheap watches discount offer', 'spam'),
+            ('free prize', 'claim your discount offer today', 'spam'),
+            ('limited deal', 'cheap pills and watches on offer', 'spam'),
+            ('winner', 'you won a free cruise offer', 'spam'),
+            ('newsletter', 'discount coupons and cheap deals', 'spam'),
+        ]
+    ]
+    model = _fresh_import('training_classification').train_classification_model()
+
+    payload = base64.b64decode(demisto.lists['EmailClassificationModel'])
+    assert demisto.lists['EmailClassificationModelVersion'] == model['version'] == hashlib.sha256(payload).hexdigest()
+
+    loaded = _fresh_import('automation_script').load_trained_model()
+    assert loaded['algorithm'] == 'MultinomialNB'
+    prediction = loaded['classifier'].predict(loaded['vectorizer'].transform(['cheap discount offer']))
+    assert list(prediction) == ['spam']
+
+
+def test_cached_model_reloads_only_when_the_version_changes(script, demisto, monkeypatch):
+    loads = []
+    monkeypatch.setattr(script, 'load_trained_model', lambda: loads.append(1) or {'algorithm': f'v{len(loads)}'})
+
+    demisto.lists['EmailClassificationModelVersion'] = 'abc'
+    assert script.get_cached_model() == {'algorithm': 'v1'}
+    assert script.get_cached_model() == {'algorithm': 'v1'}
+    assert len(loads) == 1
+
+    demisto.lists['EmailClassificationModelVersion'] = 'def'
+    assert script.get_cached_model() == {'algorithm': 'v2'}
+    assert len(loads) == 2
+
+    # no version list: nothing to compare, so load every time and keep nothing
+    del demisto.lists['EmailClassificationModelVersion']
+    script.get_cached_model()
+    script.get_cached_model()
+    assert len(loads) == 4
+    assert script._MODEL_CACHE == {'version': None, 'model': None}
+
+
+def test_batch_classification_takes_the_argmax_per_email(script, monkeypatch):
+    vectorizer = StubVectorizer()
+    model = {'vectorizer': vectorizer, 'classifier': StubClassifier(), 'algorithm': 'stub'}
+    monkeypatch.setattr(script, 'get_cached_model', lambda: model)
+
+    results = script.ml_based_classification_batch([
+        {'subject': 'payroll', 'body': 'see invoice.exe'},
+        {'subject': 'verify', 'body': 'your account'},
+    ])
+    assert [(r['incident_type'], r['confidence']) for r in results] == [('malware', 0.7), ('phishing', 0.6)]
+    assert vectorizer.calls == 1
+
+
+def test_batch_command_reports_missing_and_invalid_ids(script, demisto, monkeypatch):
+    model = {'vectorizer': StubVectorizer(), 'classifier': StubClassifier(), 'algorithm': 'stub'}
+    monkeypatch.setattr(script, 'get_cached_model', lambda: model)
+    monkeypatch.setattr(script, 'genai_classification', lambda email: {'incident_type': 'general', 'confidence': 0.0})
+    demisto.responses['getIncidents'] = [{'Type': 1, 'Contents': {'data': [
+        {'id': 7, 'emailsubject': 'payroll', 'emailbody': 'see invoice.exe', 'attachment': ['invoice.exe']},
+    ]}}]
+    demisto.script_args = {'incident_ids': '12, 7,1 OR type:*,7'}
+
+    script.main()
+
+    assert demisto.commands[0] == ('getIncidents', {'query': 'id:("12" "7")', 'size': 2})
+    outputs = demisto.entries[-1]['Contents']
+    assert [(o['IncidentID'], o.get('error')) for o in outputs] == [
+        ('12', 'not found'), ('7', None), ('1 OR type:*', 'invalid incident id'),
+    ]
+    assert outputs[1]['incident_type'] == 'malware'
+    assert ('setIncident', {'id': '7', 'type': 'malware', 'severity': 3}) in demisto.commands
@@ -13,6 +13,9 @@ from sklearn.metrics import classification_report
 import joblib
 import re
 import string
+import hashlib
+import base64
+import io
 from typing import Dict, List, Tuple, Any
 import json
 
@@ -62,7 +65,14 @@ def train_classification_model():
         'algorithm': 'MultinomialNB'
     }
     
-    # Store in XSOAR
-    demisto.setList('EmailClassificationModel', json.dumps(model_data, default=str))
+    # Store in XSOAR as base64 joblib (lists hold text; JSON would turn the fitted
+    # objects into strings). The version list lets classifiers skip reloading an
+    # unchanged model
+    buffer = io.BytesIO()
+    joblib.dump(model_data, buffer)
+    payload = buffer.getvalue()
+    model_data['version'] = hashlib.sha256(payload).hexdigest()
+    demisto.setList('EmailClassificationModel', base64.b64encode(payload).decode('ascii'))
+    demisto.setList('EmailClassificationModelVersion', model_data['version'])
     
     return model_data
\ No newline at end of file